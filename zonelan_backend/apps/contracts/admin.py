@@ -1,10 +1,11 @@
 from django.contrib import admin
+from apps.core.admin import SoftDeleteAdmin
 from .models import Contract, MaintenanceRecord, ContractDocument, ContractReport
 
 @admin.register(Contract)
-class ContractAdmin(admin.ModelAdmin):
-    list_display = ('title', 'customer', 'status', 'start_date', 'end_date', 'requires_maintenance', 'next_maintenance_date')
-    list_filter = ('status', 'requires_maintenance', 'customer')
+class ContractAdmin(SoftDeleteAdmin):
+    list_display = ('title', 'customer', 'status', 'start_date', 'end_date', 'requires_maintenance', 'next_maintenance_date', 'is_deleted')
+    list_filter = ('status', 'requires_maintenance', 'customer', 'is_deleted')
     search_fields = ('title', 'description', 'customer__name')
     date_hierarchy = 'start_date'
 
@@ -23,7 +24,7 @@ class ContractDocumentAdmin(admin.ModelAdmin):
     date_hierarchy = 'uploaded_at'
 
 @admin.register(ContractReport)
-class ContractReportAdmin(admin.ModelAdmin):
+class ContractReportAdmin(SoftDeleteAdmin):
     list_display = ['id', 'contract', 'date', 'status', 'hours_worked', 'is_deleted']
     list_filter = ['contract', 'status', 'date', 'is_deleted']
     search_fields = ['description', 'contract__title']
@@ -0,0 +1,100 @@
+"""
+Versiones asíncronas de las vistas de contratos para el modo ASGI (ASYNC_VIEWS).
+"""
+import mimetypes
+import os
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from apps.core.async_support import aiter_file, aiter_upstream, async_api_view, get_http_client
+from apps.core.db_router import replica_safe
+from .models import Contract
+
+
+@async_api_view
+@replica_safe
+async def dashboard(request):
+    """Devuelve estadísticas para el dashboard de contratos."""
+    contracts = Contract.objects.all()
+    today = timezone.now().date()
+    thirty_days_later = today + timezone.timedelta(days=30)
+
+    total_contracts = await contracts.acount()
+    active_contracts = await contracts.filter(status='ACTIVE').acount()
+    pending_maintenance = await contracts.filter(
+        requires_maintenance=True,
+        next_maintenance_date__lte=today
+    ).acount()
+    expiring_soon = await contracts.filter(
+        end_date__isnull=False,
+        end_date__gte=today,
+        end_date__lte=thirty_days_later,
+        status='ACTIVE'
+    ).acount()
+    contracts_by_customer = [
+        row async for row in contracts.values('customer__name').annotate(count=Count('id')).order_by('-count')[:10]
+    ]
+
+    return JsonResponse({
+        'total_contracts': total_contracts,
+        'active_contracts': active_contracts,
+        'pending_maintenance': pending_maintenance,
+        'expiring_soon': expiring_soon,
+        'contracts_by_customer': contracts_by_customer
+    })
+
+
+async def document_proxy(request):
+    """
+    Proxy de documentos para mostrarlos en iframes. Igual que la vista síncrona,
+    pero transmite el contenido en streaming sin ocupar un worker durante la descarga.
+    """
+    url = request.GET.get('url')
+    if not url:
+        return HttpResponse('URL no proporcionada', status=400)
+
+    try:
+        if url.startswith(('http://', 'https://')):
+            client = get_http_client()
+            upstream = await client.send(client.build_request('GET', url), stream=True)
+
+            content_type = upstream.headers.get('Content-Type')
+            if not content_type:
+                content_type = mimetypes.guess_type(url)[0] or 'application/octet-stream'
+
+            response = StreamingHttpResponse(
+                aiter_upstream(upstream),
+                status=upstream.status_code,
+                content_type=content_type
+            )
+
+        elif url.startswith(('/media/', '/mediafiles/')):
+            rel_path = url[7:] if url.startswith('/media/') else url[12:]
+            media_root = os.path.realpath(settings.MEDIA_ROOT)
+            file_path = os.path.realpath(os.path.join(media_root, rel_path))
+
+            if not file_path.startswith(media_root + os.sep) or not os.path.isfile(file_path):
+                return HttpResponse('Archivo no encontrado', status=404)
+
+            content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+            response = StreamingHttpResponse(aiter_file(file_path), content_type=content_type)
+            response['Content-Length'] = str(os.path.getsize(file_path))
+
+            if content_type == 'application/pdf':
+                response['Content-Disposition'] = 'inline; filename="{}"'.format(
+                    os.path.basename(file_path)
+                )
+
+        else:
+            return HttpResponse('URL no válida', status=400)
+
+    except Exception as e:
+        return HttpResponse(f'Error al procesar el documento: {str(e)}', status=500)
+
+    # xframe_options_exempt no admite vistas asíncronas en Django 4.2
+    response['X-Frame-Options'] = 'SAMEORIGIN'
+    response.xframe_options_exempt = True
+    return response
@@ -1,14 +1,12 @@
-class DocumentFrameMiddleware:
+from apps.core.middleware import AsyncCapableMiddleware
+
+
+class DocumentFrameMiddleware(AsyncCapableMiddleware):
     """
     Middleware para permitir que los documentos se muestren en iframes, 
     modificando X-Frame-Options para las rutas de documentos.
     """
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        response = self.get_response(request)
-        
+    def process_response(self, request, response):
         # Comprobar si la ruta corresponde a documentos o archivos multimedia
         if (request.path.startswith('/mediafiles/') or 
             request.path.startswith('/media/') or 
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0003_alter_contractreport_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['is_deleted', 'created_at'], name='contract_alive_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contractreport',
+            index=models.Index(fields=['is_deleted', 'date'], name='contractreport_alive_date_idx'),
+        ),
+    ]
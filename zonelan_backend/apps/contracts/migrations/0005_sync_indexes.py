@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0004_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de última actualización'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0005_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contractreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -2,8 +2,9 @@ from django.db import models
 from apps.customers.models import Customer
 from apps.users.models import User
 from django.utils import timezone
+from apps.core.soft_delete import SoftDeleteModel
 
-class Contract(models.Model):
+class Contract(SoftDeleteModel):
     """
     Modelo para gestionar contratos con clientes, tanto entidades públicas como privadas.
     """
@@ -53,7 +54,7 @@ class Contract(models.Model):
     )
     observations = models.TextField(blank=True, null=True, verbose_name='Observaciones')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
-    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de última actualización')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de última actualización')
     created_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -68,6 +69,9 @@ class Contract(models.Model):
         verbose_name = 'Contrato'
         verbose_name_plural = 'Contratos'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_deleted', 'created_at'], name='contract_alive_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.customer.name}"
@@ -225,7 +229,7 @@ class MaintenanceRecord(models.Model):
         # Actualizar la próxima fecha de mantenimiento en el contrato
         if self.status == 'COMPLETED':
             self.contract.calculate_next_maintenance_date()
-            self.contract.save(update_fields=['next_maintenance_date'])
+            self.contract.save(update_fields=['next_maintenance_date', 'updated_at'])
 
 
 class ContractDocument(models.Model):
@@ -264,7 +268,7 @@ class ContractDocument(models.Model):
         super().delete(*args, **kwargs)
 
 
-class ContractReport(models.Model):
+class ContractReport(SoftDeleteModel):
     STATUS_CHOICES = [
         ('DRAFT', 'Borrador'),
         ('COMPLETED', 'Completado'),
@@ -290,21 +294,30 @@ class ContractReport(models.Model):
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     # Propiedades para obtener imágenes por tipo
     @property
     def before_images(self):
+        # Con Prefetch(..., to_attr='prefetched_before_images') no hace otra consulta
+        if hasattr(self, 'prefetched_before_images'):
+            return self.prefetched_before_images
         return self.images.filter(image_type='BEFORE')
     
     @property
     def after_images(self):
+        # Con Prefetch(..., to_attr='prefetched_after_images') no hace otra consulta
+        if hasattr(self, 'prefetched_after_images'):
+            return self.prefetched_after_images
         return self.images.filter(image_type='AFTER')
 
     class Meta:
         verbose_name = 'Reporte de contrato'
         verbose_name_plural = 'Reportes de contratos'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['is_deleted', 'date'], name='contractreport_alive_date_idx'),
+        ]
 
     def __str__(self):
         return f"Reporte {self.id} - {self.contract.title} ({self.date})"
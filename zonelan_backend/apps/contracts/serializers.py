@@ -11,6 +11,7 @@ from .models import (
 )
 from apps.customers.serializers import CustomerSerializer
 from apps.users.serializers import UserSerializer
+from apps.core.versioning import apply_delta
 from apps.materials.models import Material, MaterialControl
 from apps.materials.serializers import MaterialSerializer
 # Importar los serializadores necesarios de reports
@@ -107,8 +108,7 @@ class ContractReportSerializer(serializers.ModelSerializer):
                 
                 # Actualizar stock total del material
                 material = Material.objects.get(id=material_id)
-                material.quantity -= quantity
-                material.save()
+                apply_delta(material, -quantity)
                 
                 # Registrar en el control de materiales con la referencia al reporte de contrato
                 from apps.materials.models import MaterialControl
@@ -193,8 +193,7 @@ class ContractReportSerializer(serializers.ModelSerializer):
                             raise serializers.ValidationError(f"No hay suficiente stock en la ubicación. Disponible: {location.quantity}")
                         
                         # Actualizar stock en ubicación
-                        location.quantity -= quantity
-                        location.save()
+                        apply_delta(location, -quantity, minimum=0)
                     except MaterialLocation.DoesNotExist:
                         pass
 
@@ -205,8 +204,7 @@ class ContractReportSerializer(serializers.ModelSerializer):
                 material = Material.objects.get(id=material_id)
                 
                 # Devolver al inventario
-                material.quantity += old_quantity
-                material.save()
+                apply_delta(material, old_quantity)
                 
                 # Registrar en el control como devolución
                 MaterialControl.objects.create(
@@ -223,8 +221,7 @@ class ContractReportSerializer(serializers.ModelSerializer):
                 difference = old_quantity - new_materials[material_id]
                 
                 # Devolver la diferencia al inventario
-                material.quantity += difference
-                material.save()
+                apply_delta(material, difference)
                 
                 # Registrar en el control como devolución parcial
                 MaterialControl.objects.create(
@@ -251,8 +248,7 @@ class ContractReportSerializer(serializers.ModelSerializer):
                 
                 if not location_id_used:
                     # Reducir el inventario solo si no se ha procesado a través de location_id
-                    material.quantity -= new_quantity
-                    material.save()
+                    apply_delta(material, -new_quantity)
                 
                 # Registrar en el control como uso
                 MaterialControl.objects.create(
@@ -269,8 +265,7 @@ class ContractReportSerializer(serializers.ModelSerializer):
                 difference = new_quantity - current_materials[material_id]
                 
                 # Reducir la diferencia del inventario
-                material.quantity -= difference
-                material.save()
+                apply_delta(material, -difference)
                 
                 # Registrar en el control como uso adicional
                 MaterialControl.objects.create(
@@ -334,6 +329,22 @@ class ContractReportSerializer(serializers.ModelSerializer):
         return instance
 
 
+class ContractReportListSerializer(serializers.ModelSerializer):
+    """Versión ligera para listados (?compact=1): sin descripción, técnicos, materiales ni imágenes."""
+    performed_by_name = serializers.SerializerMethodField()
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = ContractReport
+        fields = ['id', 'contract', 'date', 'hours_worked', 'status', 'status_display',
+                  'performed_by', 'performed_by_name', 'is_deleted', 'created_at', 'updated_at']
+
+    def get_performed_by_name(self, obj):
+        if obj.performed_by:
+            return getattr(obj.performed_by, 'name', obj.performed_by.username)
+        return None
+
+
 class ContractSerializer(serializers.ModelSerializer):
     customer_name = serializers.ReadOnlyField(source='customer.name')
     status_display = serializers.SerializerMethodField()
@@ -355,6 +366,21 @@ class ContractSerializer(serializers.ModelSerializer):
         return dict(Contract.MAINTENANCE_FREQUENCY_CHOICES).get(obj.maintenance_frequency, obj.maintenance_frequency)
 
 
+
+class ContractListSerializer(serializers.ModelSerializer):
+    """Versión ligera para listados (?compact=1): sin descripción ni observaciones."""
+    customer_name = serializers.ReadOnlyField(source='customer.name')
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    is_maintenance_pending = serializers.ReadOnlyField()
+    days_to_next_maintenance = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Contract
+        fields = ['id', 'title', 'customer', 'customer_name', 'status', 'status_display',
+                  'start_date', 'end_date', 'requires_maintenance', 'maintenance_frequency',
+                  'next_maintenance_date', 'is_maintenance_pending', 'days_to_next_maintenance',
+                  'is_deleted', 'created_at', 'updated_at']
+
 class ContractDetailSerializer(ContractSerializer):
     """Serializador para detalles de contrato que incluye información adicional."""
     customer = CustomerSerializer(read_only=True)
@@ -374,5 +400,5 @@ class ContractDetailSerializer(ContractSerializer):
     
     def get_recent_reports(self, obj):
         # Mostrar solo los últimos 5 reportes
-        reports = obj.reports.filter(is_deleted=False)[:5]
+        reports = obj.reports.all()[:5]
         return ContractReportSerializer(reports, many=True).data
\ No newline at end of file
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -8,11 +9,20 @@ router.register(r'maintenance-records', views.MaintenanceRecordViewSet)
 router.register(r'documents', views.ContractDocumentViewSet)
 router.register(r'reports', views.ContractReportViewSet)
 
+# En modo ASGI las vistas de E/S (dashboard y proxy de documentos) son asíncronas
+if settings.ASYNC_VIEWS:
+    from . import async_views
+    dashboard_view = async_views.dashboard
+    document_proxy_view = async_views.document_proxy
+else:
+    dashboard_view = views.ContractViewSet.as_view({'get': 'dashboard'})
+    document_proxy_view = views.document_proxy
+
 urlpatterns = [
     path('', include(router.urls)),
     path('pending-maintenances/', views.pending_maintenances, name='pending-maintenances'),
     path('expiring-soon/', views.expiring_soon, name='expiring-soon'),
-    path('dashboard/', views.ContractViewSet.as_view({'get': 'dashboard'}), name='dashboard'),
+    path('dashboard/', dashboard_view, name='dashboard'),
     # Añadir esta URL para el proxy de documentos
-    path('document-proxy/', views.document_proxy, name='document-proxy'),
+    path('document-proxy/', document_proxy_view, name='document-proxy'),
 ]
\ No newline at end of file
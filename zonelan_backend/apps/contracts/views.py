@@ -4,14 +4,17 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.db import transaction
+from django.db.models import Prefetch
 from django.utils import timezone
-from .models import Contract, MaintenanceRecord, ContractDocument, ContractReport
+from .models import Contract, MaintenanceRecord, ContractDocument, ContractReport, ContractReportImage
 from .serializers import (
     ContractSerializer, 
     ContractDetailSerializer,
     MaintenanceRecordSerializer, 
     ContractDocumentSerializer, 
-    ContractReportSerializer
+    ContractReportSerializer,
+    ContractListSerializer,
+    ContractReportListSerializer
 )
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
@@ -28,11 +31,36 @@ from wsgiref.util import FileWrapper
 import io
 import traceback
 import json
+import logging
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.db_router import ReplicaReadMixin
+from apps.core.idempotency import IdempotencyMixin
+from apps.core.sparse import SparseFieldsMixin
+from apps.core.versioning import VersionConflict, apply_delta
 
-class ContractViewSet(viewsets.ModelViewSet):
+logger = logging.getLogger(__name__)
+
+class ContractViewSet(SparseFieldsMixin, ConditionalGetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """API para gestionar contratos."""
-    queryset = Contract.objects.filter(is_deleted=False)
+    replica_safe_actions = ('list', 'dashboard')
+    # ContractDetailSerializer anida documentos, mantenimientos y reportes
+    conditional_object_fields = ('documents__uploaded_at', 'maintenance_records__updated_at', 'reports__updated_at')
+    queryset = Contract.objects.all()
     serializer_class = ContractSerializer
+    compact_serializer_class = ContractListSerializer
+    sparse_select_related = {
+        'customer': ('customer',),
+        'customer_name': ('customer',),
+        'created_by': ('created_by',),
+        'created_by_name': ('created_by',),
+    }
+    sparse_prefetch_related = {'documents': ('documents__uploaded_by',)}
+    sparse_field_columns = {
+        'status_display': ('status',),
+        'maintenance_frequency_display': ('maintenance_frequency',),
+        'is_maintenance_pending': ('requires_maintenance', 'next_maintenance_date'),
+        'days_to_next_maintenance': ('next_maintenance_date',),
+    }
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'customer', 'requires_maintenance']
@@ -42,7 +70,7 @@ class ContractViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ContractDetailSerializer
-        return ContractSerializer
+        return super().get_serializer_class()
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -77,9 +105,7 @@ class ContractViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """Marca un contrato como eliminado en lugar de borrarlo realmente."""
         instance = self.get_object()
-        instance.is_deleted = True
-        instance.deleted_at = timezone.now()
-        instance.save()
+        instance.soft_delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=True, methods=['post'])
@@ -109,15 +135,14 @@ class ContractViewSet(viewsets.ModelViewSet):
     def dashboard(self, request):
         """Devuelve estadísticas para el dashboard de contratos."""
         # Contar contratos por estado
-        total_contracts = Contract.objects.filter(is_deleted=False).count()
-        active_contracts = Contract.objects.filter(status='ACTIVE', is_deleted=False).count()
+        total_contracts = Contract.objects.count()
+        active_contracts = Contract.objects.filter(status='ACTIVE').count()
         
         # Contar contratos con mantenimiento pendiente
         today = timezone.now().date()
         pending_maintenance = Contract.objects.filter(
             requires_maintenance=True,
-            next_maintenance_date__lte=today,
-            is_deleted=False
+            next_maintenance_date__lte=today
         ).count()
         
         # Contar contratos a punto de vencer
@@ -126,15 +151,12 @@ class ContractViewSet(viewsets.ModelViewSet):
             end_date__isnull=False,
             end_date__gte=today,
             end_date__lte=thirty_days_later,
-            status='ACTIVE',
-            is_deleted=False
+            status='ACTIVE'
         ).count()
         
         # Obtener distribución de contratos por cliente
         from django.db.models import Count
-        contracts_by_customer = Contract.objects.filter(
-            is_deleted=False
-        ).values(
+        contracts_by_customer = Contract.objects.values(
             'customer__name'
         ).annotate(
             count=Count('id')
@@ -149,7 +171,7 @@ class ContractViewSet(viewsets.ModelViewSet):
         })
 
 
-class MaintenanceRecordViewSet(viewsets.ModelViewSet):
+class MaintenanceRecordViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """API para gestionar registros de mantenimiento."""
     queryset = MaintenanceRecord.objects.all()
     serializer_class = MaintenanceRecordSerializer
@@ -196,9 +218,25 @@ class ContractDocumentViewSet(viewsets.ModelViewSet):
         serializer.save(uploaded_by=self.request.user)
 
 
-class ContractReportViewSet(viewsets.ModelViewSet):
-    queryset = ContractReport.objects.filter(is_deleted=False)
+class ContractReportViewSet(IdempotencyMixin, SparseFieldsMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = ContractReport.objects.all()
     serializer_class = ContractReportSerializer
+    compact_serializer_class = ContractReportListSerializer
+    sparse_select_related = {'performed_by_name': ('performed_by',)}
+    sparse_prefetch_related = {
+        'technicians': ('technicians__technician',),
+        'materials_used': ('materials_used__material',),
+        'before_images': (Prefetch('images', queryset=ContractReportImage.objects.filter(image_type='BEFORE'),
+                                   to_attr='prefetched_before_images'),),
+        'after_images': (Prefetch('images', queryset=ContractReportImage.objects.filter(image_type='AFTER'),
+                                  to_attr='prefetched_after_images'),),
+    }
+    # El detalle anida imágenes, técnicos y materiales (con su stock), que no
+    # cambian el updated_at del reporte
+    conditional_object_fields = (
+        'images__id', 'materials_used__id', 'technicians__id', 'materials_used__material__updated_at',
+    )
+    sparse_field_columns = {'status_display': ('status',)}
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['contract', 'status', 'performed_by']
@@ -212,7 +250,7 @@ class ContractReportViewSet(viewsets.ModelViewSet):
         # Determinar si se deben incluir reportes eliminados
         include_deleted = self.request.query_params.get('include_deleted', 'false').lower() in ['true', '1']
         if include_deleted:
-            queryset = ContractReport.objects.all()
+            queryset = ContractReport.objects.with_deleted()
         
         # Filtrar por contrato si se proporciona el parámetro
         contract_id = self.request.query_params.get('contract')
@@ -224,36 +262,31 @@ class ContractReportViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(performed_by=self.request.user)
     
+    def _log_request_data(self, action, request):
+        """Registra en DEBUG los datos recibidos, con los campos JSON ya decodificados."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        logger.debug("ContractReport %s - datos recibidos: %s", action, request.data)
+        for field in ('technicians', 'materials_used', 'existing_images'):
+            if field in request.data:
+                try:
+                    logger.debug("ContractReport %s - %s: %s", action, field, json.loads(request.data.get(field, '[]')))
+                except (TypeError, ValueError) as e:
+                    logger.debug("Error al parsear JSON de %s: %s", field, e)
+
     def create(self, request, *args, **kwargs):
         try:
-            # Log para depuración
-            print("========== INICIO DE DEPURACIÓN CREATE ==========")
-            print(f"Datos recibidos: {request.data}")
-            
-            # Intentar convertir los datos JSON a diccionarios para mejor visualización
-            try:
-                if 'technicians' in request.data:
-                    technicians = json.loads(request.data.get('technicians', '[]'))
-                    print(f"Technicians: {technicians}")
-                
-                if 'materials_used' in request.data:
-                    materials = json.loads(request.data.get('materials_used', '[]'))
-                    print(f"Materials: {materials}")
-                
-                if 'existing_images' in request.data:
-                    images = json.loads(request.data.get('existing_images', '[]'))
-                    print(f"Images: {images}")
-            except Exception as e:
-                print(f"Error al parsear JSON: {str(e)}")
-            
+            self._log_request_data('create', request)
+
             # Continuar con la creación normal
             return super().create(request, *args, **kwargs)
         
+        except VersionConflict:
+            raise
         except Exception as e:
             # Mostrar stacktrace completo
             error_trace = traceback.format_exc()
-            print(f"Error en create: {str(e)}")
-            print(error_trace)
+            logger.exception("Error en create de reporte de contrato: %s", e)
             
             # Devolver una respuesta más informativa
             return Response(
@@ -264,39 +297,20 @@ class ContractReportViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        finally:
-            print("========== FIN DE DEPURACIÓN CREATE ==========")
     
     def update(self, request, *args, **kwargs):
         try:
-            # Log para depuración
-            print("========== INICIO DE DEPURACIÓN UPDATE ==========")
-            print(f"Datos recibidos: {request.data}")
-            
-            # Intentar convertir los datos JSON a diccionarios para mejor visualización
-            try:
-                if 'technicians' in request.data:
-                    technicians = json.loads(request.data.get('technicians', '[]'))
-                    print(f"Technicians: {technicians}")
-                
-                if 'materials_used' in request.data:
-                    materials = json.loads(request.data.get('materials_used', '[]'))
-                    print(f"Materials: {materials}")
-                
-                if 'existing_images' in request.data:
-                    images = json.loads(request.data.get('existing_images', '[]'))
-                    print(f"Images: {images}")
-            except Exception as e:
-                print(f"Error al parsear JSON: {str(e)}")
-            
+            self._log_request_data('update', request)
+
             # Continuar con la actualización normal
             return super().update(request, *args, **kwargs)
         
+        except VersionConflict:
+            raise
         except Exception as e:
             # Mostrar stacktrace completo
             error_trace = traceback.format_exc()
-            print(f"Error en update: {str(e)}")
-            print(error_trace)
+            logger.exception("Error en update de reporte de contrato: %s", e)
             
             # Devolver una respuesta más informativa
             return Response(
@@ -307,8 +321,6 @@ class ContractReportViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        finally:
-            print("========== FIN DE DEPURACIÓN UPDATE ==========")
             
     @transaction.atomic
     def destroy(self, request, *args, **kwargs):
@@ -317,18 +329,14 @@ class ContractReportViewSet(viewsets.ModelViewSet):
         return_materials = request.query_params.get('return_materials', 'false').lower() in ['true', '1']
         
         # Marcar como eliminado
-        instance.is_deleted = True
-        instance.deleted_at = timezone.now()
-        instance.status = 'DELETED'
-        instance.save()
+        instance.soft_delete(status='DELETED')
         
         # Devolver materiales al stock si se solicita
         if return_materials:
             for material_usage in instance.materials_used.all():
                 material = material_usage.material
                 # Incrementar el stock del material
-                material.quantity += material_usage.quantity
-                material.save()
+                apply_delta(material, material_usage.quantity)
                 
                 # Registrar la devolución en el control de materiales
                 from apps.materials.models import MaterialControl
@@ -351,8 +359,7 @@ def pending_maintenances(request):
     today = timezone.now().date()
     contracts = Contract.objects.filter(
         requires_maintenance=True,
-        next_maintenance_date__lte=today,
-        is_deleted=False
+        next_maintenance_date__lte=today
     )
     
     serializer = ContractSerializer(contracts, many=True)
@@ -370,8 +377,7 @@ def expiring_soon(request):
         end_date__isnull=False,
         end_date__gte=today,
         end_date__lte=future_date,
-        status='ACTIVE',
-        is_deleted=False
+        status='ACTIVE'
     )
     
     serializer = ContractSerializer(contracts, many=True)
@@ -421,7 +427,7 @@ def document_proxy(request):
             if url.startswith('/media/'):
                 rel_path = url[7:]  # Quitar '/media/'
             else:
-                rel_path = url[11:]  # Quitar '/mediafiles/'
+                rel_path = url[12:]  # Quitar '/mediafiles/'
             
             # Construir ruta absoluta
             file_path = os.path.join(settings.MEDIA_ROOT, rel_path)
@@ -0,0 +1,53 @@
+from django.contrib import admin, messages
+from django.db import DatabaseError
+
+from .archive import ArchiveError, restore_object
+from .models import ArchivedObject, IdempotencyRecord
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """ModelAdmin para modelos con borrado lógico: muestra también los eliminados."""
+
+    def get_queryset(self, request):
+        queryset = self.model.objects.with_deleted()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+
+@admin.register(ArchivedObject)
+class ArchivedObjectAdmin(admin.ModelAdmin):
+    list_display = ('model', 'object_id', 'label', 'deleted_at', 'archived_at')
+    list_filter = ('model',)
+    search_fields = ('object_id', 'label')
+    readonly_fields = ('model', 'object_id', 'label', 'deleted_at', 'archived_at', 'payload')
+    actions = ['restore_selected']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Restaurar los objetos seleccionados')
+    def restore_selected(self, request, queryset):
+        restored = 0
+        # Los padres (contratos) antes que sus partes
+        for archived in sorted(queryset, key=lambda a: a.model != 'contracts.Contract'):
+            try:
+                restore_object(archived)
+                restored += 1
+            except (ArchiveError, DatabaseError) as e:
+                self.message_user(request, f"No se ha podido restaurar {archived}: {e}", messages.ERROR)
+        if restored:
+            self.message_user(request, f"{restored} objeto(s) restaurado(s)", messages.SUCCESS)
+
+
+@admin.register(IdempotencyRecord)
+class IdempotencyRecordAdmin(admin.ModelAdmin):
+    list_display = ('key', 'status_code', 'locked_at', 'expires_at')
+    list_filter = ('status_code',)
+    search_fields = ('key',)
+    exclude = ('body',)
+    readonly_fields = ('key', 'request_hash', 'status_code', 'content_type', 'locked_at', 'expires_at')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,166 @@
+"""
+Archivado de registros eliminados lógicamente.
+
+archive_object() saca un registro de su tabla junto con todo lo que Django
+borraría en cascada (ítems, imágenes, técnicos, materiales usados...) y lo
+guarda serializado en ArchivedObject. Las filas que lo referencian con
+SET_NULL (por ejemplo los movimientos de MaterialControl) no se archivan:
+se anota el enlace para recuperarlo al restaurar.
+
+restore_object() vuelve a insertar los registros con sus ids originales. El
+registro restaurado sigue marcado como eliminado salvo que se pida lo contrario.
+Los ficheros adjuntos no se tocan, así que siguen disponibles al restaurar.
+"""
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.apps import apps
+from django.contrib.admin.utils import NestedObjects
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.utils import timezone
+
+from .models import ArchivedObject
+
+
+# Modelos con borrado lógico que se archivan, en el orden en que se procesan:
+# primero los hijos sueltos y después los padres, que arrastran al resto
+ARCHIVABLE_MODELS = (
+    'contracts.ContractReport',
+    'reports.WorkReport',
+    'tickets.Ticket',
+    'contracts.Contract',
+)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class _ArchiveEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder recorta las horas a milisegundos; aquí se guardan enteras."""
+
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            value = o.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return super().default(o)
+
+
+def _collect(obj, using):
+    collector = NestedObjects(using=using)
+    collector.collect([obj])
+    if collector.protected:
+        raise ArchiveError(
+            f"{obj._meta.label} #{obj.pk} tiene registros protegidos que impiden archivarlo"
+        )
+    collector.sort()
+    return collector
+
+
+def _set_null_links(collector, using):
+    """Filas que apuntan con SET_NULL a los registros que se van a archivar."""
+    links = []
+    for model, instances in collector.data.items():
+        pks = [instance.pk for instance in instances]
+        for rel in model._meta.related_objects:
+            if rel.many_to_many or rel.on_delete is not models.SET_NULL:
+                continue
+            rows = rel.related_model._base_manager.using(using).filter(
+                **{f'{rel.field.name}__in': pks}
+            ).values_list('pk', rel.field.attname)
+            grouped = defaultdict(list)
+            for pk, value in rows:
+                grouped[value].append(pk)
+            for value, referrers in grouped.items():
+                links.append({
+                    'model': rel.related_model._meta.label,
+                    'field': rel.field.attname,
+                    'value': value,
+                    'pks': referrers,
+                })
+    return links
+
+
+def archive_object(obj, using=DEFAULT_DB_ALIAS):
+    """Mueve `obj` y sus dependientes a ArchivedObject. Devuelve el ArchivedObject."""
+    with transaction.atomic(using=using):
+        collector = _collect(obj, using)
+        # collector.data queda ordenado para borrar (hijos antes que padres);
+        # se guarda al revés para poder insertar en orden al restaurar
+        instances = [
+            instance
+            for model, model_instances in reversed(collector.data.items())
+            for instance in model_instances
+        ]
+        archived = ArchivedObject.objects.using(using).create(
+            model=obj._meta.label,
+            object_id=str(obj.pk),
+            label=str(obj)[:255],
+            deleted_at=getattr(obj, 'deleted_at', None),
+            payload={
+                'objects': json.loads(serializers.serialize('json', instances, cls=_ArchiveEncoder)),
+                'set_null': _set_null_links(collector, using),
+            },
+        )
+        obj.__class__._base_manager.using(using).filter(pk=obj.pk).delete()
+    return archived
+
+
+def restore_object(archived, undelete=False, using=DEFAULT_DB_ALIAS):
+    """Restaura un ArchivedObject y lo elimina del archivo. Devuelve el objeto principal."""
+    with transaction.atomic(using=using):
+        payload = archived.payload
+        restored = None
+        for deserialized in serializers.deserialize('json', json.dumps(payload['objects']), using=using):
+            deserialized.save(using=using)
+            obj = deserialized.object
+            if obj._meta.label == archived.model and str(obj.pk) == archived.object_id:
+                restored = obj
+
+        for link in payload['set_null']:
+            model = apps.get_model(link['model'])
+            model._base_manager.using(using).filter(
+                pk__in=link['pks'], **{link['field']: None}
+            ).update(**{link['field']: link['value']})
+
+        if restored is None:
+            raise ArchiveError(f"El archivo de {archived} no contiene el objeto principal")
+        if undelete:
+            restored.undelete()
+        archived.delete()
+    return restored
+
+
+def archive_deleted(model_labels=ARCHIVABLE_MODELS, older_than_days=365, limit=None,
+                    dry_run=False, using=DEFAULT_DB_ALIAS):
+    """
+    Archiva los registros eliminados hace más de `older_than_days` días.
+    Cada registro se archiva en su propia transacción para no bloquear las
+    tablas durante todo el proceso. Devuelve {modelo: registros archivados}.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    result = {}
+    for label in model_labels:
+        model = apps.get_model(label)
+        queryset = model.objects.only_deleted().using(using).filter(
+            deleted_at__lt=cutoff
+        ).order_by('deleted_at', 'pk')
+        if limit:
+            queryset = queryset[:limit]
+
+        if dry_run:
+            result[label] = queryset.count()
+            continue
+
+        archived = 0
+        for pk in list(queryset.values_list('pk', flat=True)):
+            # Puede haberse archivado ya como dependiente de un registro anterior
+            obj = model._base_manager.using(using).filter(pk=pk).first()
+            if obj is not None:
+                archive_object(obj, using=using)
+                archived += 1
+        result[label] = archived
+    return result
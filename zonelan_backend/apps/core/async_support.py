@@ -0,0 +1,85 @@
+"""
+Soporte para las vistas asíncronas que se sirven en modo ASGI (ASYNC_VIEWS).
+
+- async_api_view: autenticación JWT equivalente a la de DRF para vistas `async def`.
+- get_http_client: cliente httpx compartido (con pool de conexiones) por bucle de eventos.
+- aiter_file / aiter_upstream: iteradores asíncronos para respuestas en streaming.
+"""
+import asyncio
+import weakref
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+
+from apps.users.authentication import CachedJWTAuthentication
+
+
+_authenticator = CachedJWTAuthentication()
+_clients = weakref.WeakKeyDictionary()
+
+
+def async_api_view(view):
+    """
+    Decorador para vistas `async def` de solo lectura. Autentica con el mismo
+    token JWT que el resto de la API y devuelve 401 en formato DRF si falla.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return JsonResponse({'detail': f'Método "{request.method}" no permitido.'}, status=405)
+        try:
+            result = await sync_to_async(_authenticator.authenticate)(request)
+        except AuthenticationFailed as exc:
+            return JsonResponse({'detail': str(exc.detail)}, status=401)
+        if result is None:
+            return JsonResponse({'detail': str(NotAuthenticated.default_detail)}, status=401)
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def get_http_client():
+    """
+    Cliente httpx.AsyncClient compartido por todas las peticiones del bucle
+    de eventos actual, para reutilizar conexiones con servicios externos.
+    """
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=settings.HTTP_CLIENT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            ),
+            follow_redirects=True,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aiter_upstream(upstream):
+    """Reenvía el cuerpo de una respuesta httpx y la cierra al terminar."""
+    try:
+        async for chunk in upstream.aiter_bytes():
+            yield chunk
+    finally:
+        await upstream.aclose()
+
+
+async def aiter_file(path, chunk_size=64 * 1024):
+    """Lee un fichero por bloques sin bloquear el bucle de eventos."""
+    handle = await asyncio.to_thread(open, path, 'rb')
+    try:
+        while True:
+            chunk = await asyncio.to_thread(handle.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
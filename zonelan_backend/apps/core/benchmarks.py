@@ -0,0 +1,418 @@
+"""
+Utilidades para medir el rendimiento de la API contra una base de datos sembrada.
+
+Arranca el servidor de pruebas de Django en un hilo (LiveServerThread) contra
+la base de datos configurada, y lanza escenarios HTTP reales con un token JWT.
+Lo usan los comandos benchmark_endpoints y stress_stock.
+
+render_benchmark() compara además, sobre respuestas reales, los renderers
+(JSON de DRF, orjson, MessagePack) y la compresión (gzip, brotli); lo usa el
+comando benchmark_renderers.
+"""
+import gzip
+import http.client
+import json
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.test.testcases import LiveServerThread
+from django.test.utils import override_settings
+from django.urls import resolve
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .renderers import MessagePackRenderer, ORJSONRenderer
+
+
+BENCHMARK_SETTINGS = {
+    'SECURE_SSL_REDIRECT': False,
+    'ALLOWED_HOSTS': ['*'],
+}
+
+
+@contextmanager
+def live_server(extra_middleware=('apps.core.middleware.QueryCountMiddleware',
+                                  'apps.core.middleware.DBConnectionTimingMiddleware'), **overrides):
+    """
+    Arranca el servidor de pruebas de Django contra la base de datos actual
+    y devuelve (host, puerto). El servidor se detiene al salir del bloque.
+    """
+    middleware = list(settings.MIDDLEWARE) + [m for m in extra_middleware if m not in settings.MIDDLEWARE]
+    with override_settings(MIDDLEWARE=middleware, **{**BENCHMARK_SETTINGS, **overrides}):
+        server = LiveServerThread('localhost', lambda handler: handler)
+        server.daemon = True
+        server.start()
+        server.is_ready.wait()
+        if server.error:
+            raise server.error
+        try:
+            yield server.host, server.port
+        finally:
+            server.terminate()
+
+
+def access_token_for(user):
+    """Emite un token de acceso JWT para el usuario indicado."""
+    return str(RefreshToken.for_user(user).access_token)
+
+
+class ApiClient:
+    """Cliente HTTP mínimo con conexión persistente (uno por hilo)."""
+
+    def __init__(self, host, port, token, timeout=60):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None, form=False):
+        all_headers = {'Authorization': f'Bearer {self.token}', 'Accept': 'application/json'}
+        payload = None
+        if body is not None and form:
+            payload = urlencode(body).encode()
+            all_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif body is not None:
+            payload = json.dumps(body).encode()
+            all_headers['Content-Type'] = 'application/json'
+        all_headers.update(headers or {})
+
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=all_headers)
+                response = self.conn.getresponse()
+                content = response.read()
+                return ApiResponse(response.status, dict(response.getheaders()), content)
+            except (http.client.HTTPException, ConnectionError, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+@dataclass
+class ApiResponse:
+    status: int
+    headers: Dict[str, str]
+    content: bytes
+
+    @property
+    def queries(self):
+        try:
+            return int(self.headers.get('X-DB-Queries', 0))
+        except ValueError:
+            return 0
+
+    @property
+    def db_connect(self):
+        """(ms, conexión nueva) según la cabecera Server-Timing, o None si no viene."""
+        match = re.search(r'db-connect;dur=([\d.]+);desc="(\w+)"', self.headers.get('Server-Timing', ''))
+        if not match:
+            return None
+        return float(match.group(1)), match.group(2) == 'new'
+
+    def json(self):
+        return json.loads(self.content or b'null')
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano (values no tiene por qué estar ordenado)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class Scenario:
+    """
+    Escenario de benchmark. `run` recibe (cliente, contexto) y devuelve la
+    lista de respuestas de las peticiones que forman una iteración.
+    """
+    name: str
+    description: str
+    run: Callable[['ApiClient', dict], List[ApiResponse]]
+    writes: bool = False
+
+
+SCENARIOS: Dict[str, Scenario] = {}
+
+
+def register(name, description, writes=False):
+    def decorator(func):
+        SCENARIOS[name] = Scenario(name=name, description=description, run=func, writes=writes)
+        return func
+    return decorator
+
+
+def build_context(user):
+    """
+    Selecciona en la base de datos sembrada los objetos sobre los que
+    trabajan los escenarios de escritura.
+    """
+    from apps.customers.models import Customer
+    from apps.materials.models import Material
+    from apps.storage.models import MaterialLocation
+
+    location = (MaterialLocation.objects.select_related('material')
+                .order_by('-quantity').first())
+    material = location.material if location else Material.objects.order_by('-quantity').first()
+    customer = Customer.objects.order_by('pk').first()
+    return {
+        'user_id': user.id,
+        'material_id': material.id if material else None,
+        'location_id': location.id if location else None,
+        'customer_id': customer.id if customer else None,
+        'search': 'Router',
+    }
+
+
+@register('materials_list', 'Listado de materiales')
+def materials_list(client, ctx):
+    return [client.request('GET', '/materials/materials/')]
+
+
+@register('locations_list', 'Listado de ubicaciones de material')
+def locations_list(client, ctx):
+    return [client.request('GET', '/storage/locations/')]
+
+
+@register('movement_create', 'Entrada de material en una ubicación', writes=True)
+def movement_create(client, ctx):
+    return [client.request('POST', '/storage/movements/', {
+        'material': ctx['material_id'],
+        'operation': 'ADD',
+        'quantity': 1,
+        'target_location': ctx['location_id'],
+        'user': ctx['user_id'],
+        'notes': 'benchmark',
+    })]
+
+
+@register('ticket_create', 'Creación de ticket y alta de un ítem con ubicación', writes=True)
+def ticket_create(client, ctx):
+    created = client.request('POST', '/tickets/tickets/', {
+        'customer': ctx['customer_id'],
+        'notes': 'benchmark',
+    })
+    responses = [created]
+    if created.status == 201:
+        ticket_id = created.json()['id']
+        responses.append(client.request('POST', f'/tickets/tickets/{ticket_id}/items/', {
+            'material': ctx['material_id'],
+            'quantity': 1,
+            'location_id': ctx['location_id'],
+        }))
+    return responses
+
+
+@register('report_list', 'Listado de partes de trabajo')
+def report_list(client, ctx):
+    return [client.request('GET', '/reports/reports/')]
+
+
+@register('report_list_compressed', 'Listado de partes de trabajo con Accept-Encoding (br, gzip)')
+def report_list_compressed(client, ctx):
+    return [client.request('GET', '/reports/reports/', headers={'Accept-Encoding': 'br, gzip'})]
+
+
+@register('report_list_msgpack', 'Listado de partes de trabajo en MessagePack')
+def report_list_msgpack(client, ctx):
+    return [client.request('GET', '/reports/reports/', headers={'Accept': 'application/msgpack'})]
+
+
+@register('movements_list', 'Histórico de movimientos de material')
+def movements_list(client, ctx):
+    return [client.request('GET', '/storage/movements/')]
+
+
+@register('contract_dashboard', 'Dashboard de contratos')
+def contract_dashboard(client, ctx):
+    return [client.request('GET', '/contracts/dashboard/')]
+
+
+@register('incident_search', 'Búsqueda de incidencias')
+def incident_search(client, ctx):
+    return [client.request('GET', f"/incidents/incidents/?search={ctx['search']}")]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    iterations: int
+    errors: int
+    latencies_ms: List[float] = field(default_factory=list)
+    queries: List[int] = field(default_factory=list)
+    db_connect_ms: List[float] = field(default_factory=list)
+    new_connections: int = 0
+    elapsed: float = 0.0
+    first_error: Optional[str] = None
+
+    def summary(self):
+        return {
+            'p50_ms': round(percentile(self.latencies_ms, 50), 2),
+            'p95_ms': round(percentile(self.latencies_ms, 95), 2),
+            'throughput_rps': round(self.iterations / self.elapsed, 2) if self.elapsed else 0.0,
+            'queries': round(sum(self.queries) / len(self.queries), 1) if self.queries else 0.0,
+            'db_connect_ms': round(sum(self.db_connect_ms) / len(self.db_connect_ms), 3) if self.db_connect_ms else 0.0,
+            'new_connections': self.new_connections,
+            'iterations': self.iterations,
+            'errors': self.errors,
+        }
+
+
+def run_scenario(scenario, host, port, token, ctx, iterations, concurrency, warmup=0):
+    """Ejecuta `iterations` iteraciones del escenario repartidas en `concurrency` hilos."""
+    result = ScenarioResult(name=scenario.name, iterations=iterations, errors=0)
+    lock = threading.Lock()
+    pending = iter(range(iterations))
+
+    warm_client = ApiClient(host, port, token)
+    for _ in range(warmup):
+        scenario.run(warm_client, ctx)
+    warm_client.close()
+
+    def worker():
+        client = ApiClient(host, port, token)
+        try:
+            while True:
+                with lock:
+                    if next(pending, None) is None:
+                        return
+                started = time.perf_counter()
+                try:
+                    responses = scenario.run(client, ctx)
+                    failed = [r for r in responses if r.status >= 400]
+                    error = f'HTTP {failed[0].status}: {failed[0].content[:200]!r}' if failed else None
+                except Exception as exc:
+                    responses, error = [], repr(exc)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    result.latencies_ms.append(elapsed_ms)
+                    result.queries.append(sum(r.queries for r in responses))
+                    for timing in filter(None, (r.db_connect for r in responses)):
+                        result.db_connect_ms.append(timing[0])
+                        result.new_connections += int(timing[1])
+                    if error:
+                        result.errors += 1
+                        result.first_error = result.first_error or error
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def compare_to_baseline(current, baseline, threshold):
+    """
+    Compara las métricas con la línea base. Devuelve la lista de regresiones
+    (escenario, métrica, valor base, valor actual) que superan el umbral.
+    """
+    regressions = []
+    for name, metrics in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if base.get(metric) and metrics[metric] > base[metric] * (1 + threshold):
+                regressions.append((name, metric, base[metric], metrics[metric]))
+        if base.get('throughput_rps') and metrics['throughput_rps'] < base['throughput_rps'] * (1 - threshold):
+            regressions.append((name, 'throughput_rps', base['throughput_rps'], metrics['throughput_rps']))
+        # El número de consultas es determinista: cualquier aumento es una regresión
+        if metrics['queries'] > base.get('queries', metrics['queries']):
+            regressions.append((name, 'queries', base['queries'], metrics['queries']))
+    return regressions
+
+
+# Respuestas grandes sobre las que se comparan renderers y compresión
+RENDER_PAYLOAD_PATHS = ('/reports/reports/', '/storage/movements/', '/storage/locations/')
+
+
+def collect_payloads(user, paths=RENDER_PAYLOAD_PATHS):
+    """Datos (response.data) de las vistas indicadas, sin renderizar."""
+    factory = APIRequestFactory()
+    payloads = {}
+    with override_settings(**BENCHMARK_SETTINGS):
+        for path in paths:
+            request = factory.get(path)
+            force_authenticate(request, user=user)
+            match = resolve(path)
+            response = match.func(request, *match.args, **match.kwargs)
+            payloads[path] = response.data
+    return payloads
+
+
+def renderer_options():
+    options = [('drf-json', JSONRenderer()), ('orjson', ORJSONRenderer())]
+    try:
+        import msgpack  # noqa: F401
+        options.append(('msgpack', MessagePackRenderer()))
+    except ImportError:
+        pass
+    return options
+
+
+def compression_options():
+    options = [
+        ('gzip-1', lambda body: gzip.compress(body, compresslevel=1, mtime=0)),
+        ('gzip-6', lambda body: compress_string(body, max_random_bytes=100)),
+    ]
+    try:
+        import brotli
+        options += [
+            ('br-5', lambda body: brotli.compress(body, quality=5)),
+            ('br-11', lambda body: brotli.compress(body, quality=11)),
+        ]
+    except ImportError:
+        pass
+    return options
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, percentile(timings, 50)
+
+
+def render_benchmark(payloads, repeat=20):
+    """
+    Mide la mediana de tiempo y el tamaño de cada renderer y de cada
+    compresión (sobre la salida de orjson). Devuelve una lista de dicts
+    con payload, option, ms y bytes.
+    """
+    rows = []
+    for path, data in payloads.items():
+        for name, renderer in renderer_options():
+            body, ms = _median_ms(lambda: renderer.render(data, renderer.media_type, {}), repeat)
+            rows.append({'payload': path, 'option': name, 'ms': round(ms, 3), 'bytes': len(body)})
+        body = ORJSONRenderer().render(data)
+        for name, compress in compression_options():
+            compressed, ms = _median_ms(lambda: compress(body), repeat)
+            rows.append({'payload': path, 'option': name, 'ms': round(ms, 3), 'bytes': len(compressed)})
+    return rows
@@ -0,0 +1,98 @@
+"""
+Peticiones GET condicionales (ETag / If-None-Match) para ViewSets de DRF.
+
+ConditionalGetMixin calcula un validador barato antes de serializar:
+
+- list: una única consulta de agregado sobre el queryset ya filtrado con el
+  máximo de cada campo de `conditional_list_fields` y el número de filas,
+  combinada con un hash de la ruta, los parámetros, el formato y el usuario.
+- retrieve: el `updated_at` del objeto (y, si se configuran, el máximo y el
+  número de filas de los campos relacionados de `conditional_object_fields`).
+
+Si coincide con el If-None-Match del cliente responde 304 sin serializar.
+
+Los datos de modelos sin `updated_at` que aparecen en la respuesta (por
+ejemplo el nombre del material) no cambian el validador; para acotar ese
+desfase el ETag cambia también cada CONDITIONAL_GET_MAX_STALENESS segundos.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+
+
+def _validator(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def _with_validator(response, etag):
+    # El navegador guarda la respuesta pero la revalida siempre con If-None-Match
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def _staleness_bucket():
+    max_staleness = settings.CONDITIONAL_GET_MAX_STALENESS
+    return int(time.time() // max_staleness) if max_staleness else 0
+
+
+class ConditionalGetMixin:
+    """
+    Mixin para ViewSets: añade ETag a list y retrieve y responde 304 Not
+    Modified cuando el cliente ya tiene la versión actual.
+
+    - conditional_list_fields: campos (pueden cruzar FKs, p. ej.
+      'tray__updated_at') cuyo máximo forma parte del validador del listado.
+    - conditional_object_fields: campos relacionados (p. ej.
+      'documents__uploaded_at') que se añaden al validador del detalle
+      cuando el serializer anida esos objetos.
+    """
+    conditional_list_fields = ('updated_at',)
+    conditional_object_fields = ()
+
+    def _request_fingerprint(self, request):
+        return (
+            request.path,
+            sorted(request.query_params.lists()),
+            getattr(request.accepted_renderer, 'format', ''),
+            getattr(request.user, 'pk', None),
+            _staleness_bucket(),
+        )
+
+    def get_list_etag(self, request, queryset):
+        aggregates = {
+            f'max_{index}': Max(field) for index, field in enumerate(self.conditional_list_fields)
+        }
+        values = queryset.order_by().aggregate(count=Count('pk'), **aggregates)
+        return _validator(*sorted(values.items()), *self._request_fingerprint(request))
+
+    def get_object_etag(self, request, obj):
+        values = {'updated_at': getattr(obj, 'updated_at', None)}
+        base = type(obj)._base_manager.filter(pk=obj.pk)
+        # Una consulta por relación: juntar varias relaciones inversas en el
+        # mismo JOIN multiplicaría las filas
+        for field in self.conditional_object_fields:
+            values[field] = tuple(base.aggregate(last=Max(field), count=Count(field)).values())
+        return _validator(obj.pk, *sorted(values.items()), *self._request_fingerprint(request))
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(request, self.filter_queryset(self.get_queryset()))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return _with_validator(not_modified, etag)
+        return _with_validator(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self.get_object_etag(request, instance)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return _with_validator(not_modified, etag)
+        serializer = self.get_serializer(instance)
+        return _with_validator(Response(serializer.data), etag)
@@ -0,0 +1,129 @@
+"""
+Enrutado de lecturas a la réplica de la base de datos.
+
+Por defecto todo va al primario. Solo se leen de la réplica (alias
+settings.DB_REPLICA_ALIAS) las consultas que se ejecutan dentro de
+`replica_reads()`, que activan:
+
+- ReplicaReadMixin: acciones de un ViewSet marcadas en `replica_safe_actions`.
+- replica_safe: vistas de función (estadísticas, histórico, exportaciones).
+
+Se vuelve al primario dentro de transacciones y durante la ventana de
+"leer lo escrito": tras una escritura del usuario (ReadYourWritesMiddleware)
+sus lecturas van al primario DB_REPLICA_READ_YOUR_WRITES_SECONDS segundos.
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_alias():
+    """Alias de la réplica, o None si no hay réplica configurada."""
+    alias = getattr(settings, 'DB_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _recent_write_key(user_id):
+    return f'replica:recent-write:{user_id}'
+
+
+def mark_recent_write(user):
+    """Envía las lecturas del usuario al primario durante la ventana de leer lo escrito."""
+    if replica_alias() and getattr(user, 'is_authenticated', False):
+        cache.set(_recent_write_key(user.pk), True, settings.DB_REPLICA_READ_YOUR_WRITES_SECONDS)
+
+
+def has_recent_write(user):
+    if not getattr(user, 'is_authenticated', False):
+        return False
+    return cache.get(_recent_write_key(user.pk), False)
+
+
+def replica_allowed(request):
+    """Indica si las lecturas de esta petición pueden ir a la réplica."""
+    return bool(replica_alias()) and not has_recent_write(getattr(request, 'user', None))
+
+
+@contextmanager
+def replica_reads():
+    """Dentro del bloque, las lecturas fuera de transacción van a la réplica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_safe(view):
+    """
+    Decorador para vistas de función de solo lectura que toleran el retraso
+    de la réplica. Con @api_view debe ir debajo, para que el usuario ya esté
+    autenticado cuando se evalúa la ventana de leer lo escrito.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not replica_allowed(request):
+                return await view(request, *args, **kwargs)
+            with replica_reads():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_allowed(request):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """
+    Mixin para ViewSets: las acciones listadas en `replica_safe_actions`
+    leen de la réplica.
+    """
+    replica_safe_actions = ('list',)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_safe_actions and replica_allowed(request):
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaRouter:
+    """Router de Django: réplica para las lecturas marcadas, primario para todo lo demás."""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        alias = replica_alias()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplica contienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        return db != replica_alias()
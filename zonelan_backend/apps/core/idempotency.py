@@ -0,0 +1,204 @@
+"""
+Claves de idempotencia (cabecera Idempotency-Key) para las acciones que
+crean registros y mueven stock.
+
+Un cliente que reintenta un POST (por ejemplo tras perder la conexión sin
+ver la respuesta) envía la misma Idempotency-Key. IdempotencyMixin ejecuta
+la petición en una sola transacción que:
+
+1. reserva la clave insertando un IdempotencyRecord "en curso" (la clave es
+   única en la tabla, así que una petición simultánea con la misma clave
+   espera en el INSERT a que termine la primera);
+2. ejecuta la acción y guarda el estado, el tipo y el cuerpo ya renderizado
+   (comprimido) de la respuesta;
+3. confirma a la vez los cambios de la acción y la respuesta guardada. Si el
+   proceso muere antes no queda nada confirmado y el reintento se ejecuta
+   de nuevo; si no, a un reintento con la misma clave y el mismo cuerpo le
+   devuelve esa respuesta tal cual, sin ejecutar la acción ni serializar
+   nada, con la cabecera Idempotent-Replayed: true. Si el cuerpo es
+   distinto responde 422.
+
+Las respuestas 5xx, 409 y 429 no se guardan: la transacción se deshace
+(con la reserva) para que el reintento vuelva a ejecutarse. Una reserva
+confirmada sin respuesta (de una versión anterior que la confirmaba por
+separado) responde 409 con Retry-After y pasados IDEMPOTENCY_LOCK_SECONDS
+se da por abandonada. Las claves caducan a los IDEMPOTENCY_TTL_SECONDS;
+purge_idempotency_keys borra las caducadas y, mientras tanto, una clave
+caducada se reutiliza como nueva.
+
+La clave se guarda como hash de (usuario, método, ruta, clave del cliente):
+dos usuarios o dos endpoints distintos pueden usar la misma clave.
+"""
+import hashlib
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import IdempotencyRecord
+
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+# Respuestas que no se guardan: el reintento debe ejecutarse de nuevo
+RETRYABLE_STATUSES = (status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class IdempotencyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Hay otra petición con la misma Idempotency-Key en curso. Vuelve a intentarlo en unos segundos.'
+    default_code = 'idempotency_in_progress'
+    # El exception_handler de DRF lo envía como Retry-After
+    wait = 1
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'La Idempotency-Key ya se ha usado con otros datos.'
+    default_code = 'idempotency_key_reused'
+
+
+class _Replay(Exception):
+    def __init__(self, record):
+        self.record = record
+        super().__init__(record.pk)
+
+
+def _digest(*parts):
+    return hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def record_key(request, client_key):
+    return _digest(getattr(request.user, 'pk', None), request.method, request.path, client_key)
+
+
+def request_hash(request):
+    """Hash de los datos ya parseados; de los ficheros solo cuentan nombre y tamaño."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: values for key, values in data.lists() if key not in request.FILES}
+    files = sorted(
+        (field, upload.name, upload.size)
+        for field, uploads in request.FILES.lists() for upload in uploads
+    )
+    return _digest(json.dumps(data, sort_keys=True, default=str), files)
+
+
+def _claim(key, fingerprint):
+    """
+    Reserva `key`. Devuelve el IdempotencyRecord reservado por esta petición
+    o lanza _Replay / IdempotencyInProgress / IdempotencyKeyReused.
+    """
+    now = timezone.now()
+    reset = {
+        'request_hash': fingerprint, 'status_code': None, 'content_type': '', 'body': None,
+        'locked_at': now, 'expires_at': now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+    }
+    try:
+        # Savepoint propio: si la petición va en una transacción, el
+        # IntegrityError no la deja inservible
+        with transaction.atomic():
+            return IdempotencyRecord.objects.create(key=key, **reset)
+    except IntegrityError:
+        pass
+
+    # Lectura con bloqueo: ve la fila que acaba de confirmar la otra petición
+    # aunque esta transacción ya tenga su propia instantánea
+    record = IdempotencyRecord.objects.select_for_update().filter(key=key).first()
+    if record is None:
+        # Se ha purgado entre el INSERT y la lectura
+        return _claim(key, fingerprint)
+
+    records = IdempotencyRecord.objects.filter(pk=record.pk)
+    if record.expires_at <= now:
+        stale = records.filter(expires_at__lte=now)
+    elif record.status_code is None:
+        stale = records.filter(
+            status_code__isnull=True,
+            locked_at__lte=now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+        )
+    else:
+        if record.request_hash != fingerprint:
+            raise IdempotencyKeyReused()
+        raise _Replay(record)
+
+    # Caducada o abandonada: la toma solo quien consiga el UPDATE condicionado
+    if stale.update(**reset):
+        for name, value in reset.items():
+            setattr(record, name, value)
+        return record
+    raise IdempotencyInProgress()
+
+
+def _replay_response(record):
+    response = HttpResponse(
+        zlib.decompress(record.body) if record.body else b'',
+        status=record.status_code,
+        content_type=record.content_type or None,
+    )
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+class IdempotencyMixin:
+    """
+    Mixin para ViewSets: las acciones de `idempotent_actions` aceptan la
+    cabecera Idempotency-Key. Sin cabecera la acción funciona como siempre.
+    """
+    idempotent_actions = ('create',)
+
+    def dispatch(self, request, *args, **kwargs):
+        self._idempotency_record = None
+        action = self.action_map.get(request.method.lower()) if hasattr(self, 'action_map') else None
+        if HEADER not in request.headers or action not in self.idempotent_actions:
+            return super().dispatch(request, *args, **kwargs)
+        # Reserva, acción y respuesta guardada se confirman juntas
+        with transaction.atomic():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        client_key = request.headers.get(HEADER)
+        if client_key is None or self.action not in self.idempotent_actions:
+            return
+        client_key = client_key.strip()
+        if not client_key or len(client_key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f'Debe tener entre 1 y {MAX_KEY_LENGTH} caracteres.'})
+        self._idempotency_record = _claim(record_key(request, client_key), request_hash(request))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Replay):
+            return _replay_response(exc.record)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        record = getattr(self, '_idempotency_record', None)
+        if record is None:
+            return response
+        self._idempotency_record = None
+        if response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+            # Se deshacen la reserva y lo que haya escrito la acción
+            transaction.set_rollback(True)
+            return response
+        if hasattr(response, 'render'):
+            response.render()
+        IdempotencyRecord.objects.filter(pk=record.pk).update(
+            status_code=response.status_code,
+            content_type=response.get('Content-Type', ''),
+            body=zlib.compress(response.content) if response.content else None,
+        )
+        return response
+
+
+def purge_idempotency_keys():
+    """Borra las claves caducadas. Devuelve cuántas."""
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
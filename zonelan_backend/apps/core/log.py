@@ -0,0 +1,141 @@
+"""
+Logging asíncrono en JSON con identificador de petición.
+
+La configuración (settings.LOGGING) envía los registros a QueueListenerHandler,
+que solo los encola: la escritura en consola o fichero la hace un hilo aparte
+(QueueListener), de modo que registrar nunca bloquea una petición. Si la cola
+se llena, los registros se descartan en lugar de esperar; cuántos se han
+descartado se avisa con un WARNING como mucho cada DROPPED_REPORT_SECONDS
+segundos y al cerrar el proceso.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+_request_id = ContextVar('request_id', default='-')
+
+DROPPED_REPORT_SECONDS = 60
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def set_request_id(value=None):
+    """Fija el identificador de la petición en curso y devuelve el token para restaurarlo."""
+    return _request_id.set(value or uuid.uuid4().hex)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+class RequestIDFilter(logging.Filter):
+    """Añade `request_id` a cada registro. Debe ir en el handler de la cola."""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Una línea JSON por registro."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    QueueHandler que arranca su propio QueueListener con los handlers de destino.
+
+    En dictConfig los destinos se pasan como 'cfg://handlers.<nombre>'; como los
+    handlers se configuran por orden alfabético, el de la cola debe tener un
+    nombre posterior a los de destino (por ejemplo 'queue').
+    """
+
+    def __init__(self, handlers, queue_size=10000, respect_handler_level=True):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        self._reported = 0
+        self._last_report = 0.0
+        self._report_lock = threading.Lock()
+        # dictConfig solo resuelve las referencias 'cfg://' al acceder por índice
+        targets = [handlers[i] for i in range(len(handlers))]
+        self.listener = QueueListener(
+            self.queue, *targets, respect_handler_level=respect_handler_level
+        )
+        self.listener.start()
+
+    def prepare(self, record):
+        # Se conserva el registro (incluido request_id) para que lo formatee el
+        # destino; solo se resuelven el mensaje y la traza, que no se pueden encolar.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._report_lock:
+                self.dropped += 1
+            return
+        if self.dropped > self._reported and time.monotonic() - self._last_report >= DROPPED_REPORT_SECONDS:
+            report = self._dropped_report()
+            if report is not None:
+                try:
+                    self.queue.put_nowait(report)
+                except queue.Full:
+                    pass
+
+    def _dropped_report(self):
+        """Registro WARNING con los descartados desde el último aviso, o None si no hay."""
+        with self._report_lock:
+            pending = self.dropped - self._reported
+            if pending <= 0:
+                return None
+            self._reported = self.dropped
+            self._last_report = time.monotonic()
+        return logging.makeLogRecord({
+            'name': __name__,
+            'levelno': logging.WARNING,
+            'levelname': 'WARNING',
+            'msg': f"Cola de logging llena: {pending} registros descartados ({self.dropped} en total)",
+        })
+
+    def close(self):
+        # logging.shutdown() cierra el handler al salir: vacía la cola y para el hilo
+        if self.listener._thread is not None:
+            self.listener.stop()
+            # El hilo ya está parado: el último aviso va directo a los destinos
+            report = self._dropped_report()
+            if report is not None:
+                for handler in self.listener.handlers:
+                    if report.levelno >= handler.level:
+                        handler.handle(report)
+        super().close()
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.archive import ARCHIVABLE_MODELS, ArchiveError, archive_deleted
+
+
+class Command(BaseCommand):
+    help = ('Mueve a la tabla de archivo los tickets, partes y contratos eliminados '
+            'hace tiempo, junto con sus registros dependientes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SOFT_DELETE_ARCHIVE_DAYS,
+                            help='Antigüedad mínima de la eliminación, en días '
+                                 f'(por defecto {settings.SOFT_DELETE_ARCHIVE_DAYS})')
+        parser.add_argument('--model', action='append', choices=ARCHIVABLE_MODELS,
+                            help='Modelo a archivar; se puede repetir (por defecto todos)')
+        parser.add_argument('--limit', type=int,
+                            help='Máximo de registros por modelo en esta ejecución')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo cuenta los registros que se archivarían')
+
+    def handle(self, *args, **options):
+        # Se respeta el orden de ARCHIVABLE_MODELS aunque se indiquen en otro
+        labels = [label for label in ARCHIVABLE_MODELS
+                  if not options['model'] or label in options['model']]
+        try:
+            result = archive_deleted(
+                labels,
+                older_than_days=options['days'],
+                limit=options['limit'],
+                dry_run=options['dry_run'],
+            )
+        except ArchiveError as e:
+            raise CommandError(str(e))
+
+        verb = 'se archivarían' if options['dry_run'] else 'archivados'
+        for label, count in result.items():
+            self.stdout.write(f"{label}: {count} {verb}")
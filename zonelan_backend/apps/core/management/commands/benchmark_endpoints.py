@@ -0,0 +1,103 @@
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.benchmarks import (
+    SCENARIOS, access_token_for, build_context, compare_to_baseline,
+    live_server, run_scenario,
+)
+
+
+class Command(BaseCommand):
+    help = ('Lanza los escenarios de benchmark de la API contra la base de datos '
+            'configurada y los compara con la línea base guardada')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Escenario a ejecutar (repetible; por defecto todos)')
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Iteraciones por escenario (por defecto 50)')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Clientes en paralelo (por defecto 4)')
+        parser.add_argument('--warmup', type=int, default=3,
+                            help='Iteraciones de calentamiento sin medir (por defecto 3)')
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'),
+                            help='Fichero JSON con la línea base')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Margen de regresión tolerado (0.2 = 20%%)')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Guarda los resultados como nueva línea base')
+        parser.add_argument('--user', help='Usuario con el que se autentican las peticiones (por defecto el primer superusuario)')
+        parser.add_argument('--skip-writes', action='store_true',
+                            help='Omite los escenarios que escriben en la base de datos')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if not user:
+            raise CommandError('No hay usuario para autenticar las peticiones (usa --user o crea un superusuario)')
+
+        names = options['scenario'] or list(SCENARIOS)
+        scenarios = [SCENARIOS[name] for name in names
+                     if not (options['skip_writes'] and SCENARIOS[name].writes)]
+
+        ctx = build_context(user)
+        if any(s.writes for s in scenarios) and not all(ctx[k] for k in ('material_id', 'location_id', 'customer_id')):
+            raise CommandError('La base de datos no tiene datos suficientes; ejecuta antes seed_scale')
+
+        token = access_token_for(user)
+        results = {}
+        with live_server() as (host, port):
+            self.stdout.write(f'Servidor de pruebas en http://{host}:{port}/')
+            for scenario in scenarios:
+                result = run_scenario(scenario, host, port, token, ctx,
+                                      iterations=options['iterations'],
+                                      concurrency=options['concurrency'],
+                                      warmup=options['warmup'])
+                results[scenario.name] = result.summary()
+                self._report(scenario.name, results[scenario.name])
+                if result.errors:
+                    self.stdout.write(self.style.WARNING(f'  {result.errors} errores; primero: {result.first_error}'))
+
+        baseline_path = options['baseline']
+        baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as fh:
+                stored = json.load(fh)
+            baseline = stored.get('scenarios', {})
+            if stored.get('concurrency') != options['concurrency']:
+                self.stdout.write(self.style.WARNING(
+                    f"La línea base se midió con concurrencia {stored.get('concurrency')}; "
+                    f"los resultados no son directamente comparables"))
+
+        if options['update_baseline'] or not baseline:
+            os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+            merged = {**baseline, **results}
+            with open(baseline_path, 'w') as fh:
+                json.dump({'database': settings.DATABASES['default']['ENGINE'],
+                           'iterations': options['iterations'],
+                           'concurrency': options['concurrency'],
+                           'scenarios': merged}, fh, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {baseline_path}'))
+            return
+
+        regressions = compare_to_baseline(results, baseline, options['threshold'])
+        failed = [name for name, metrics in results.items() if metrics['errors']]
+        for name, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(f'Regresión en {name}.{metric}: {before} -> {after}'))
+        if regressions or failed:
+            raise CommandError(f'{len(regressions)} regresiones y {len(failed)} escenarios con errores')
+        self.stdout.write(self.style.SUCCESS('Sin regresiones respecto a la línea base'))
+
+    def _report(self, name, metrics):
+        self.stdout.write(
+            f"{name:<20} p50 {metrics['p50_ms']:>8.1f} ms  p95 {metrics['p95_ms']:>8.1f} ms  "
+            f"{metrics['throughput_rps']:>7.1f} req/s  {metrics['queries']:>6.1f} consultas  "
+            f"conexión BD {metrics['db_connect_ms']:.2f} ms ({metrics['new_connections']} nuevas)"
+        )
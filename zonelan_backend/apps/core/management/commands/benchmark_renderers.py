@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.benchmarks import RENDER_PAYLOAD_PATHS, collect_payloads, render_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Compara renderers (JSON de DRF, orjson, MessagePack) y compresiones '
+            '(gzip, brotli) sobre respuestas reales de la API')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append',
+                            help='Ruta de la API a medir (repetible; por defecto '
+                                 f"{', '.join(RENDER_PAYLOAD_PATHS)})")
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Repeticiones de cada medida (por defecto 20)')
+        parser.add_argument('--user', help='Usuario con el que se obtienen los datos (por defecto el primer superusuario)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if not user:
+            raise CommandError('No hay usuario para obtener los datos (usa --user o crea un superusuario)')
+
+        payloads = collect_payloads(user, options['path'] or RENDER_PAYLOAD_PATHS)
+        current = None
+        for row in render_benchmark(payloads, repeat=options['repeat']):
+            if row['payload'] != current:
+                current = row['payload']
+                self.stdout.write(current)
+            self.stdout.write(f"  {row['option']:<10} {row['ms']:>9.3f} ms  {row['bytes']:>10} bytes")
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.materials.compaction import compact_material_controls, compaction_cutoff
+
+
+class Command(BaseCommand):
+    help = ('Agrupa en resúmenes mensuales por material los movimientos de MaterialControl antiguos '
+            'y borra el detalle (se conservan los que tienen imagen de albarán)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=settings.MATERIAL_CONTROL_DETAIL_YEARS,
+                            help='Años de detalle que se conservan '
+                                 f'(por defecto {settings.MATERIAL_CONTROL_DETAIL_YEARS})')
+        parser.add_argument('--months', type=int,
+                            help='Máximo de meses a compactar en esta ejecución')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo cuenta los movimientos que se compactarían')
+
+    def handle(self, *args, **options):
+        cutoff = compaction_cutoff(options['years'])
+        self.stdout.write(f"Compactando movimientos anteriores a {cutoff:%Y-%m-%d}")
+
+        result = compact_material_controls(
+            options['years'],
+            dry_run=options['dry_run'],
+            limit_months=options['months'],
+        )
+        for month, entries, summaries in result:
+            self.stdout.write(f"{month:%Y-%m}: {entries} movimientos -> {summaries} resúmenes")
+
+        total = sum(entries for _, entries, _ in result)
+        verb = 'se compactarían' if options['dry_run'] else 'compactados'
+        self.stdout.write(self.style.SUCCESS(f"{total} movimientos {verb}"))
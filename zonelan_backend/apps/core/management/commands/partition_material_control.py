@@ -0,0 +1,58 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+
+from apps.materials.models import MaterialControl
+from apps.materials.partitioning import (
+    existing_partitions, extend_sql, initial_sql, merge_years_sql, month_floor,
+)
+
+
+class Command(BaseCommand):
+    help = ('Particiona por meses la tabla de MaterialControl en MariaDB y mantiene las particiones: '
+            'crea las de los próximos meses y fusiona por años las ya compactadas')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Meses futuros que deben tener partición propia (por defecto 3)')
+        parser.add_argument('--merge-years', action='store_true',
+                            help='Fusiona en particiones anuales los años anteriores al límite de compactación '
+                                 '(MATERIAL_CONTROL_DETAIL_YEARS)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Muestra el SQL sin ejecutarlo')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError('El particionado solo está disponible con MariaDB/MySQL')
+
+        now = datetime.now(dt_timezone.utc).replace(tzinfo=None)
+        last_month = month_floor(now)
+        for _ in range(options['months_ahead']):
+            last_month = last_month.replace(year=last_month.year + last_month.month // 12,
+                                            month=last_month.month % 12 + 1)
+
+        partitions = existing_partitions()
+        if not partitions:
+            oldest = MaterialControl.objects.aggregate(oldest=Min('date'))['oldest']
+            first_month = month_floor(oldest.astimezone(dt_timezone.utc) if oldest else now)
+            statements = initial_sql(first_month, last_month)
+        else:
+            statements = extend_sql(partitions, last_month)
+            if options['merge_years']:
+                statements += merge_years_sql(partitions, now.year - settings.MATERIAL_CONTROL_DETAIL_YEARS)
+
+        if not statements:
+            self.stdout.write('Las particiones ya están al día')
+            return
+
+        for sql in statements:
+            self.stdout.write(sql + ';')
+            if not options['dry_run']:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql)
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{len(statements)} sentencia(s) ejecutada(s)'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.idempotency import purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Borra las claves de idempotencia caducadas'
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys()
+        self.stdout.write(f"{deleted} claves de idempotencia eliminadas")
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Borra las marcas de registros borrados que ya no necesita /sync/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SYNC_TOMBSTONE_DAYS,
+                            help='Antigüedad mínima del borrado, en días '
+                                 f'(por defecto {settings.SYNC_TOMBSTONE_DAYS})')
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones(options['days'])
+        self.stdout.write(f"{deleted} marcas de borrado eliminadas")
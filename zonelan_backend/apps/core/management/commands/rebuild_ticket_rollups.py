@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.tickets.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de ventas por forma de pago y cliente a partir de los tickets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Solo desde este día (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since debe tener el formato AAAA-MM-DD')
+
+        rows = rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"Resumen de ventas reconstruido: {rows} filas"))
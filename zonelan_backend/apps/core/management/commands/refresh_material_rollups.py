@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.materials.rollups import catch_up, rebuild
+
+
+class Command(BaseCommand):
+    help = ('Pone al día el agregado diario de MaterialControl desde la última ejecución '
+            '(o lo reconstruye con --rebuild)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Borra y vuelve a calcular el agregado')
+        parser.add_argument('--since', help='Con --rebuild, solo desde este día (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            since = None
+            if options['since']:
+                since = parse_date(options['since'])
+                if since is None:
+                    raise CommandError('--since debe tener el formato AAAA-MM-DD')
+            rows = rebuild(since)
+            self.stdout.write(self.style.SUCCESS(f"Agregado reconstruido: {rows} filas"))
+            return
+
+        refreshed = catch_up()
+        self.stdout.write(self.style.SUCCESS(f"Agregado al día: {refreshed} días de material recalculados"))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from apps.core.archive import ArchiveError, restore_object
+from apps.core.models import ArchivedObject
+
+
+class Command(BaseCommand):
+    help = 'Restaura un registro archivado por archive_deleted junto con sus dependientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', nargs='?', help='Modelo, por ejemplo tickets.Ticket')
+        parser.add_argument('object_id', nargs='?', help='ID del registro')
+        parser.add_argument('--undelete', action='store_true',
+                            help='Además de restaurarlo, lo desmarca como eliminado')
+        parser.add_argument('--list', action='store_true',
+                            help='Lista los registros archivados del modelo (o de todos)')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            archived = ArchivedObject.objects.all()
+            if options['model']:
+                archived = archived.filter(model=options['model'])
+            for item in archived.defer('payload'):
+                deleted = f"{item.deleted_at:%Y-%m-%d}" if item.deleted_at else '-'
+                self.stdout.write(
+                    f"{item.model} {item.object_id}\t{item.label}\t"
+                    f"eliminado {deleted}\tarchivado {item.archived_at:%Y-%m-%d}"
+                )
+            return
+
+        if not options['model'] or not options['object_id']:
+            raise CommandError('Indica el modelo y el ID del registro, o usa --list')
+
+        archived = ArchivedObject.objects.filter(
+            model=options['model'], object_id=options['object_id']
+        ).first()
+        if archived is None:
+            raise CommandError(f"No hay ningún {options['model']} #{options['object_id']} archivado")
+
+        try:
+            obj = restore_object(archived, undelete=options['undelete'])
+        except (ArchiveError, DatabaseError) as e:
+            # Por ejemplo, un parte cuyo contrato también está archivado: hay que restaurar antes el contrato
+            raise CommandError(f"No se ha podido restaurar {archived}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Restaurado {archived}: {obj}"))
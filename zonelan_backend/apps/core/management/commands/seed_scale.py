@@ -0,0 +1,623 @@
+"""
+Genera un conjunto de datos sintético a escala de producción.
+
+Los datos son deterministas a partir de la semilla (y de la fecha final),
+referencialmente consistentes y se insertan con bulk_create, de modo que
+se pueden reproducir en local los problemas de rendimiento que aparecen
+con volúmenes reales.
+
+Ejemplos:
+    python manage.py seed_scale --seed 42
+    python manage.py seed_scale --scale 0.01          # 1% de los tamaños por defecto
+    python manage.py seed_scale --controls 500000 --tickets 50000
+"""
+import math
+import random
+import time
+from collections import defaultdict
+from itertools import accumulate
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from apps.contracts.models import (
+    Contract, ContractReport, ContractReportMaterial, ContractReportTechnician,
+    MaintenanceRecord,
+)
+from apps.customers.models import Customer
+from apps.incidents.models import Incident
+from apps.materials.models import Material, MaterialControl
+from apps.reports.models import MaterialUsed, ReportImage, TechnicianAssignment, WorkReport
+from apps.storage.models import Department, MaterialLocation, Shelf, Tray, Warehouse
+from apps.tickets.models import Ticket, TicketItem
+from apps.users.models import User
+
+
+# Tamaños por defecto (se multiplican por --scale, salvo la plantilla de técnicos)
+DEFAULT_SIZES = {
+    'technicians': 40,
+    'customers': 5000,
+    'materials': 20000,
+    'trays': 5000,
+    'tickets': 200000,
+    'incidents': 50000,
+    'contracts': 2000,
+    'controls': 2000000,
+}
+
+WAREHOUSES = 5
+DEPARTMENTS_PER_WAREHOUSE = 5
+TRAYS_PER_SHELF = 10
+
+MATERIAL_FAMILIES = [
+    'Cable UTP Cat6', 'Cable UTP Cat5e', 'Cable coaxial RG6', 'Fibra monomodo',
+    'Conector RJ45', 'Latiguillo', 'Roseta', 'Canaleta', 'Tubo corrugado',
+    'Switch', 'Router', 'Punto de acceso', 'Cámara IP', 'Grabador NVR',
+    'Fuente de alimentación', 'Regleta', 'Bridas', 'Tornillería', 'Taco',
+    'Caja de registro', 'Disco duro', 'Batería SAI', 'Antena', 'Patch panel',
+]
+MATERIAL_VARIANTS = ['1m', '2m', '5m', '10m', '25m', '100m', 'blanco', 'negro', 'gris',
+                     '8 puertos', '16 puertos', '24 puertos', 'exterior', 'interior', 'PoE']
+INCIDENT_TOPICS = ['Sin conexión', 'Cámara sin imagen', 'Corte de fibra', 'Wifi lento',
+                   'Avería en centralita', 'Instalación nueva', 'Revisión de rack',
+                   'Cambio de router', 'Ampliación de red', 'Fallo eléctrico']
+CONTRACT_TOPICS = ['Mantenimiento de red', 'Mantenimiento CCTV', 'Soporte informático',
+                   'Mantenimiento de centralita', 'Mantenimiento de fibra']
+MAINTENANCE_FREQUENCIES = [code for code, _ in Contract.MAINTENANCE_FREQUENCY_CHOICES]
+PAYMENT_METHODS = [code for code, _ in Ticket.PAYMENT_METHOD_CHOICES]
+INCIDENT_STATUSES = [code for code, _ in Incident.STATUS_CHOICES]
+INCIDENT_PRIORITIES = [code for code, _ in Incident.PRIORITY_CHOICES]
+
+
+@contextmanager
+def without_auto_dates(*models):
+    """
+    Desactiva temporalmente auto_now/auto_now_add para poder insertar
+    fechas históricas repartidas en el tiempo.
+    """
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = False
+                field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def next_id(model):
+    """Primer identificador libre de la tabla (los ids se asignan explícitamente)."""
+    return (model.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos deterministas a escala de producción para pruebas de rendimiento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Semilla del generador aleatorio')
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Factor aplicado a todos los tamaños por defecto')
+        for name, size in DEFAULT_SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=None,
+                                help=f'Número de {name} (por defecto {size} × scale)')
+        parser.add_argument('--years', type=int, default=3, help='Años de histórico a generar')
+        parser.add_argument('--until', type=str, default=None,
+                            help='Fecha final del histórico (YYYY-MM-DD, por defecto hoy)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Tamaño de lote de bulk_create')
+
+    def handle(self, *args, **options):
+        sizes = {}
+        for name, size in DEFAULT_SIZES.items():
+            value = options[name]
+            if value is None:
+                value = size if name == 'technicians' else max(1, int(size * options['scale']))
+            sizes[name] = value
+
+        if options['until']:
+            try:
+                until = datetime.strptime(options['until'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--until debe tener el formato YYYY-MM-DD')
+        else:
+            until = date.today()
+
+        generator = ScaleDataGenerator(
+            seed=options['seed'],
+            sizes=sizes,
+            until=until,
+            years=options['years'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+            style=self.style,
+        )
+        started = time.perf_counter()
+        with without_auto_dates(
+            Warehouse, Department, Shelf, Tray, MaterialLocation, MaterialControl,
+            Ticket, Incident, WorkReport, ReportImage, Contract, MaintenanceRecord, ContractReport,
+        ):
+            generator.run()
+        self.stdout.write(self.style.SUCCESS(
+            f'Datos generados en {time.perf_counter() - started:.1f}s'
+        ))
+
+
+class ScaleDataGenerator:
+    """Genera e inserta los datos por bloques, manteniendo la coherencia del stock."""
+
+    def __init__(self, seed, sizes, until, years, batch_size, stdout, style):
+        self.rng = random.Random(seed)
+        self.sizes = sizes
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.style = style
+        end = datetime(until.year, until.month, until.day, tzinfo=dt_timezone.utc)
+        self.start = end - timedelta(days=365 * years)
+        self.span_seconds = (end - self.start).total_seconds()
+        # Saldo neto del histórico por material: debe cuadrar con Material.quantity
+        self.net = defaultdict(int)
+        self.controls_written = 0
+        self.pending_controls = []
+
+    # ------------------------------------------------------------------ utilidades
+
+    def log(self, message):
+        self.stdout.write(f'  {message}')
+
+    def random_datetime(self, after=None):
+        if after is not None:
+            remaining = max(60.0, self.span_seconds - (after - self.start).total_seconds())
+            return after + timedelta(seconds=self.rng.random() * min(remaining, 30 * 86400))
+        return self.start + timedelta(seconds=self.rng.random() * self.span_seconds)
+
+    def insert(self, model, objects):
+        for offset in range(0, len(objects), self.batch_size):
+            model.objects.bulk_create(objects[offset:offset + self.batch_size])
+
+    def add_control(self, **kwargs):
+        """Acumula una fila del histórico y actualiza el saldo neto del material."""
+        if kwargs['operation'] == 'ADD':
+            self.net[kwargs['material_id']] += kwargs['quantity']
+        elif kwargs['operation'] == 'REMOVE':
+            self.net[kwargs['material_id']] -= kwargs['quantity']
+        self.pending_controls.append(MaterialControl(id=self.control_id, **kwargs))
+        self.control_id += 1
+        if len(self.pending_controls) >= self.batch_size:
+            self.flush_controls()
+
+    def flush_controls(self):
+        if self.pending_controls:
+            MaterialControl.objects.bulk_create(self.pending_controls)
+            self.controls_written += len(self.pending_controls)
+            self.pending_controls = []
+
+    # ------------------------------------------------------------------ generación
+
+    def run(self):
+        self.control_id = next_id(MaterialControl)
+        with transaction.atomic():
+            self.create_users()
+            self.create_customers()
+            self.create_materials()
+            self.create_storage()
+        with transaction.atomic():
+            self.create_tickets()
+        with transaction.atomic():
+            self.create_incidents()
+        with transaction.atomic():
+            self.create_contracts()
+        with transaction.atomic():
+            self.create_general_ledger()
+            self.flush_controls()
+            self.balance_stock()
+            self.create_locations()
+
+    def create_users(self):
+        count = self.sizes['technicians']
+        last_code = User.objects.aggregate(m=Max('cod_worker'))['m']
+        first_code = int(last_code) + 1 if last_code and last_code.isdigit() else 1
+        if first_code + count - 1 > 999:
+            raise CommandError('cod_worker admite como máximo 999 usuarios')
+        password = make_password('zonelan-seed')
+        first_id = next_id(User)
+        users = [
+            User(
+                id=first_id + n,
+                username=f'tecnico{first_id + n}',
+                name=f'Técnico {first_id + n}',
+                email=f'tecnico{first_id + n}@seed.zonelan.local',
+                phone=f'6{self.rng.randint(10000000, 99999999)}',
+                cod_worker=f'{first_code + n:03d}',
+                type='User',
+                password=password,
+            )
+            for n in range(count)
+        ]
+        self.insert(User, users)
+        self.technician_ids = [u.id for u in users]
+        self.log(f'{count} técnicos')
+
+    def create_customers(self):
+        count = self.sizes['customers']
+        first_id = next_id(Customer)
+        customers = [
+            Customer(
+                id=first_id + n,
+                name=f'Cliente {first_id + n}',
+                business_name=f'Empresa {first_id + n} S.L.' if self.rng.random() < 0.6 else None,
+                tax_id=f'B{self.rng.randint(10000000, 99999999)}',
+                address=f'Calle {self.rng.randint(1, 500)}, Ceuta',
+                email=f'cliente{first_id + n}@seed.zonelan.local',
+                phone=f'9{self.rng.randint(10000000, 99999999)}',
+            )
+            for n in range(count)
+        ]
+        self.insert(Customer, customers)
+        self.customer_ids = [c.id for c in customers]
+        self.log(f'{count} clientes')
+
+    def create_materials(self):
+        count = self.sizes['materials']
+        first_id = next_id(Material)
+        materials = []
+        for n in range(count):
+            name = f'{self.rng.choice(MATERIAL_FAMILIES)} {self.rng.choice(MATERIAL_VARIANTS)} #{first_id + n}'
+            price = Decimal(self.rng.randint(50, 50000)) / 100
+            materials.append(Material(id=first_id + n, name=name, quantity=0, price=price))
+        self.insert(Material, materials)
+        self.materials = materials
+        self.material_ids = [m.id for m in materials]
+        self.prices = {m.id: m.price for m in materials}
+        # Distribución sesgada: unos pocos materiales concentran la mayoría de los movimientos.
+        # Pesos acumulados una sola vez: con weights= choices los recalcula en cada llamada
+        self.material_cum_weights = list(accumulate(1.0 / (rank + 1) ** 0.8 for rank in range(count)))
+        self.log(f'{count} materiales')
+
+    def pick_material(self):
+        return self.rng.choices(self.material_ids, cum_weights=self.material_cum_weights, k=1)[0]
+
+    def pick_materials(self, k):
+        return list(dict.fromkeys(self.pick_material() for _ in range(k)))
+
+    def create_storage(self):
+        tray_count = self.sizes['trays']
+        shelf_count = max(1, math.ceil(tray_count / TRAYS_PER_SHELF))
+
+        last_code = Warehouse.objects.filter(code__startswith='ALM-').aggregate(m=Max('code'))['m']
+        try:
+            first_code = int(last_code.split('-')[1]) + 1 if last_code else 1
+        except (ValueError, IndexError):
+            first_code = Warehouse.objects.count() + 1
+
+        wid, did, sid, tid = (next_id(m) for m in (Warehouse, Department, Shelf, Tray))
+        warehouses, departments, shelves, trays = [], [], [], []
+        for w in range(WAREHOUSES):
+            warehouses.append(Warehouse(
+                id=wid + w, name=f'Almacén {first_code + w}', code=f'ALM-{first_code + w:03d}',
+                location='Ceuta', created_at=self.start, updated_at=self.start,
+            ))
+            for d in range(DEPARTMENTS_PER_WAREHOUSE):
+                departments.append(Department(
+                    id=did + len(departments), warehouse_id=wid + w, name=f'Dependencia {d + 1}',
+                    code=f'DEP-{d + 1:03d}', created_at=self.start, updated_at=self.start,
+                ))
+
+        shelves_per_department = defaultdict(int)
+        for s in range(shelf_count):
+            department = departments[s % len(departments)]
+            shelves_per_department[department.id] += 1
+            number = shelves_per_department[department.id]
+            shelves.append(Shelf(
+                id=sid + s, department_id=department.id, name=f'Estantería {number}',
+                code=f'EST-{number:03d}', created_at=self.start, updated_at=self.start,
+            ))
+        for t in range(tray_count):
+            number = t % TRAYS_PER_SHELF + 1
+            trays.append(Tray(
+                id=tid + t, shelf_id=shelves[t // TRAYS_PER_SHELF].id, name=f'Balda {number}',
+                code=f'BAL-{number:03d}', created_at=self.start, updated_at=self.start,
+            ))
+
+        for model, objects in ((Warehouse, warehouses), (Department, departments),
+                               (Shelf, shelves), (Tray, trays)):
+            self.insert(model, objects)
+        self.tray_ids = [t.id for t in trays]
+        self.log(f'{len(warehouses)} almacenes, {len(departments)} dependencias, '
+                 f'{len(shelves)} estanterías, {len(trays)} baldas')
+
+    def create_tickets(self):
+        count = self.sizes['tickets']
+        first_id = next_id(Ticket)
+        first_item_id = item_id = next_id(TicketItem)
+
+        # Continuar la numeración diaria TK-YYYYMMDD-XXXX sin chocar con tickets existentes
+        last_sequence = defaultdict(int)
+        for number in Ticket.objects.filter(ticket_number__startswith='TK-').values_list('ticket_number', flat=True):
+            parts = number.split('-')
+            if len(parts) == 3 and parts[2].isdigit():
+                last_sequence[parts[1]] = max(last_sequence[parts[1]], int(parts[2]))
+
+        tickets, items = [], []
+        for n in range(count):
+            created_at = self.random_datetime()
+            day = created_at.strftime('%Y%m%d')
+            last_sequence[day] += 1
+            roll = self.rng.random()
+            status = 'PAID' if roll < 0.7 else ('CANCELED' if roll < 0.8 else 'PENDING')
+            ticket = Ticket(
+                id=first_id + n,
+                ticket_number=f'TK-{day}-{last_sequence[day]:04d}',
+                customer_id=self.rng.choice(self.customer_ids) if self.rng.random() < 0.8 else None,
+                created_at=created_at,
+                created_by_id=self.rng.choice(self.technician_ids),
+                status=status,
+                payment_method=self.rng.choice(PAYMENT_METHODS),
+                paid_at=self.random_datetime(after=created_at) if status == 'PAID' else None,
+                canceled_at=self.random_datetime(after=created_at) if status == 'CANCELED' else None,
+            )
+            if self.rng.random() < 0.02:
+                ticket.is_deleted = True
+                ticket.deleted_at = self.random_datetime(after=created_at)
+
+            total = Decimal('0')
+            for material_id in self.pick_materials(self.rng.randint(1, 4)):
+                quantity = self.rng.randint(1, 5)
+                discount = Decimal(self.rng.choice([0, 0, 0, 5, 10]))
+                item = TicketItem(
+                    id=item_id, ticket_id=ticket.id, material_id=material_id,
+                    quantity=Decimal(quantity), unit_price=self.prices[material_id],
+                    discount_percentage=discount,
+                )
+                item_id += 1
+                items.append(item)
+                total += item.total_price
+                self.add_control(
+                    user_id=ticket.created_by_id, material_id=material_id, date=created_at,
+                    quantity=quantity, operation='REMOVE', reason='VENTA', ticket_id=ticket.id,
+                )
+                if status == 'CANCELED':
+                    self.add_control(
+                        user_id=ticket.created_by_id, material_id=material_id, date=ticket.canceled_at,
+                        quantity=quantity, operation='ADD', reason='DEVOLUCION', ticket_id=ticket.id,
+                    )
+            ticket.total_amount = total.quantize(Decimal('0.01'))
+            tickets.append(ticket)
+
+            if len(tickets) >= self.batch_size:
+                Ticket.objects.bulk_create(tickets)
+                self.insert(TicketItem, items)
+                tickets, items = [], []
+        Ticket.objects.bulk_create(tickets)
+        self.insert(TicketItem, items)
+        self.log(f'{count} tickets con {item_id - first_item_id} ítems')
+
+    def create_incidents(self):
+        count = self.sizes['incidents']
+        incident_id = next_id(Incident)
+        first_report_id = report_id = next_id(WorkReport)
+        ids = {model: next_id(model) for model in (ReportImage, TechnicianAssignment, MaterialUsed)}
+
+        incidents, reports, images, assignments, used = [], [], [], [], []
+        for n in range(count):
+            created_at = self.random_datetime()
+            status = self.rng.choice(INCIDENT_STATUSES)
+            incident = Incident(
+                id=incident_id + n,
+                title=f'{self.rng.choice(INCIDENT_TOPICS)} #{incident_id + n}',
+                description='Incidencia generada para pruebas de carga. ' * self.rng.randint(1, 6),
+                customer_id=self.rng.choice(self.customer_ids),
+                reported_by_id=self.rng.choice(self.technician_ids),
+                status=status,
+                priority=self.rng.choice(INCIDENT_PRIORITIES),
+                created_at=created_at,
+                updated_at=self.random_datetime(after=created_at),
+                resolution_notes='Resuelta en visita' if status in ('RESOLVED', 'CLOSED') else None,
+            )
+            incidents.append(incident)
+
+            for _ in range(self.rng.choice([0, 1, 1, 1, 2])):
+                worked_at = self.random_datetime(after=created_at)
+                completed = self.rng.random() < 0.8
+                report = WorkReport(
+                    id=report_id, date=worked_at.date(), incident_id=incident.id,
+                    description='Trabajo realizado en las instalaciones del cliente. ' * self.rng.randint(1, 8),
+                    hours_worked=Decimal(self.rng.randint(1, 16)) / 2 if completed else None,
+                    status='COMPLETED' if completed else 'DRAFT',
+                    created_at=worked_at, updated_at=worked_at,
+                )
+                report_id += 1
+                if self.rng.random() < 0.03:
+                    report.is_deleted = True
+                    report.status = 'DELETED'
+                    report.deleted_at = self.random_datetime(after=worked_at)
+                reports.append(report)
+
+                for technician_id in self.rng.sample(self.technician_ids, self.rng.randint(1, min(2, len(self.technician_ids)))):
+                    assignments.append(TechnicianAssignment(
+                        id=ids[TechnicianAssignment], report_id=report.id, technician_id=technician_id,
+                    ))
+                    ids[TechnicianAssignment] += 1
+                for _ in range(self.rng.randint(0, 3)):
+                    image_type = self.rng.choice(['BEFORE', 'AFTER'])
+                    images.append(ReportImage(
+                        id=ids[ReportImage], report_id=report.id, image_type=image_type,
+                        image=f'report_images/seed/{ids[ReportImage]}.jpg', created_at=worked_at,
+                    ))
+                    ids[ReportImage] += 1
+                for material_id in self.pick_materials(self.rng.randint(0, 3)):
+                    quantity = self.rng.randint(1, 10)
+                    used.append(MaterialUsed(
+                        id=ids[MaterialUsed], report_id=report.id, material_id=material_id, quantity=quantity,
+                    ))
+                    ids[MaterialUsed] += 1
+                    self.add_control(
+                        user_id=self.rng.choice(self.technician_ids), material_id=material_id, date=worked_at,
+                        quantity=quantity, operation='REMOVE', reason='USO', report_id=report.id,
+                    )
+
+            if len(incidents) >= self.batch_size:
+                self.flush_incidents(incidents, reports, images, assignments, used)
+                incidents, reports, images, assignments, used = [], [], [], [], []
+        self.flush_incidents(incidents, reports, images, assignments, used)
+        self.log(f'{count} incidencias con {report_id - first_report_id} partes de trabajo')
+
+    def flush_incidents(self, incidents, reports, images, assignments, used):
+        self.insert(Incident, incidents)
+        self.insert(WorkReport, reports)
+        self.insert(TechnicianAssignment, assignments)
+        self.insert(ReportImage, images)
+        self.insert(MaterialUsed, used)
+
+    def create_contracts(self):
+        count = self.sizes['contracts']
+        contract_id = next_id(Contract)
+        ids = {model: next_id(model) for model in (
+            MaintenanceRecord, ContractReport, ContractReportTechnician, ContractReportMaterial,
+        )}
+        today = (self.start + timedelta(seconds=self.span_seconds)).date()
+
+        contracts, records, reports, technicians, materials = [], [], [], [], []
+        for n in range(count):
+            created_at = self.random_datetime()
+            start_date = created_at.date()
+            end_date = start_date + timedelta(days=365 * self.rng.randint(1, 4)) if self.rng.random() < 0.8 else None
+            requires_maintenance = self.rng.random() < 0.7
+            contract = Contract(
+                id=contract_id + n,
+                customer_id=self.rng.choice(self.customer_ids),
+                title=f'{self.rng.choice(CONTRACT_TOPICS)} #{contract_id + n}',
+                description='Contrato generado para pruebas de carga. ' * self.rng.randint(1, 10),
+                status='EXPIRED' if end_date and end_date < today else self.rng.choice(['ACTIVE', 'ACTIVE', 'INACTIVE']),
+                start_date=start_date,
+                end_date=end_date,
+                requires_maintenance=requires_maintenance,
+                maintenance_frequency=self.rng.choice(MAINTENANCE_FREQUENCIES) if requires_maintenance else None,
+                next_maintenance_date=today + timedelta(days=self.rng.randint(-30, 180)) if requires_maintenance else None,
+                observations='Observaciones del contrato. ' * self.rng.randint(0, 5),
+                created_at=created_at,
+                updated_at=self.random_datetime(after=created_at),
+                created_by_id=self.rng.choice(self.technician_ids),
+            )
+            if self.rng.random() < 0.02:
+                contract.is_deleted = True
+                contract.deleted_at = self.random_datetime(after=created_at)
+            contracts.append(contract)
+
+            if requires_maintenance:
+                for _ in range(self.rng.randint(0, 6)):
+                    done_at = self.random_datetime(after=created_at)
+                    records.append(MaintenanceRecord(
+                        id=ids[MaintenanceRecord], contract_id=contract.id, date=done_at.date(),
+                        maintenance_type=self.rng.choice(['PREVENTIVE', 'PREVENTIVE', 'CORRECTIVE', 'INSPECTION']),
+                        performed_by_id=self.rng.choice(self.technician_ids), status='COMPLETED',
+                        created_at=done_at, updated_at=done_at,
+                    ))
+                    ids[MaintenanceRecord] += 1
+
+            for _ in range(self.rng.randint(0, 8)):
+                worked_at = self.random_datetime(after=created_at)
+                completed = self.rng.random() < 0.85
+                report = ContractReport(
+                    id=ids[ContractReport], contract_id=contract.id, date=worked_at.date(),
+                    description='Revisión periódica según contrato. ' * self.rng.randint(1, 8),
+                    hours_worked=Decimal(self.rng.randint(1, 12)) / 2 if completed else None,
+                    status='COMPLETED' if completed else 'DRAFT',
+                    performed_by_id=self.rng.choice(self.technician_ids),
+                    created_at=worked_at, updated_at=worked_at,
+                )
+                ids[ContractReport] += 1
+                reports.append(report)
+                for technician_id in self.rng.sample(self.technician_ids, self.rng.randint(0, min(2, len(self.technician_ids)))):
+                    technicians.append(ContractReportTechnician(
+                        id=ids[ContractReportTechnician], contract_report_id=report.id, technician_id=technician_id,
+                    ))
+                    ids[ContractReportTechnician] += 1
+                for material_id in self.pick_materials(self.rng.randint(0, 2)):
+                    quantity = self.rng.randint(1, 6)
+                    materials.append(ContractReportMaterial(
+                        id=ids[ContractReportMaterial], contract_report_id=report.id,
+                        material_id=material_id, quantity=quantity,
+                    ))
+                    ids[ContractReportMaterial] += 1
+                    self.add_control(
+                        user_id=report.performed_by_id, material_id=material_id, date=worked_at,
+                        quantity=quantity, operation='REMOVE', reason='USO', contract_report_id=report.id,
+                        notes=f'Uso en reporte de contrato #{report.id}',
+                    )
+
+        self.insert(Contract, contracts)
+        self.insert(MaintenanceRecord, records)
+        self.insert(ContractReport, reports)
+        self.insert(ContractReportTechnician, technicians)
+        self.insert(ContractReportMaterial, materials)
+        self.log(f'{count} contratos, {len(records)} mantenimientos, {len(reports)} reportes de contrato')
+
+    def create_general_ledger(self):
+        """Completa el histórico con compras, cuadres y traslados hasta el tamaño pedido."""
+        remaining = self.sizes['controls'] - self.controls_written - len(self.pending_controls)
+        for _ in range(max(0, remaining)):
+            material_id = self.pick_material()
+            roll = self.rng.random()
+            if roll < 0.6:
+                kwargs = {'operation': 'ADD', 'reason': 'COMPRA', 'quantity': self.rng.randint(5, 200)}
+                if self.rng.random() < 0.3:
+                    kwargs['invoice_image'] = f'material_invoices/seed/{self.control_id}.jpg'
+            elif roll < 0.85:
+                kwargs = {'operation': 'TRANSFER', 'reason': 'TRASLADO', 'quantity': self.rng.randint(1, 50)}
+            else:
+                kwargs = {'operation': self.rng.choice(['ADD', 'REMOVE']), 'reason': 'CUADRE',
+                          'quantity': self.rng.randint(1, 5)}
+            self.add_control(
+                user_id=self.rng.choice(self.technician_ids), material_id=material_id,
+                date=self.random_datetime(), **kwargs,
+            )
+        self.log(f'{self.controls_written + len(self.pending_controls)} movimientos de control de material')
+
+    def balance_stock(self):
+        """
+        Garantiza stock no negativo añadiendo una compra inicial donde haga falta
+        y fija Material.quantity al saldo neto del histórico.
+        """
+        for material in self.materials:
+            net = self.net[material.id]
+            if net < 0:
+                opening = -net + self.rng.randint(0, 100)
+                self.add_control(
+                    user_id=self.rng.choice(self.technician_ids), material_id=material.id,
+                    date=self.start, quantity=opening, operation='ADD', reason='COMPRA',
+                    notes='Stock inicial',
+                )
+            material.quantity = self.net[material.id]
+        self.flush_controls()
+        Material.objects.bulk_update(self.materials, ['quantity'], batch_size=self.batch_size)
+
+    def create_locations(self):
+        """Reparte la mayor parte del stock de cada material entre 0-3 baldas."""
+        location_id = next_id(MaterialLocation)
+        locations = []
+        for material in self.materials:
+            tray_count = self.rng.choice([0, 1, 1, 2, 3])
+            if not tray_count or material.quantity <= 0:
+                continue
+            allocated = int(material.quantity * self.rng.uniform(0.6, 1.0))
+            trays = self.rng.sample(self.tray_ids, min(tray_count, len(self.tray_ids)))
+            cuts = sorted(self.rng.randint(0, allocated) for _ in range(len(trays) - 1))
+            for tray_id, low, high in zip(trays, [0] + cuts, cuts + [allocated]):
+                updated_at = self.random_datetime()
+                locations.append(MaterialLocation(
+                    id=location_id, material_id=material.id, tray_id=tray_id, quantity=high - low,
+                    minimum_quantity=self.rng.choice([0, 0, 5, 10, 20]),
+                    created_at=self.start, updated_at=updated_at,
+                ))
+                location_id += 1
+        self.insert(MaterialLocation, locations)
+        self.log(f'{len(locations)} ubicaciones de material')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.storage.valuation import take_valuation_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Guarda la valoración del stock del día por estantería (incluido el stock sin ubicar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Fecha de la instantánea, AAAA-MM-DD (por defecto hoy)')
+
+    def handle(self, *args, **options):
+        date = None
+        if options['date']:
+            date = parse_date(options['date'])
+            if date is None:
+                raise CommandError('--date debe tener el formato AAAA-MM-DD')
+
+        rows = take_valuation_snapshot(date)
+        self.stdout.write(self.style.SUCCESS(f"Valoración guardada: {rows} filas"))
@@ -0,0 +1,242 @@
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from apps.core.benchmarks import ApiClient, access_token_for, live_server, percentile
+from apps.customers.models import Customer
+from apps.materials.inventory import check_stock_invariants
+from apps.materials.models import Material
+from apps.storage.models import MaterialLocation
+
+
+LOCK_ERROR_MARKERS = ('deadlock', 'lock wait timeout', 'database is locked', '1213', '1205')
+
+
+class Command(BaseCommand):
+    help = ('Lanza ventas, traslados y entradas concurrentes sobre los mismos materiales '
+            'y comprueba después que el stock sigue cuadrando')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--materials', type=int, default=3,
+                            help='Número de materiales sobre los que se concentra la carga (por defecto 3)')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Clientes en paralelo (por defecto 8)')
+        parser.add_argument('--operations', type=int, default=400,
+                            help='Operaciones totales (por defecto 400)')
+        parser.add_argument('--mix', default='checkout=5,transfer=3,restock=2',
+                            help='Peso de cada operación: checkout, transfer, restock')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--user', help='Usuario con el que se autentican las peticiones (por defecto el primer superusuario)')
+        parser.add_argument('--fail-on-violation', action='store_true',
+                            help='Termina con error si se pierde alguna actualización o no cuadra el stock')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if not user:
+            raise CommandError('No hay usuario para autenticar las peticiones (usa --user o crea un superusuario)')
+
+        customer = Customer.objects.order_by('pk').first()
+        if not customer:
+            raise CommandError('La base de datos no tiene clientes; ejecuta antes seed_scale')
+
+        weights = self._parse_mix(options['mix'])
+        targets = self._pick_targets(options['materials'])
+        if not targets:
+            raise CommandError('No hay materiales con stock ubicado; ejecuta antes seed_scale')
+
+        material_ids = list(targets)
+        before_violations = {v['material_id'] for v in check_stock_invariants(material_ids)}
+        before_materials = dict(Material.objects.filter(id__in=material_ids).values_list('id', 'quantity'))
+        location_ids = [loc for locs in targets.values() for loc in locs]
+        before_locations = dict(MaterialLocation.objects.filter(id__in=location_ids).values_list('id', 'quantity'))
+
+        # Efecto esperado de las operaciones que la API confirma (2xx)
+        expected_materials = Counter()
+        expected_locations = Counter()
+        stats = defaultdict(lambda: {'latencies': [], 'status': Counter(), 'lock_errors': 0})
+        lock = threading.Lock()
+        plan = self._build_plan(options['operations'], weights, targets, options['seed'])
+        pending = iter(plan)
+
+        def worker(client):
+            ticket_id = None
+            while True:
+                with lock:
+                    step = next(pending, None)
+                if step is None:
+                    return
+                kind, material_id, source_id, target_id = step
+
+                started = time.perf_counter()
+                if kind == 'checkout':
+                    if ticket_id is None:
+                        created = client.request('POST', '/tickets/tickets/', {
+                            'customer': customer.id, 'notes': 'stress_stock',
+                        })
+                        if created.status == 201:
+                            ticket_id = created.json()['id']
+                    if ticket_id is None:
+                        response = created
+                    else:
+                        response = client.request('POST', f'/tickets/tickets/{ticket_id}/items/', {
+                            'material': material_id, 'quantity': 1, 'location_id': source_id,
+                        })
+                elif kind == 'transfer':
+                    response = client.request('POST', '/storage/movements/', {
+                        'material': material_id, 'operation': 'TRANSFER', 'quantity': 1,
+                        'source_location': source_id, 'target_location': target_id,
+                        'user': user.id, 'notes': 'stress_stock',
+                    })
+                else:
+                    response = client.request('PATCH', f'/materials/materials/{material_id}/', {
+                        'operation': 'ADD', 'quantity_change': '1', 'reason': 'COMPRA',
+                        'notes': 'stress_stock',
+                    }, form=True)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+
+                with lock:
+                    entry = stats[kind]
+                    entry['latencies'].append(elapsed_ms)
+                    entry['status'][response.status] += 1
+                    body = response.content.decode(errors='replace').lower()
+                    if response.status >= 500 and any(marker in body for marker in LOCK_ERROR_MARKERS):
+                        entry['lock_errors'] += 1
+                    if 200 <= response.status < 300:
+                        if kind == 'checkout':
+                            expected_materials[material_id] -= 1
+                            expected_locations[source_id] -= 1
+                        elif kind == 'transfer':
+                            expected_locations[source_id] -= 1
+                            expected_locations[target_id] += 1
+                        else:
+                            expected_materials[material_id] += 1
+
+        token = access_token_for(user)
+        with live_server() as (host, port):
+            clients = [ApiClient(host, port, token) for _ in range(max(1, options['workers']))]
+            threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            for client in clients:
+                client.close()
+
+        self._report_operations(stats, elapsed)
+        lost = self._report_lost_updates(
+            before_materials, expected_materials,
+            dict(Material.objects.filter(id__in=material_ids).values_list('id', 'quantity')),
+            'Material', 'material')
+        lost += self._report_lost_updates(
+            before_locations, expected_locations,
+            dict(MaterialLocation.objects.filter(id__in=location_ids).values_list('id', 'quantity')),
+            'MaterialLocation', 'ubicación')
+
+        new_violations = [v for v in check_stock_invariants(material_ids)
+                          if v['material_id'] not in before_violations]
+        for violation in new_violations:
+            self.stdout.write(self.style.ERROR(
+                f"Material {violation['material_id']} ({violation['name']}): {'; '.join(violation['problems'])}"))
+        if before_violations:
+            self.stdout.write(self.style.WARNING(
+                f'{len(before_violations)} materiales ya no cuadraban antes de la prueba'))
+
+        if lost or new_violations:
+            message = f'{lost} actualizaciones perdidas y {len(new_violations)} materiales descuadrados'
+            if options['fail_on_violation']:
+                raise CommandError(message)
+            self.stdout.write(self.style.ERROR(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('El stock cuadra tras la prueba'))
+
+    def _parse_mix(self, mix):
+        weights = {}
+        for part in mix.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if name not in ('checkout', 'transfer', 'restock'):
+                raise CommandError(f'Operación desconocida en --mix: {name}')
+            try:
+                weights[name] = int(weight or 1)
+            except ValueError:
+                raise CommandError(f'Peso no válido en --mix: {part}')
+        if not any(weights.values()):
+            raise CommandError('--mix debe incluir al menos una operación con peso')
+        return weights
+
+    def _pick_targets(self, count):
+        """
+        Materiales con más stock ubicado, preferiblemente en dos o más
+        ubicaciones para poder trasladar entre ellas.
+        Devuelve {material_id: [location_id, ...]}.
+        """
+        material_ids = list(
+            MaterialLocation.objects.filter(quantity__gt=0)
+            .values('material_id')
+            .annotate(locations=Count('id'))
+            .order_by('-locations', 'material_id')
+            .values_list('material_id', flat=True)[:count]
+        )
+        targets = {}
+        for material_id in material_ids:
+            targets[material_id] = list(
+                MaterialLocation.objects.filter(material_id=material_id, quantity__gt=0)
+                .order_by('-quantity').values_list('id', flat=True)[:2]
+            )
+        return targets
+
+    def _build_plan(self, operations, weights, targets, seed):
+        """Secuencia reproducible de operaciones (tipo, material, origen, destino)."""
+        rng = random.Random(seed)
+        kinds = [kind for kind, weight in weights.items() if weight > 0]
+        kind_weights = [weights[kind] for kind in kinds]
+        material_ids = sorted(targets)
+        plan = []
+        for _ in range(operations):
+            kind = rng.choices(kinds, kind_weights)[0]
+            material_id = rng.choice(material_ids)
+            locations = targets[material_id]
+            if kind == 'transfer' and len(locations) < 2:
+                kind = 'checkout'
+            source = rng.choice(locations)
+            target = next((loc for loc in locations if loc != source), None)
+            plan.append((kind, material_id, source, target))
+        return plan
+
+    def _report_operations(self, stats, elapsed):
+        total = sum(len(entry['latencies']) for entry in stats.values())
+        lock_errors = sum(entry['lock_errors'] for entry in stats.values())
+        self.stdout.write(f'{total} operaciones en {elapsed:.2f} s ({total / elapsed if elapsed else 0:.1f} op/s)')
+        for kind, entry in sorted(stats.items()):
+            statuses = ', '.join(f'{code}: {n}' for code, n in sorted(entry['status'].items()))
+            self.stdout.write(
+                f"  {kind:<9} p50 {percentile(entry['latencies'], 50):>7.1f} ms  "
+                f"p95 {percentile(entry['latencies'], 95):>7.1f} ms  [{statuses}]  "
+                f"bloqueos: {entry['lock_errors']}"
+            )
+        if lock_errors:
+            self.stdout.write(self.style.WARNING(f'{lock_errors} errores por interbloqueo o espera de bloqueo'))
+
+    def _report_lost_updates(self, before, expected, after, label, noun):
+        """Compara el valor final con el esperado según las operaciones confirmadas."""
+        lost = 0
+        for object_id, initial in sorted(before.items()):
+            wanted = initial + expected.get(object_id, 0)
+            actual = after.get(object_id)
+            if actual != wanted:
+                lost += abs(wanted - (actual or 0))
+                self.stdout.write(self.style.ERROR(
+                    f'{label} {object_id}: esperado {wanted}, actual {actual} '
+                    f'({abs(wanted - (actual or 0))} actualizaciones perdidas en la {noun})'))
+        return lost
@@ -0,0 +1,300 @@
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+from .db_router import mark_recent_write
+from .log import get_request_id, reset_request_id, set_request_id
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCapableMiddleware:
+    """
+    Base de los middlewares del proyecto: con ASGI Django los llama con await
+    en el bucle de eventos en vez de pasar cada capa a un hilo síncrono y
+    volver. Las subclases que solo tocan la respuesta implementan
+    process_response; el resto sobrescribe __call__ y __acall__.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        return response
+
+
+class QueryCountMiddleware(AsyncCapableMiddleware):
+    """
+    Cuenta las consultas SQL ejecutadas durante la petición y las devuelve
+    en la cabecera X-DB-Queries. La activan las herramientas de benchmark.
+    """
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        count_query, counter = self._counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        response['X-DB-Queries'] = str(counter['queries'])
+        return response
+
+    async def __acall__(self, request):
+        # Las consultas se hacen en el hilo síncrono de la petición, que tiene
+        # su propia conexión: el contador se instala y se quita allí
+        count_query, counter = self._counter()
+        await sync_to_async(connection.execute_wrappers.append)(count_query)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(connection.execute_wrappers.remove)(count_query)
+        response['X-DB-Queries'] = str(counter['queries'])
+        return response
+
+    @staticmethod
+    def _counter():
+        counter = {'queries': 0}
+
+        def count_query(execute, sql, params, many, context):
+            counter['queries'] += 1
+            return execute(sql, params, many, context)
+
+        return count_query, counter
+
+
+class DBConnectionTimingMiddleware(AsyncCapableMiddleware):
+    """
+    Mide lo que tarda cada petición en disponer de conexión a la base de datos
+    (conexión nueva, comprobación de una persistente o préstamo del pool) y lo
+    devuelve en la cabecera Server-Timing. Cada DB_CONNECTION_TIMING_LOG_EVERY
+    peticiones registra un resumen por proceso para dimensionar el pool.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.log_every = getattr(settings, 'DB_CONNECTION_TIMING_LOG_EVERY', 500)
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timing = self._connect()
+        return self._with_timing(self.get_response(request), *timing)
+
+    async def __acall__(self, request):
+        # Con ASGI la conexión que usan las vistas es la del hilo síncrono
+        # de la petición
+        timing = await sync_to_async(self._connect)()
+        return self._with_timing(await self.get_response(request), *timing)
+
+    def _connect(self):
+        new_connection = connection.connection is None
+        started = time.perf_counter()
+        # Mismo orden que Django antes de la primera consulta
+        connection.close_if_health_check_failed()
+        new_connection = new_connection or connection.connection is None
+        connection.ensure_connection()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._record(elapsed_ms, new_connection)
+        return elapsed_ms, new_connection
+
+    @staticmethod
+    def _with_timing(response, elapsed_ms, new_connection):
+        response['Server-Timing'] = 'db-connect;dur={:.2f};desc="{}"'.format(
+            elapsed_ms, 'new' if new_connection else 'reused'
+        )
+        return response
+
+    def _record(self, elapsed_ms, new_connection):
+        with self.lock:
+            self.requests += 1
+            self.new_connections += int(new_connection)
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            if self.requests < self.log_every:
+                return
+            summary = (self.requests, self.new_connections, self.total_ms / self.requests, self.max_ms)
+            self._reset()
+        logger.info(
+            'Conexiones BD (pid %s): %s peticiones, %s conexiones nuevas, %.2f ms de media, %.2f ms máx.',
+            os.getpid(), *summary
+        )
+
+
+class ReadYourWritesMiddleware(AsyncCapableMiddleware):
+    """
+    Tras una petición de escritura correcta, envía las lecturas de ese usuario
+    al primario durante unos segundos para que vea sus propios cambios aunque
+    la réplica vaya con retraso. El usuario lo fija DRF al autenticar el JWT.
+    """
+    def process_response(self, request, response):
+        if self._is_write(request, response):
+            mark_recent_write(getattr(request, 'user', None))
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._is_write(request, response):
+            # Fuera de DRF el usuario aún es perezoso (consulta la sesión) y
+            # la caché compartida es E/S bloqueante: solo en las escrituras
+            await sync_to_async(mark_recent_write)(getattr(request, 'user', None))
+        return response
+
+    @staticmethod
+    def _is_write(request, response):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+
+
+class RequestIDMiddleware(AsyncCapableMiddleware):
+    """
+    Asigna un identificador a cada petición (el de la cabecera X-Request-ID si
+    lo envía nginx, o uno nuevo). Se incluye en todos los registros de log y
+    se devuelve en la respuesta.
+    """
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = self._set_request_id(request)
+        try:
+            return self.process_response(request, self.get_response(request))
+        finally:
+            reset_request_id(token)
+
+    async def __acall__(self, request):
+        # Es una variable de contexto: la ven también los hilos de sync_to_async
+        token = self._set_request_id(request)
+        try:
+            return self.process_response(request, await self.get_response(request))
+        finally:
+            reset_request_id(token)
+
+    @staticmethod
+    def _set_request_id(request):
+        incoming = request.headers.get('X-Request-ID', '')
+        return set_request_id(incoming[:64] if incoming.isprintable() else None)
+
+    def process_response(self, request, response):
+        response['X-Request-ID'] = get_request_id()
+        return response
+
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se usa gzip
+    brotli = None
+
+
+# Tipos que compensa comprimir (las imágenes y PDF ya van comprimidos)
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack', 'text/')
+
+
+def _accepted_encodings(header):
+    """Codificaciones de Accept-Encoding con q > 0."""
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """
+    Comprime con brotli (si el cliente lo acepta y el paquete está instalado)
+    o gzip las respuestas de la API de más de API_COMPRESSION_MIN_SIZE bytes.
+    Las respuestas en streaming se comprimen por bloques, sin cargarlas
+    enteras en memoria. Como GZipMiddleware, gzip añade unos bytes aleatorios
+    para dificultar ataques tipo BREACH. nginx no vuelve a comprimir las
+    respuestas que ya traen Content-Encoding.
+    """
+    # Igual que django.middleware.gzip.GZipMiddleware
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = settings.API_COMPRESSION_MIN_SIZE
+        self.brotli_quality = settings.API_COMPRESSION_BROTLI_QUALITY
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or getattr(response, 'is_async', False):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = _brotli_sequence(response.streaming_content, self.brotli_quality)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=self.max_random_bytes
+                )
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=self.brotli_quality)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # Un ETag fuerte deja de valer para el cuerpo comprimido
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
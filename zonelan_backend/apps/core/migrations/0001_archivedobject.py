@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('object_id', models.CharField(max_length=64, verbose_name='ID del objeto')),
+                ('label', models.CharField(blank=True, max_length=255, verbose_name='Descripción')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de eliminación')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivado')),
+                ('payload', models.JSONField()),
+            ],
+            options={
+                'verbose_name': 'Objeto archivado',
+                'verbose_name_plural': 'Objetos archivados',
+                'ordering': ['-archived_at'],
+                'unique_together': {('model', 'object_id')},
+            },
+        ),
+    ]
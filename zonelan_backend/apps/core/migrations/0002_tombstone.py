@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:44
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_archivedobject'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('object_id', models.CharField(max_length=64, verbose_name='ID del objeto')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de borrado')),
+            ],
+            options={
+                'verbose_name': 'Registro borrado',
+                'verbose_name_plural': 'Registros borrados',
+                'ordering': ['deleted_at', 'id'],
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx')],
+            },
+        ),
+    ]
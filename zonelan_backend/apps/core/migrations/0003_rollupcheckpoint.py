@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Agregado')),
+                ('position', models.DateTimeField(blank=True, null=True, verbose_name='Procesado hasta')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+            ],
+            options={
+                'verbose_name': 'Punto de control de agregados',
+                'verbose_name_plural': 'Puntos de control de agregados',
+            },
+        ),
+    ]
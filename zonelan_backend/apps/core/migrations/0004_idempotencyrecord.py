@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_rollupcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Clave')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='Hash de la petición')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Estado de la respuesta')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='Tipo de la respuesta')),
+                ('body', models.BinaryField(blank=True, null=True, verbose_name='Respuesta comprimida')),
+                ('locked_at', models.DateTimeField(verbose_name='Reservada el')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Caduca el')),
+            ],
+            options={
+                'verbose_name': 'Clave de idempotencia',
+                'verbose_name_plural': 'Claves de idempotencia',
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ArchivedObject(models.Model):
+    """
+    Registro eliminado lógicamente que se ha sacado de su tabla junto con sus
+    dependientes (ver apps.core.archive). `payload` contiene los objetos
+    serializados y las referencias SET_NULL que hay que recuperar al restaurar.
+    """
+    model = models.CharField(max_length=100, verbose_name='Modelo')
+    object_id = models.CharField(max_length=64, verbose_name='ID del objeto')
+    label = models.CharField(max_length=255, blank=True, verbose_name='Descripción')
+    deleted_at = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de eliminación')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivado')
+    payload = models.JSONField()
+
+    class Meta:
+        verbose_name = 'Objeto archivado'
+        verbose_name_plural = 'Objetos archivados'
+        ordering = ['-archived_at']
+        unique_together = ['model', 'object_id']
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id}"
+
+
+class Tombstone(models.Model):
+    """
+    Marca de un registro borrado físicamente, para que los clientes de
+    /sync/ lo quiten de su copia local (ver apps.core.sync).
+    """
+    model = models.CharField(max_length=100, verbose_name='Modelo')
+    object_id = models.CharField(max_length=64, verbose_name='ID del objeto')
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name='Fecha de borrado')
+
+    class Meta:
+        verbose_name = 'Registro borrado'
+        verbose_name_plural = 'Registros borrados'
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id}"
+
+
+class RollupCheckpoint(models.Model):
+    """
+    Marca de agua de una tabla de agregados incrementales: hasta qué fecha
+    del origen se ha procesado. El trabajo de puesta al día relee desde un
+    poco antes de `position` para recoger las transacciones que se
+    confirmaron tarde.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name='Agregado')
+    position = models.DateTimeField(null=True, blank=True, verbose_name='Procesado hasta')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
+
+    class Meta:
+        verbose_name = 'Punto de control de agregados'
+        verbose_name_plural = 'Puntos de control de agregados'
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Respuesta guardada de una petición con Idempotency-Key (ver
+    apps.core.idempotency). `key` es el hash de usuario, método, ruta y
+    clave del cliente; sin `status_code` la petición sigue en curso.
+    """
+    key = models.CharField(max_length=64, unique=True, verbose_name='Clave')
+    request_hash = models.CharField(max_length=64, verbose_name='Hash de la petición')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Estado de la respuesta')
+    content_type = models.CharField(max_length=100, blank=True, verbose_name='Tipo de la respuesta')
+    body = models.BinaryField(null=True, blank=True, verbose_name='Respuesta comprimida')
+    locked_at = models.DateTimeField(verbose_name='Reservada el')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Caduca el')
+
+    class Meta:
+        verbose_name = 'Clave de idempotencia'
+        verbose_name_plural = 'Claves de idempotencia'
+
+    def __str__(self):
+        return self.key
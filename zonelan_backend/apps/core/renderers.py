@@ -0,0 +1,79 @@
+"""
+Renderers y parser rápidos para la API.
+
+- ORJSONRenderer / ORJSONParser: JSON con orjson. Las fechas, los Decimal y
+  el resto de tipos que orjson no conoce pasan por el JSONEncoder de DRF,
+  así que la salida es la misma que con el JSONRenderer por defecto.
+- MessagePackRenderer: para clientes que envían `Accept: application/msgpack`
+  (requiere el paquete msgpack; settings solo lo registra si está instalado).
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+_encoder = JSONEncoder()
+
+# Las fechas se dejan al encoder de DRF para conservar su formato (milisegundos y 'Z')
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def encode_default(obj):
+    """Tipos que no son JSON nativo (fechas, Decimal, UUID, textos traducibles...)."""
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        if accepted_media_type:
+            # Como JSONRenderer: 'application/json; indent=4'
+            params = dict(
+                param.strip().split('=', 1)
+                for param in accepted_media_type.split(';')[1:] if '=' in param
+            )
+            if 'indent' in params:
+                return True
+        return bool((renderer_context or {}).get('indent'))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context):
+            options |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=encode_default, option=options)
+        # Como JSONRenderer: escapar U+2028/U+2029, válidos en JSON pero no en JavaScript
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import msgpack
+
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
@@ -0,0 +1,76 @@
+"""
+Borrado lógico común a Ticket, WorkReport, Contract y ContractReport.
+
+Los modelos que heredan de SoftDeleteModel definen sus propios campos
+`is_deleted` y `deleted_at`; la clase base aporta:
+
+- objects: manager por defecto que excluye los registros eliminados.
+  `objects.with_deleted()` devuelve todos y `objects.only_deleted()` solo los
+  eliminados.
+- soft_delete() / undelete() para marcar y desmarcar un registro.
+
+Las relaciones directas (material_control.ticket) usan el manager base de
+Django y siguen resolviendo registros eliminados; las inversas
+(contract.reports) excluyen los eliminados.
+
+Los registros eliminados hace tiempo se mueven a ArchivedObject con el
+comando archive_deleted (ver apps.core.archive).
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def alive(self):
+        return self.filter(is_deleted=False)
+
+    def deleted(self):
+        return self.filter(is_deleted=True)
+
+    def soft_delete(self):
+        now = timezone.now()
+        changes = {'is_deleted': True, 'deleted_at': now}
+        # update() no aplica auto_now: sin esto los ETag y /sync/ no verían el borrado
+        if any(field.name == 'updated_at' for field in self.model._meta.concrete_fields):
+            changes['updated_at'] = now
+        return self.update(**changes)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+    def with_deleted(self):
+        return SoftDeleteQuerySet(self.model, using=self._db)
+
+    def only_deleted(self):
+        return self.with_deleted().filter(is_deleted=True)
+
+
+class SoftDeleteModel(models.Model):
+    objects = SoftDeleteManager()
+
+    class Meta:
+        abstract = True
+
+    def soft_delete(self, **extra_fields):
+        """Marca el registro como eliminado. `extra_fields` permite cambiar otros campos a la vez."""
+        self.is_deleted = True
+        self.deleted_at = timezone.now()
+        for name, value in extra_fields.items():
+            setattr(self, name, value)
+        self.save(update_fields=self._soft_delete_fields(extra_fields))
+
+    def undelete(self):
+        self.is_deleted = False
+        self.deleted_at = None
+        self.save(update_fields=self._soft_delete_fields())
+
+    def _soft_delete_fields(self, extra_fields=()):
+        fields = ['is_deleted', 'deleted_at', *extra_fields]
+        # Con update_fields, auto_now solo se aplica si el campo está en la lista
+        if any(field.name == 'updated_at' for field in self._meta.concrete_fields):
+            fields.append('updated_at')
+        return fields
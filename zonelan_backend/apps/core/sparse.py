@@ -0,0 +1,135 @@
+"""
+Selección de campos en las respuestas de los ViewSets (sparse fieldsets).
+
+En list y retrieve se admiten:
+- ?fields=id,title,status  solo esos campos (el id se incluye siempre);
+- ?omit=description,observations  todos menos esos;
+- ?compact=1  en list, el serializer ligero de `compact_serializer_class`.
+
+Los campos descartados tampoco se leen de la base de datos: las columnas
+del modelo que ningún campo restante necesita se difieren con .defer() y
+solo se añaden los select_related / prefetch_related de los campos que se
+devuelven. Si algún código lee después una columna diferida Django la
+carga aparte, así que un mapa incompleto solo cuesta consultas, no errores.
+"""
+from django.db import models
+from rest_framework.exceptions import ValidationError
+
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def _param_names(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    return {field.strip() for field in value.split(',') if field.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Mixin para ViewSets con selección de campos y serializer compacto.
+
+    - compact_serializer_class: serializer de list para ?compact=1.
+    - sparse_select_related / sparse_prefetch_related: campo del serializer
+      -> relaciones que necesita; solo se cargan si el campo se devuelve.
+      Admite objetos Prefetch (por ejemplo con to_attr para filtrar la
+      relación por tipo).
+    - sparse_field_columns: campo del serializer -> columnas del modelo que
+      lee cuando no se deduce de su `source` (SerializerMethodField,
+      propiedades del modelo).
+    """
+    compact_serializer_class = None
+    sparse_select_related = {}
+    sparse_prefetch_related = {}
+    sparse_field_columns = {}
+
+    def _sparse_applies(self):
+        return self.request.method == 'GET' and self.action in ('list', 'retrieve')
+
+    def _compact_requested(self):
+        return (
+            self.action == 'list'
+            and self.compact_serializer_class is not None
+            and self.request.query_params.get('compact', '').lower() in TRUE_VALUES
+        )
+
+    def get_serializer_class(self):
+        if self._sparse_applies() and self._compact_requested():
+            return self.compact_serializer_class
+        return super().get_serializer_class()
+
+    def get_sparse_fields(self):
+        """
+        Diccionario nombre -> campo del serializer con los campos que se
+        devuelven, o None si la petición no restringe nada.
+        """
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+
+        self._sparse_fields = None
+        if not self._sparse_applies():
+            return None
+
+        requested = _param_names(self.request, 'fields')
+        omitted = _param_names(self.request, 'omit')
+        if requested is None and omitted is None and not self._compact_requested():
+            return None
+
+        available = self.get_serializer_class()(context=self.get_serializer_context()).fields
+        unknown = ((requested or set()) | (omitted or set())) - set(available)
+        if unknown:
+            raise ValidationError({'fields': f"Campos no válidos: {', '.join(sorted(unknown))}"})
+
+        selected = {
+            name: field for name, field in available.items()
+            if (requested is None or name in requested or name == 'id')
+            and (omitted is None or name not in omitted or name == 'id')
+        }
+        self._sparse_fields = selected
+        return selected
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        selected = self.get_sparse_fields()
+        if selected is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in selected:
+                    target.fields.pop(name)
+        return serializer
+
+    def _deferred_columns(self, model, selected):
+        needed = set()
+        for name, field in selected.items():
+            if field.source != '*':
+                needed.add(field.source.split('.')[0])
+            needed.update(self.sparse_field_columns.get(name, ()))
+
+        # Solo columnas propias: las FK se mantienen para no chocar con select_related
+        return [
+            field.name for field in model._meta.concrete_fields
+            if not field.primary_key
+            and not isinstance(field, models.ForeignKey)
+            and field.name not in needed
+        ]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self._sparse_applies():
+            return queryset
+
+        selected = self.get_sparse_fields()
+        names = selected.keys() if selected is not None else self.get_serializer_class()().fields.keys()
+        select_related = [lookup for name in names for lookup in self.sparse_select_related.get(name, ())]
+        prefetch_related = [lookup for name in names for lookup in self.sparse_prefetch_related.get(name, ())]
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        if selected is not None:
+            deferred = self._deferred_columns(queryset.model, selected)
+            if deferred:
+                queryset = queryset.defer(*deferred)
+        return queryset
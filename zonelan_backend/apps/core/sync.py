@@ -0,0 +1,234 @@
+"""
+Sincronización incremental para clientes que mantienen una copia local.
+
+GET /sync/?since=<cursor> devuelve las filas creadas o modificadas después
+del cursor (por `updated_at`, que está indexado en todos los modelos de
+SYNC_MODELS) y los ids que el cliente debe borrar:
+- las filas con borrado lógico que ya están marcadas como eliminadas;
+- las Tombstone de los borrados físicos, que se registran con post_delete
+  (por ejemplo los TechnicianAssignment que sustituye
+  WorkReportSerializer.update o los registros que se archivan).
+
+Una sesión de sincronización fija su límite superior (`until`) en la primera
+página y recorre los modelos en el orden de SYNC_MODELS paginando por
+(updated_at, pk), así que las páginas son estables aunque se siga escribiendo.
+Al terminar, el cursor siguiente empieza SYNC_OVERLAP_SECONDS antes de
+`until` para recoger las transacciones que se confirmaron tarde: el cliente
+puede recibir alguna fila repetida y debe aplicar los cambios como upsert.
+
+Sin cursor se devuelve una copia completa (sin borrados). Las Tombstone se
+conservan SYNC_TOMBSTONE_DAYS días; un cursor más antiguo caduca y el
+cliente tiene que volver a empezar sin cursor.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.reports.models import image_prefetch
+
+from .models import Tombstone
+
+
+SyncModel = namedtuple(
+    'SyncModel',
+    ['key', 'label', 'serializer', 'select_related', 'prefetch_related'],
+    defaults=(None, (), ()),
+)
+
+# En el orden en que se envían: los padres antes que los hijos. Los modelos
+# sin serializer solo envían borrados (sus filas van anidadas en el padre)
+SYNC_MODELS = (
+    SyncModel('warehouses', 'storage.Warehouse', 'apps.storage.serializers.WarehouseSerializer'),
+    SyncModel('departments', 'storage.Department', 'apps.storage.serializers.DepartmentSerializer',
+              ('warehouse',)),
+    SyncModel('shelves', 'storage.Shelf', 'apps.storage.serializers.ShelfSerializer',
+              ('department__warehouse',)),
+    SyncModel('trays', 'storage.Tray', 'apps.storage.serializers.TraySerializer',
+              ('shelf__department__warehouse',)),
+    SyncModel('materials', 'materials.Material', 'apps.materials.serializers.MaterialSerializer'),
+    SyncModel('material_locations', 'storage.MaterialLocation',
+              'apps.storage.serializers.MaterialLocationSerializer',
+              ('material', 'tray__shelf__department__warehouse')),
+    SyncModel('incidents', 'incidents.Incident', 'apps.incidents.serializers.IncidentSerializer',
+              ('customer', 'reported_by')),
+    SyncModel('contracts', 'contracts.Contract', 'apps.contracts.serializers.ContractSerializer',
+              ('customer', 'created_by')),
+    SyncModel('reports', 'reports.WorkReport', 'apps.reports.serializers.WorkReportSerializer',
+              ('incident__customer',),
+              ('materials_used__material', 'technicians__technician',
+               image_prefetch('BEFORE'), image_prefetch('AFTER'))),
+    SyncModel('report_technicians', 'reports.TechnicianAssignment'),
+    SyncModel('report_materials', 'reports.MaterialUsed'),
+    SyncModel('report_images', 'reports.ReportImage'),
+)
+
+SYNC_KEYS = tuple(source.key for source in SYNC_MODELS)
+
+# Etapa final de cada sesión: las Tombstone
+TOMBSTONES_STAGE = len(SYNC_MODELS)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def _to_micros(value):
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value):
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Cursor de sincronización no válido')
+    # 's' es nulo durante la copia completa inicial
+    if not isinstance(state, dict) or not all(
+        isinstance(value, int) or (name == 's' and value is None) for name, value in state.items()
+    ):
+        raise InvalidCursor('Cursor de sincronización no válido')
+    return state
+
+
+def record_tombstone(sender, instance, using, **kwargs):
+    Tombstone.objects.using(using).create(model=sender._meta.label, object_id=str(instance.pk))
+
+
+def connect_signals():
+    for source in SYNC_MODELS:
+        post_delete.connect(record_tombstone, sender=source.label,
+                            dispatch_uid=f'sync_tombstone_{source.label}')
+
+
+def purge_tombstones(older_than_days):
+    """Borra las Tombstone más antiguas que `older_than_days` días. Devuelve cuántas."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def _after(field, last):
+    """Filtro de paginación por (field, pk) a partir de la última fila enviada."""
+    if last is None:
+        return Q()
+    value, pk = last
+    return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+
+
+def _changed_rows(source, since, until, last, limit):
+    model = apps.get_model(source.label)
+    # En incremental se incluyen las filas eliminadas lógicamente para avisar al cliente
+    manager = model._default_manager if since is None else model._base_manager
+    queryset = manager.filter(updated_at__lte=until)
+    if since is not None:
+        queryset = queryset.filter(updated_at__gt=since)
+    queryset = queryset.filter(_after('updated_at', last)).order_by('updated_at', 'pk')
+    if source.select_related:
+        queryset = queryset.select_related(*source.select_related)
+    if source.prefetch_related:
+        queryset = queryset.prefetch_related(*source.prefetch_related)
+    return list(queryset[:limit + 1])
+
+
+def _tombstones(labels, since, until, last, limit):
+    queryset = Tombstone.objects.filter(
+        model__in=labels, deleted_at__gt=since, deleted_at__lte=until
+    ).filter(_after('deleted_at', last)).order_by('deleted_at', 'id')
+    return list(queryset[:limit + 1])
+
+
+def sync_changes(cursor=None, keys=None, limit=None, context=None):
+    """
+    Una página de cambios a partir de `cursor` para los modelos de `keys`
+    (por defecto todos). Devuelve un dict con `changes` ({clave: filas
+    serializadas}), `deleted` ({clave: ids}), `cursor` y `has_more`; el
+    cliente pide páginas mientras `has_more` sea cierto y guarda el último
+    cursor para la siguiente sincronización.
+    """
+    keys = set(keys or SYNC_KEYS)
+    limit = limit or settings.SYNC_PAGE_SIZE
+    state = decode_cursor(cursor) if cursor else {}
+    now = timezone.now()
+
+    since = _from_micros(state['s']) if state.get('s') is not None else None
+    if since is not None and since < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+        raise CursorExpired('El cursor es anterior a los borrados que se conservan')
+    until = _from_micros(state['u']) if 'u' in state else now
+    stage = state.get('m', 0)
+    last = (_from_micros(state['t']), state['i']) if 't' in state else None
+
+    changes, deleted = {}, {}
+    remaining = limit
+    while stage <= TOMBSTONES_STAGE and remaining > 0:
+        if stage < TOMBSTONES_STAGE:
+            source = SYNC_MODELS[stage]
+            if source.key not in keys or source.serializer is None:
+                stage, last = stage + 1, None
+                continue
+            rows = _changed_rows(source, since, until, last, remaining)
+            page = rows[:remaining]
+            alive = [row for row in page if not getattr(row, 'is_deleted', False)]
+            if alive:
+                serializer_class = import_string(source.serializer)
+                changes[source.key] = serializer_class(alive, many=True, context=context or {}).data
+            removed = [row.pk for row in page if getattr(row, 'is_deleted', False)]
+            if removed:
+                deleted[source.key] = removed
+            position = 'updated_at'
+        else:
+            if since is None:
+                stage, last = stage + 1, None
+                break
+            by_label = {source.label: source for source in SYNC_MODELS if source.key in keys}
+            rows = _tombstones(list(by_label), since, until, last, remaining)
+            page = rows[:remaining]
+            for tombstone in page:
+                source = by_label[tombstone.model]
+                pk_field = apps.get_model(source.label)._meta.pk
+                deleted.setdefault(source.key, []).append(pk_field.to_python(tombstone.object_id))
+            position = 'deleted_at'
+
+        remaining -= len(page)
+        if len(rows) > len(page):
+            last = (getattr(page[-1], position), page[-1].pk)
+            break
+        stage, last = stage + 1, None
+
+    has_more = stage <= TOMBSTONES_STAGE
+    if has_more:
+        next_state = {'s': state.get('s'), 'u': _to_micros(until), 'm': stage}
+        if last is not None:
+            next_state.update(t=_to_micros(last[0]), i=last[1])
+    else:
+        next_state = {'s': _to_micros(until - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS))}
+
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'cursor': encode_cursor(next_state),
+        'has_more': has_more,
+    }
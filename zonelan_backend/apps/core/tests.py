@@ -0,0 +1,375 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import exception_handler
+
+from apps.customers.models import Customer
+from apps.incidents.models import Incident
+from apps.materials.models import Material, MaterialControl
+from apps.reports.models import MaterialUsed, ReportImage, TechnicianAssignment, WorkReport
+from apps.users.models import User
+
+from .archive import archive_object, restore_object
+from .idempotency import REPLAYED_HEADER, IdempotencyMixin, purge_idempotency_keys, record_key
+from .log import get_request_id
+from .middleware import CompressionMiddleware, ReadYourWritesMiddleware, RequestIDMiddleware
+from .models import ArchivedObject, IdempotencyRecord
+from .versioning import VersionConflict, apply_delta, cas_stats, swap_many
+
+
+class VersioningTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.material = Material.objects.create(name='Cable', quantity=10, price=1)
+
+    def concurrent_update(self, material, quantity):
+        # Otra petición escribe la fila después de que `material` se leyera
+        Material.objects.filter(pk=material.pk).update(quantity=quantity, version=F('version') + 1)
+
+    def today(self):
+        return cas_stats(days=1)[0]
+
+    def test_stale_save_raises_conflict(self):
+        stale = Material.objects.get(pk=self.material.pk)
+        self.concurrent_update(self.material, 7)
+
+        stale.quantity = 3
+        with self.assertRaises(VersionConflict) as conflict, transaction.atomic():
+            stale.save()
+
+        self.assertEqual(conflict.exception.current, {'quantity': 7, 'version': 1})
+        self.material.refresh_from_db()
+        self.assertEqual((self.material.quantity, self.material.version), (7, 1))
+
+    def test_save_bumps_version(self):
+        self.material.quantity = 4
+        self.material.save()
+        self.material.save()
+
+        self.assertEqual(Material.objects.get(pk=self.material.pk).version, 2)
+        self.assertEqual(self.today()['updates'], 2)
+
+    def test_apply_delta_retries_after_a_conflict(self):
+        self.concurrent_update(self.material, 7)
+
+        apply_delta(self.material, -5)
+
+        self.assertEqual((self.material.quantity, self.material.version), (2, 2))
+        self.material.refresh_from_db()
+        self.assertEqual((self.material.quantity, self.material.version), (2, 2))
+        stats = self.today()
+        self.assertEqual((stats['updates'], stats['conflicts'], stats['failures']), (1, 1, 0))
+
+    def test_apply_delta_rechecks_minimum_after_a_conflict(self):
+        self.concurrent_update(self.material, 3)
+
+        with self.assertRaises(VersionConflict):
+            apply_delta(self.material, -5, minimum=0)
+
+        self.assertEqual(Material.objects.get(pk=self.material.pk).quantity, 3)
+        self.assertEqual(self.today()['failures'], 1)
+
+    def test_swap_many_is_all_or_nothing(self):
+        other = Material.objects.create(name='Switch', quantity=20, price=30)
+        self.concurrent_update(other, 18)
+        self.material.quantity, other.quantity = 1, 2
+
+        self.assertFalse(swap_many([self.material, other]))
+
+        rows = dict(Material.objects.values_list('id', 'quantity'))
+        self.assertEqual(rows, {self.material.pk: 10, other.pk: 18})
+        self.assertEqual(Material.objects.get(pk=self.material.pk).version, 0)
+        self.assertEqual((self.material.version, other.version), (0, 0))
+
+    def test_swap_many_writes_every_row(self):
+        other = Material.objects.create(name='Switch', quantity=20, price=30)
+        self.material.quantity, other.quantity = 1, 2
+
+        self.assertTrue(swap_many([self.material, other]))
+
+        rows = {row[0]: row[1:] for row in Material.objects.values_list('id', 'quantity', 'version')}
+        self.assertEqual(rows, {self.material.pk: (1, 1), other.pk: (2, 1)})
+
+    def test_conflict_response(self):
+        self.concurrent_update(self.material, 7)
+
+        response = exception_handler(VersionConflict(self.material), {})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data, {
+            'detail': VersionConflict.default_detail,
+            'model': 'material',
+            'id': self.material.pk,
+            'current': {'quantity': 7, 'version': 1},
+        })
+        # Los números no se convierten en cadenas
+        self.assertIsInstance(response.data['current']['quantity'], int)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='tecnico', email='tecnico@example.com', password='secreto',
+            name='Técnico', phone='600000000', type='User',
+        )
+        customer = Customer.objects.create(
+            name='Cliente', address='Calle 1', email='cliente@example.com', phone='600000001',
+        )
+        incident = Incident.objects.create(
+            title='Avería', description='No funciona', customer=customer, reported_by=self.user,
+        )
+        self.material = Material.objects.create(name='Cable', quantity=100, price=1)
+        self.report = WorkReport.objects.create(
+            date=timezone.localdate(), incident=incident, description='Trabajo',
+        )
+        ReportImage.objects.create(report=self.report, image_type='AFTER', image='report_images/foto.jpg')
+        TechnicianAssignment.objects.create(report=self.report, technician=self.user)
+        MaterialUsed.objects.create(report=self.report, material=self.material, quantity=5)
+        self.control = MaterialControl.objects.create(
+            user=self.user, material=self.material, quantity=5, operation='REMOVE', reason='USO',
+            report=self.report,
+        )
+        self.report.soft_delete()
+
+    def snapshot(self):
+        report_id = self.report.pk
+        return {
+            'report': list(WorkReport._base_manager.filter(pk=report_id).values()),
+            'images': list(ReportImage.objects.filter(report_id=report_id).values()),
+            'technicians': list(TechnicianAssignment.objects.filter(report_id=report_id).values()),
+            'materials': list(MaterialUsed.objects.filter(report_id=report_id).values()),
+        }
+
+    def test_archive_and_restore_round_trip(self):
+        before = self.snapshot()
+
+        archived = archive_object(self.report)
+
+        self.assertEqual((archived.model, archived.object_id), ('reports.WorkReport', str(self.report.pk)))
+        self.assertEqual(self.snapshot(), {'report': [], 'images': [], 'technicians': [], 'materials': []})
+        self.control.refresh_from_db()
+        self.assertIsNone(self.control.report_id)
+
+        restored = restore_object(archived)
+
+        self.assertTrue(restored.is_deleted)
+        self.assertEqual(self.snapshot(), before)
+        self.control.refresh_from_db()
+        self.assertEqual(self.control.report_id, self.report.pk)
+        self.assertFalse(ArchivedObject.objects.exists())
+        # Restaurar no vuelve a descontar el material usado
+        self.assertEqual(Material.objects.get(pk=self.material.pk).quantity, 95)
+
+    def test_restore_can_undelete(self):
+        restored = restore_object(archive_object(self.report), undelete=True)
+
+        self.assertFalse(restored.is_deleted)
+        self.assertTrue(WorkReport.objects.filter(pk=self.report.pk).exists())
+
+    def test_soft_delete_and_undelete_bump_updated_at(self):
+        old = timezone.now() - timedelta(days=1)
+        WorkReport._base_manager.update(updated_at=old, is_deleted=False, deleted_at=None)
+
+        self.assertEqual(WorkReport.objects.filter(pk=self.report.pk).soft_delete(), 1)
+        report = WorkReport.objects.with_deleted().get(pk=self.report.pk)
+        self.assertTrue(report.is_deleted)
+        self.assertGreater(report.updated_at, old)
+        self.assertEqual(report.updated_at, report.deleted_at)
+
+        WorkReport._base_manager.update(updated_at=old)
+        report.undelete()
+        report = WorkReport.objects.get(pk=self.report.pk)
+        self.assertIsNone(report.deleted_at)
+        self.assertGreater(report.updated_at, old)
+
+
+class EchoViewSet(IdempotencyMixin, viewsets.ViewSet):
+    """Acción de prueba: cuenta las ejecuciones y responde con el estado pedido."""
+    permission_classes = [IsAuthenticated]
+    calls = 0
+
+    def create(self, request):
+        EchoViewSet.calls += 1
+        wanted = int(request.data.get('status', 201))
+        if wanted == 409:
+            raise VersionConflict(Material.objects.get(pk=request.data['material']))
+        if request.data.get('crash'):
+            raise RuntimeError('fallo')
+        if request.data.get('material_name'):
+            Material.objects.create(name=request.data['material_name'], quantity=1, price=1)
+        return Response({'call': EchoViewSet.calls, 'data': request.data.get('value')}, status=wanted)
+
+
+@override_settings(IDEMPOTENCY_TTL_SECONDS=3600, IDEMPOTENCY_LOCK_SECONDS=60)
+class IdempotencyTests(TestCase):
+
+    def setUp(self):
+        EchoViewSet.calls = 0
+        self.factory = APIRequestFactory()
+        self.view = EchoViewSet.as_view({'post': 'create'})
+        self.user = User.objects.create_user(
+            username='caja', email='caja@example.com', password='secreto',
+            name='Caja', phone='600000000', type='Admin',
+        )
+
+    def post(self, data=None, key='clave-1', user=None, path='/echo/'):
+        request = self.factory.post(path, data or {'value': 'a'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        force_authenticate(request, user=user or self.user)
+        response = self.view(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def stored_key(self, key='clave-1', user=None, path='/echo/'):
+        request = SimpleNamespace(user=user or self.user, method='POST', path=path)
+        return record_key(request, key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post()
+        second = self.post()
+
+        self.assertEqual(EchoViewSet.calls, 1)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second[REPLAYED_HEADER], 'true')
+
+    def test_key_reused_with_other_data(self):
+        self.post()
+        response = self.post({'value': 'b'})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(EchoViewSet.calls, 1)
+
+    def test_concurrent_request_gets_409_with_retry_after(self):
+        now = timezone.now()
+        IdempotencyRecord.objects.create(
+            key=self.stored_key(), request_hash='x', locked_at=now, expires_at=now + timedelta(hours=1),
+        )
+
+        response = self.post()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(EchoViewSet.calls, 0)
+        # La reserva en curso sigue siendo de la otra petición
+        self.assertIsNone(IdempotencyRecord.objects.get().status_code)
+
+    def test_abandoned_lock_is_taken_over(self):
+        now = timezone.now()
+        IdempotencyRecord.objects.create(
+            key=self.stored_key(), request_hash='x',
+            locked_at=now - timedelta(seconds=61), expires_at=now + timedelta(hours=1),
+        )
+
+        response = self.post()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(EchoViewSet.calls, 1)
+        self.assertEqual(IdempotencyRecord.objects.get().status_code, 201)
+
+    def test_key_is_released_on_server_errors(self):
+        response = self.post({'value': 'a', 'status': 503})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+        with self.assertRaises(RuntimeError):
+            self.post({'value': 'a', 'crash': True}, key='clave-2')
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+        self.assertEqual(self.post({'value': 'a', 'crash': ''}, key='clave-2').status_code, 201)
+        self.assertEqual(EchoViewSet.calls, 3)
+
+    def test_action_and_stored_response_commit_together(self):
+        data = {'value': 'a', 'material_name': 'Cable'}
+        # El proceso falla después de la acción pero antes de guardar la respuesta
+        with mock.patch('apps.core.idempotency.zlib.compress', side_effect=RuntimeError('fallo')):
+            with self.assertRaises(RuntimeError):
+                self.post(data)
+        self.assertFalse(Material.objects.exists())
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+        self.assertEqual(self.post(data).status_code, 201)
+        self.assertEqual(self.post(data)[REPLAYED_HEADER], 'true')
+        self.assertEqual(Material.objects.count(), 1)
+        self.assertEqual(EchoViewSet.calls, 2)
+
+    def test_key_is_released_on_conflict(self):
+        material = Material.objects.create(name='Cable', quantity=10, price=1)
+        data = {'value': 'a', 'status': 409, 'material': material.pk}
+
+        self.assertEqual(self.post(data).status_code, 409)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertEqual(self.post(data).status_code, 409)
+        self.assertEqual(EchoViewSet.calls, 2)
+
+    def test_expired_key_is_reused(self):
+        self.post()
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.post({'value': 'b'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn(REPLAYED_HEADER, response)
+        self.assertEqual(EchoViewSet.calls, 2)
+        self.assertEqual(purge_idempotency_keys(), 0)
+
+    def test_keys_are_scoped_per_user_and_path(self):
+        other = User.objects.create_user(
+            username='otra', email='otra@example.com', password='secreto',
+            name='Otra', phone='600000001', type='Admin',
+        )
+        self.post()
+        self.post(user=other)
+        self.post(path='/otro/')
+
+        self.assertEqual(EchoViewSet.calls, 3)
+        self.assertEqual(IdempotencyRecord.objects.count(), 3)
+        self.assertEqual(self.post(user=other)[REPLAYED_HEADER], 'true')
+
+
+class AsyncMiddlewareTests(SimpleTestCase):
+
+    @override_settings(DEBUG=True, MIDDLEWARE=[
+        'apps.core.middleware.DBConnectionTimingMiddleware',
+        'apps.core.middleware.QueryCountMiddleware',
+        'apps.core.middleware.CompressionMiddleware',
+        'apps.core.middleware.RequestIDMiddleware',
+        'apps.core.middleware.ReadYourWritesMiddleware',
+        'apps.contracts.middleware.DocumentFrameMiddleware',
+    ])
+    def test_asgi_stack_is_not_adapted(self):
+        # Django registra en DEBUG cada capa que tiene que pasar a un hilo síncrono
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            BaseHandler().load_middleware(is_async=True)
+
+    def test_async_chain(self):
+        seen = {}
+
+        async def view(request):
+            seen['request_id'] = get_request_id()
+            return JsonResponse({'items': ['x' * 50] * 100})
+
+        middleware = RequestIDMiddleware(ReadYourWritesMiddleware(CompressionMiddleware(view)))
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().post('/', HTTP_X_REQUEST_ID='abc', HTTP_ACCEPT_ENCODING='gzip')
+
+        response = async_to_sync(middleware)(request)
+
+        self.assertEqual(seen['request_id'], 'abc')
+        self.assertEqual(response['X-Request-ID'], 'abc')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
@@ -0,0 +1,244 @@
+"""
+Control de concurrencia optimista para las filas de stock (Material y
+MaterialLocation).
+
+Los modelos que heredan de VersionedModel tienen una columna `version` que
+sube con cada cambio, y sus escrituras son compare-and-swap:
+
+    UPDATE ... SET quantity = <nuevo>, version = version + 1
+    WHERE id = <id> AND version = <versión leída>
+
+- save(): cualquier save() de la instancia lleva la condición de versión. Si
+  la fila ha cambiado desde que se leyó, no la pisa y lanza VersionConflict.
+- apply_delta(instance, delta): suma `delta` a un campo con reintentos. Si la
+  versión ha cambiado, relee la fila y vuelve a aplicar el delta sobre el
+  valor actual, hasta STOCK_CAS_MAX_RETRIES veces. Dentro de una transacción
+  la relectura es SELECT ... FOR UPDATE: en REPEATABLE READ (MariaDB) una
+  lectura normal devolvería la misma instantánea y el reintento volvería a
+  fallar. Así el bloqueo solo se toma cuando ya ha habido conflicto.
+- compare_and_swap(instance, **values): fija valores absolutos (cuadres) sin
+  reintentos, porque se decidieron con el stock leído.
+- swap_many(instances): el mismo UPDATE condicionado para varias filas en una
+  sola consulta (movimientos en lote, ver apps.storage.services); se aplica
+  a todas o a ninguna.
+- add_many(model, deltas): incrementos F() de varias filas en un solo UPDATE
+  (devoluciones de stock en lote, ver apps.tickets.bulk).
+
+VersionConflict es una APIException con estado 409 que devuelve los valores
+actuales de la fila. Los intentos, conflictos y 409 se cuentan por día en la
+caché (record_cas / cas_stats) para seguir la tasa de conflictos.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+CAS_OUTCOMES = ('updates', 'conflicts', 'failures')
+CAS_STATS_DAYS = 8
+
+
+def _cas_key(outcome, day):
+    return f'stock:cas:{outcome}:{day:%Y%m%d}'
+
+
+def record_cas(outcome, count=1):
+    """Cuenta escrituras correctas (updates), intentos fallidos (conflicts) o 409 (failures)."""
+    key = _cas_key(outcome, timezone.localdate())
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        # Primera del día (o caducada): la carrera entre dos procesos solo pierde alguna cuenta
+        cache.set(key, count, CAS_STATS_DAYS * 86400)
+
+
+def cas_stats(days=7):
+    """Contadores de los últimos `days` días, del más reciente al más antiguo."""
+    today = timezone.localdate()
+    dates = [today - timezone.timedelta(days=offset) for offset in range(days)]
+    counts = cache.get_many([_cas_key(outcome, day) for day in dates for outcome in CAS_OUTCOMES])
+    stats = []
+    for day in dates:
+        row = {'date': day}
+        row.update({outcome: counts.get(_cas_key(outcome, day), 0) for outcome in CAS_OUTCOMES})
+        attempts = row['updates'] + row['conflicts']
+        row['conflict_rate'] = round(row['conflicts'] / attempts, 4) if attempts else 0.0
+        stats.append(row)
+    return stats
+
+
+class VersionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'El registro ha cambiado mientras se modificaba. Vuelve a intentarlo.'
+    default_code = 'conflict'
+
+    def __init__(self, instance, current=None, detail=None):
+        self.current = current if current is not None else _current_values(instance)
+        super().__init__(detail)
+        # Sin pasar por ErrorDetail, que convertiría los números en cadenas
+        self.detail = {
+            'detail': self.detail,
+            'model': instance._meta.model_name,
+            'id': instance.pk,
+            'current': self.current,
+        }
+        record_cas('failures')
+        logger.warning('Conflicto de versión en %s %s: %s', instance._meta.label, instance.pk, self.current)
+
+
+def _stock_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.attname in ('quantity', 'version')]
+
+
+def _current_values(instance):
+    return type(instance)._base_manager.filter(pk=instance.pk).values(*_stock_fields(type(instance))).first()
+
+
+class VersionedModel(models.Model):
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name='Versión')
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        version_field = self._meta.get_field('version')
+        expected = self.version
+        values = [value for value in values if value[0] is not version_field]
+        values.append((version_field, None, expected + 1))
+        updated = super()._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update
+        )
+        if updated:
+            self.version = expected + 1
+            record_cas('updates')
+            return True
+        if base_qs.filter(pk=pk_val).exists():
+            # Existe con otra versión: sin esto Django intentaría un INSERT
+            record_cas('conflicts')
+            raise VersionConflict(self)
+        return False
+
+
+def _swap(instance, values):
+    """Un intento de UPDATE condicionado a la versión de `instance`. Devuelve si se aplicó."""
+    model = type(instance)
+    changes = dict(values)
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        # update() no aplica auto_now
+        changes['updated_at'] = timezone.now()
+    updated = model._base_manager.filter(pk=instance.pk, version=instance.version).update(
+        version=F('version') + 1, **changes
+    )
+    if not updated:
+        record_cas('conflicts')
+        return False
+    for name, value in changes.items():
+        setattr(instance, name, value)
+    instance.version += 1
+    record_cas('updates')
+    return True
+
+
+class _PartialSwap(Exception):
+    """Sale del savepoint de swap_many para deshacer las filas que sí coincidían."""
+
+
+def swap_many(instances, field='quantity'):
+    """
+    Escribe el valor actual de `field` de todas las instancias (del mismo
+    modelo) en un solo UPDATE con CASE, cada fila condicionada a su versión.
+    Devuelve si se han aplicado todas; si alguna versión no coincide se
+    deshace el UPDATE (en su propio savepoint) y no se escribe ninguna.
+    """
+    if not instances:
+        return True
+    model = type(instances[0])
+    condition = Q()
+    for instance in instances:
+        condition |= Q(pk=instance.pk, version=instance.version)
+    changes = {
+        field: Case(*[When(pk=instance.pk, then=Value(getattr(instance, field))) for instance in instances],
+                    output_field=model._meta.get_field(field)),
+    }
+    now = timezone.now()
+    if any(model_field.name == 'updated_at' for model_field in model._meta.concrete_fields):
+        changes['updated_at'] = now
+    try:
+        with transaction.atomic():
+            updated = model._base_manager.filter(condition).update(version=F('version') + 1, **changes)
+            if updated != len(instances):
+                raise _PartialSwap()
+    except _PartialSwap:
+        record_cas('conflicts')
+        return False
+    for instance in instances:
+        instance.version += 1
+        if 'updated_at' in changes:
+            instance.updated_at = now
+    record_cas('updates', len(instances))
+    return True
+
+
+def add_many(model, deltas, field='quantity'):
+    """
+    Suma a `field` el delta de cada pk de `deltas` ({pk: delta}) con un solo
+    UPDATE de incrementos F() agrupados. Al ser relativo no necesita comparar
+    la versión, pero la sube para que las instancias leídas antes fallen.
+    Devuelve cuántas filas ha actualizado.
+    """
+    if not deltas:
+        return 0
+    changes = {
+        field: Case(*[When(pk=pk, then=F(field) + Value(delta)) for pk, delta in deltas.items()],
+                    default=F(field), output_field=model._meta.get_field(field)),
+    }
+    if any(model_field.name == 'updated_at' for model_field in model._meta.concrete_fields):
+        changes['updated_at'] = timezone.now()
+    updated = model._base_manager.filter(pk__in=list(deltas)).update(version=F('version') + 1, **changes)
+    record_cas('updates', updated)
+    return updated
+
+
+def compare_and_swap(instance, **values):
+    """Escribe `values` solo si la fila sigue en la versión leída; si no, lanza VersionConflict."""
+    if not _swap(instance, values):
+        raise VersionConflict(instance)
+    return instance
+
+
+def _reload(instance, field):
+    rows = type(instance)._base_manager.filter(pk=instance.pk)
+    if connection.in_atomic_block:
+        rows = rows.select_for_update()
+    current = rows.values(field, 'version').first()
+    if current is None:
+        raise type(instance).DoesNotExist(f"{instance._meta.verbose_name} {instance.pk} ya no existe")
+    setattr(instance, field, current[field])
+    instance.version = current['version']
+    return current
+
+
+def apply_delta(instance, delta, field='quantity', minimum=None):
+    """
+    Suma `delta` a `field` con compare-and-swap y reintentos. Si tras releer
+    la fila el resultado quedaría por debajo de `minimum`, lanza
+    VersionConflict con los valores actuales (el stock ha cambiado y ya no
+    alcanza). Actualiza `instance` con el valor y la versión nuevos.
+    """
+    for attempt in range(settings.STOCK_CAS_MAX_RETRIES + 1):
+        if attempt:
+            current = _reload(instance, field)
+            if minimum is not None and current[field] + delta < minimum:
+                raise VersionConflict(
+                    instance, current=current,
+                    detail=f'El stock ha cambiado y ya no es suficiente. Disponible: {current[field]}',
+                )
+        if _swap(instance, {field: getattr(instance, field) + delta}):
+            return instance
+    raise VersionConflict(instance)
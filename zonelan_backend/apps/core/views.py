@@ -0,0 +1,40 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .sync import SYNC_KEYS, CursorExpired, InvalidCursor, sync_changes
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    """
+    Cambios desde un cursor para mantener una copia local (ver apps.core.sync).
+    Parámetros: since (cursor devuelto por la llamada anterior), models (claves
+    separadas por comas) y limit (filas por página, como máximo SYNC_PAGE_SIZE).
+    """
+    models = request.query_params.get('models')
+    keys = [key.strip() for key in models.split(',') if key.strip()] if models else None
+    unknown = sorted(set(keys or ()) - set(SYNC_KEYS))
+    if unknown:
+        return Response(
+            {"detail": f"Modelos no válidos: {', '.join(unknown)}", "models": SYNC_KEYS},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        limit = int(request.query_params.get('limit', settings.SYNC_PAGE_SIZE))
+    except ValueError:
+        return Response({"detail": "limit debe ser un número"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, settings.SYNC_PAGE_SIZE))
+
+    try:
+        data = sync_changes(request.query_params.get('since'), keys, limit, {'request': request})
+    except InvalidCursor as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except CursorExpired as e:
+        # El cliente debe descartar su copia y sincronizar sin cursor
+        return Response({"detail": str(e), "code": "cursor_expired"}, status=status.HTTP_410_GONE)
+    return Response(data)
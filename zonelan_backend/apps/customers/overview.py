@@ -0,0 +1,167 @@
+"""
+Ficha completa de un cliente (/customers/{id}/overview/).
+
+customer_overview() reúne lo que la ficha pedía con una llamada por
+apartado: contadores y totales de incidencias, tickets, contratos y partes,
+y los últimos registros de cada uno. El número de consultas es fijo (seis)
+sea cual sea el volumen del cliente:
+
+1. el cliente con los contadores y totales como subconsultas anotadas;
+2-6. los últimos registros de cada apartado con values(), sin serializers
+   anidados que consulten por fila.
+
+El resultado se guarda en la caché CUSTOMER_OVERVIEW_CACHE_SECONDS segundos
+y se invalida al confirmar cualquier cambio del cliente o de sus incidencias,
+tickets, contratos o partes (ver apps.customers.signals). Los update()
+sobre querysets no envían señales: lo que cambien se ve al caducar la caché.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, IntegerField, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from apps.contracts.models import Contract, ContractReport
+from apps.incidents.models import Incident
+from apps.reports.models import WorkReport
+from apps.tickets.models import Ticket
+
+from .models import Customer
+from .serializers import CustomerSerializer
+
+
+RECENT_ITEMS = 5
+OPEN_INCIDENT_STATUSES = ('PENDING', 'IN_PROGRESS')
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+def overview_cache_key(customer_id):
+    return f'customers:overview:{customer_id}'
+
+
+def invalidate_overview(customer_id):
+    cache.delete(overview_cache_key(customer_id))
+
+
+def _aggregate(queryset, customer_path, aggregate, output_field):
+    """Subconsulta con `aggregate` sobre las filas de `queryset` del cliente de la fila externa."""
+    rows = (
+        queryset.filter(**{customer_path: OuterRef('pk')})
+        .order_by().values(customer_path)
+        .annotate(result=aggregate).values('result')
+    )
+    return Subquery(rows, output_field=output_field)
+
+
+def _money(value):
+    return (value or Decimal('0')).quantize(Decimal('0.01'))
+
+
+def _count(queryset, customer_path='customer'):
+    return Coalesce(_aggregate(queryset, customer_path, Count('pk'), IntegerField()), 0)
+
+
+def _annotated_customer(customer_id):
+    tickets = Ticket.objects.all()
+    active_contracts = Contract.objects.filter(status='ACTIVE')
+    return (
+        Customer.objects
+        .annotate(
+            incidents_total=_count(Incident.objects.all()),
+            incidents_open=_count(Incident.objects.filter(status__in=OPEN_INCIDENT_STATUSES)),
+            tickets_total=_count(tickets),
+            tickets_unpaid=_count(tickets.filter(status='PENDING')),
+            unpaid_amount=_aggregate(tickets.filter(status='PENDING'), 'customer',
+                                     Sum('total_amount'), AMOUNT_FIELD),
+            paid_amount=_aggregate(tickets.filter(status='PAID'), 'customer',
+                                   Sum('total_amount'), AMOUNT_FIELD),
+            contracts_active=_count(active_contracts),
+            next_maintenance=_aggregate(active_contracts.filter(requires_maintenance=True), 'customer',
+                                        Min('next_maintenance_date'), Contract._meta.get_field('next_maintenance_date')),
+            work_reports_total=_count(WorkReport.objects.all(), 'incident__customer'),
+            contract_reports_total=_count(ContractReport.objects.all(), 'contract__customer'),
+            last_work_report=_aggregate(WorkReport.objects.all(), 'incident__customer',
+                                        Max('date'), WorkReport._meta.get_field('date')),
+            last_contract_report=_aggregate(ContractReport.objects.all(), 'contract__customer',
+                                            Max('date'), ContractReport._meta.get_field('date')),
+        )
+        .filter(pk=customer_id)
+        .first()
+    )
+
+
+def _recent(customer_id):
+    return {
+        'incidents': list(
+            Incident.objects.filter(customer_id=customer_id)
+            .order_by('-created_at', '-id')
+            .values('id', 'title', 'status', 'priority', 'created_at')[:RECENT_ITEMS]
+        ),
+        'tickets': list(
+            Ticket.objects.filter(customer_id=customer_id)
+            .order_by('-created_at', '-id')
+            .values('id', 'ticket_number', 'status', 'payment_method', 'total_amount',
+                    'created_at', 'paid_at')[:RECENT_ITEMS]
+        ),
+        'active_contracts': list(
+            Contract.objects.filter(customer_id=customer_id, status='ACTIVE')
+            .order_by(F('next_maintenance_date').asc(nulls_last=True), 'id')
+            .values('id', 'title', 'start_date', 'end_date', 'maintenance_frequency',
+                    'next_maintenance_date')[:RECENT_ITEMS]
+        ),
+        'work_reports': list(
+            WorkReport.objects.filter(incident__customer_id=customer_id)
+            .order_by('-date', '-id')
+            .values('id', 'date', 'status', 'hours_worked', 'incident_id',
+                    incident_title=F('incident__title'))[:RECENT_ITEMS]
+        ),
+        'contract_reports': list(
+            ContractReport.objects.filter(contract__customer_id=customer_id)
+            .order_by('-date', '-id')
+            .values('id', 'date', 'status', 'hours_worked', 'contract_id',
+                    contract_title=F('contract__title'))[:RECENT_ITEMS]
+        ),
+    }
+
+
+def build_overview(customer_id):
+    """Calcula la ficha sin pasar por la caché. Devuelve None si el cliente no existe."""
+    customer = _annotated_customer(customer_id)
+    if customer is None:
+        return None
+
+    last_reports = [date for date in (customer.last_work_report, customer.last_contract_report) if date]
+    return {
+        'customer': dict(CustomerSerializer(customer).data),
+        'totals': {
+            'incidents': customer.incidents_total,
+            'open_incidents': customer.incidents_open,
+            'tickets': customer.tickets_total,
+            'unpaid_tickets': customer.tickets_unpaid,
+            'unpaid_amount': _money(customer.unpaid_amount),
+            'paid_amount': _money(customer.paid_amount),
+            'active_contracts': customer.contracts_active,
+            'next_maintenance': customer.next_maintenance,
+            'work_reports': customer.work_reports_total,
+            'contract_reports': customer.contract_reports_total,
+            'last_report': max(last_reports) if last_reports else None,
+        },
+        'recent': _recent(customer_id),
+    }
+
+
+def customer_overview(customer_id):
+    """Ficha del cliente desde la caché, calculándola si no está. None si el cliente no existe."""
+    timeout = settings.CUSTOMER_OVERVIEW_CACHE_SECONDS
+    if not timeout:
+        return build_overview(customer_id)
+
+    key = overview_cache_key(customer_id)
+    overview = cache.get(key)
+    if overview is None:
+        overview = build_overview(customer_id)
+        if overview is not None:
+            cache.set(key, overview, timeout)
+    return overview
@@ -0,0 +1,59 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from apps.contracts.models import Contract, ContractReport
+from apps.incidents.models import Incident
+from apps.reports.models import WorkReport
+from apps.tickets.models import Ticket
+
+from .models import Customer
+from .overview import invalidate_overview
+
+
+# Invalida la ficha del cliente (apps.customers.overview) al confirmar la
+# transacción, para que una lectura concurrente no vuelva a guardar datos previos
+def _invalidate(*customer_ids):
+    for customer_id in set(customer_ids) - {None}:
+        transaction.on_commit(partial(invalidate_overview, customer_id))
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer(sender, instance, **kwargs):
+    _invalidate(instance.pk)
+
+
+@receiver(post_init, sender=Incident)
+@receiver(post_init, sender=Ticket)
+@receiver(post_init, sender=Contract)
+def remember_customer(sender, instance, **kwargs):
+    # Sin leer el campo si es diferido: post_init se envía con cada instancia cargada
+    instance._overview_customer_id = instance.__dict__.get('customer_id')
+
+
+@receiver(post_save, sender=Incident)
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Incident)
+@receiver(post_delete, sender=Ticket)
+@receiver(post_delete, sender=Contract)
+def invalidate_related(sender, instance, **kwargs):
+    # También el cliente anterior si el registro ha cambiado de cliente
+    _invalidate(instance.customer_id, getattr(instance, '_overview_customer_id', None))
+    instance._overview_customer_id = instance.customer_id
+
+
+@receiver(post_save, sender=WorkReport)
+@receiver(post_delete, sender=WorkReport)
+def invalidate_work_report(sender, instance, **kwargs):
+    _invalidate(*Incident.objects.filter(pk=instance.incident_id).values_list('customer_id', flat=True))
+
+
+@receiver(post_save, sender=ContractReport)
+@receiver(post_delete, sender=ContractReport)
+def invalidate_contract_report(sender, instance, **kwargs):
+    contracts = Contract.objects.with_deleted().filter(pk=instance.contract_id)
+    _invalidate(*contracts.values_list('customer_id', flat=True))
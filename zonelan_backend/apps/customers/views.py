@@ -1,7 +1,11 @@
 from django.shortcuts import render
+from django.http import Http404
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.response import Response
 from .models import Customer
+from .overview import customer_overview
 from .serializers import CustomerSerializer
 
 class CustomerViewSet(viewsets.ModelViewSet):
@@ -22,3 +26,19 @@ class CustomerViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         customer = serializer.save()
         customer.save()
+
+    @action(detail=True, methods=['get'])
+    def overview(self, request, pk=None):
+        """
+        Ficha completa del cliente: contadores, totales y últimos registros de
+        incidencias, tickets, contratos y partes, en un número fijo de consultas.
+        """
+        # Se lee del primario: con la réplica se podría volver a cachear una ficha
+        # ya invalidada mientras la réplica va con retraso
+        try:
+            overview = customer_overview(int(pk))
+        except ValueError:
+            raise Http404
+        if overview is None:
+            raise Http404
+        return Response(overview)
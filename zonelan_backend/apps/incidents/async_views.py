@@ -0,0 +1,29 @@
+"""
+Versiones asíncronas de las vistas de incidencias para el modo ASGI (ASYNC_VIEWS).
+"""
+from django.http import JsonResponse
+
+from apps.core.async_support import async_api_view
+from apps.core.db_router import replica_safe
+from .models import Incident
+
+
+@async_api_view
+@replica_safe
+async def incident_counts(request):
+    """
+    Retorna estadísticas de incidencias: pendientes, en progreso y total
+    """
+    try:
+        pending_count = await Incident.objects.filter(status='PENDING').acount()
+        in_progress_count = await Incident.objects.filter(status='IN_PROGRESS').acount()
+        total_count = await Incident.objects.acount()
+
+        return JsonResponse({
+            'pending': pending_count,
+            'in_progress': in_progress_count,
+            'active': pending_count + in_progress_count,
+            'total': total_count
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidents', '0003_auto_20250302_0053'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='incident',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última actualización'),
+        ),
+    ]
@@ -44,7 +44,7 @@ class Incident(models.Model):
         verbose_name='Prioridad'
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
-    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última actualización')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última actualización')
     resolution_notes = models.TextField(blank=True, null=True, verbose_name='Notas de resolución')
 
     class Meta:
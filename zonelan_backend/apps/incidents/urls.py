@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -6,9 +7,14 @@ router = DefaultRouter()
 # Aquí está el problema principal - volvamos a la configuración original
 router.register(r'incidents', views.IncidentViewSet, basename='incident')
 
+if settings.ASYNC_VIEWS:
+    from .async_views import incident_counts
+else:
+    from .views import incident_counts
+
 urlpatterns = [
     # Ruta para el conteo
-    path('counts/', views.incident_counts, name='incident-counts'),
+    path('counts/', incident_counts, name='incident-counts'),
     # Incluir las rutas del router
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -8,8 +8,10 @@ from django.db.models import Q
 from .models import Incident
 from .serializers import IncidentSerializer
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.db_router import ReplicaReadMixin, replica_safe
 
-class IncidentViewSet(viewsets.ModelViewSet):
+class IncidentViewSet(ConditionalGetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Incident.objects.all().order_by('-created_at')
     serializer_class = IncidentSerializer
     permission_classes = [IsAuthenticated]
@@ -39,6 +41,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
         return queryset
 
 @api_view(['GET'])
+@replica_safe
 def incident_counts(request):
     """
     Retorna estadísticas de incidencias: pendientes, en progreso y total
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Material, MaterialControl
+from .models import Material, MaterialControl, MaterialControlSummary, MaterialDailyRollup
 
 @admin.register(Material)
 class MaterialAdmin(admin.ModelAdmin):
@@ -15,3 +15,23 @@ class MaterialControlAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related('material', 'user', 'report', 'ticket')
+
+@admin.register(MaterialControlSummary)
+class MaterialControlSummaryAdmin(admin.ModelAdmin):
+    list_display = ('material', 'month', 'operation', 'reason', 'quantity', 'entries')
+    list_filter = ('operation', 'reason', 'month')
+    search_fields = ('material__name',)
+    date_hierarchy = 'month'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('material')
+
+@admin.register(MaterialDailyRollup)
+class MaterialDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('material', 'day', 'operation', 'reason', 'quantity', 'entries')
+    list_filter = ('operation', 'reason')
+    search_fields = ('material__name',)
+    date_hierarchy = 'day'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('material')
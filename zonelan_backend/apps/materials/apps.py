@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MaterialsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.materials'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+
+        from .models import MaterialControl
+        from .rollups import refresh_on_save
+        post_save.connect(refresh_on_save, sender=MaterialControl, dispatch_uid='material_daily_rollup')
@@ -0,0 +1,38 @@
+"""
+Versiones asíncronas de las vistas de materiales para el modo ASGI (ASYNC_VIEWS).
+"""
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils import timezone
+
+from apps.core.async_support import async_api_view
+from apps.core.db_router import replica_safe
+from apps.storage.models import MaterialLocation
+from .models import Material, MaterialControl
+
+
+@async_api_view
+@replica_safe
+async def material_stats(request):
+    """Endpoint para devolver estadísticas de materiales para el dashboard"""
+    try:
+        total_materials = await Material.objects.acount()
+
+        # Materiales con stock bajo (usando MaterialLocation donde está minimum_quantity)
+        low_stock_locations = await MaterialLocation.objects.filter(
+            quantity__lt=F('minimum_quantity')
+        ).values('material').distinct().acount()
+
+        # Operaciones recientes (últimos 30 días)
+        thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
+        recent_operations = await MaterialControl.objects.filter(
+            date__gte=thirty_days_ago
+        ).acount()
+
+        return JsonResponse({
+            'total': total_materials,
+            'lowStock': low_stock_locations,
+            'recentOperations': recent_operations
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
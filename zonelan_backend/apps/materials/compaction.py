@@ -0,0 +1,107 @@
+"""
+Compactación del histórico de MaterialControl.
+
+Los movimientos de más de settings.MATERIAL_CONTROL_DETAIL_YEARS años se
+agrupan por mes, material, operación y motivo en MaterialControlSummary y se
+borran de MaterialControl. Se conservan como detalle los movimientos con
+imagen de albarán, para no perder la referencia al fichero.
+
+Los meses se calculan en la zona horaria del proyecto y cada mes se compacta
+en su propia transacción, así que el proceso se puede interrumpir y repetir.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import MaterialControl, MaterialControlSummary
+
+
+def month_start(value):
+    """Primer instante del mes de `value` en la zona horaria del proyecto."""
+    local = timezone.localtime(value)
+    return local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    month_index = value.month - 1 + months
+    naive = value.replace(tzinfo=None, year=value.year + month_index // 12, month=month_index % 12 + 1)
+    return timezone.make_aware(naive)
+
+
+def compaction_cutoff(years):
+    """Inicio del mes a partir del cual se mantiene el detalle."""
+    return add_months(month_start(timezone.now()), -12 * years)
+
+
+def compactable_controls(start, end):
+    """Movimientos del intervalo que se pueden compactar (los que no tienen albarán)."""
+    return MaterialControl.objects.filter(date__gte=start, date__lt=end).filter(
+        Q(invoice_image__isnull=True) | Q(invoice_image='')
+    )
+
+
+def compact_month(start):
+    """Compacta un mes. Devuelve (movimientos borrados, resúmenes creados o actualizados)."""
+    end = add_months(start, 1)
+    with transaction.atomic():
+        controls = compactable_controls(start, end)
+        groups = controls.values('material_id', 'operation', 'reason').annotate(
+            total=Sum('quantity'),
+            entries=Count('id'),
+            first_date=Min('date'),
+            last_date=Max('date'),
+        ).order_by()
+
+        summaries = 0
+        for group in groups:
+            summary, created = MaterialControlSummary.objects.select_for_update().get_or_create(
+                material_id=group['material_id'],
+                month=start.date(),
+                operation=group['operation'],
+                reason=group['reason'],
+                defaults={
+                    'quantity': group['total'],
+                    'entries': group['entries'],
+                    'first_date': group['first_date'],
+                    'last_date': group['last_date'],
+                },
+            )
+            if not created:
+                # Movimientos que llegaron después de compactar el mes
+                summary.quantity += group['total']
+                summary.entries += group['entries']
+                summary.first_date = min(summary.first_date, group['first_date'])
+                summary.last_date = max(summary.last_date, group['last_date'])
+                summary.save()
+            summaries += 1
+
+        _, deleted = controls.delete()
+    return deleted.get(MaterialControl._meta.label, 0), summaries
+
+
+def compact_material_controls(older_than_years, dry_run=False, limit_months=None):
+    """
+    Compacta todos los meses anteriores al límite, del más antiguo al más
+    reciente. Devuelve una lista de (mes, movimientos, resúmenes); con
+    `dry_run` solo cuenta los movimientos y grupos de cada mes.
+    """
+    cutoff = compaction_cutoff(older_than_years)
+    oldest = MaterialControl.objects.filter(date__lt=cutoff).aggregate(oldest=Min('date'))['oldest']
+    if oldest is None:
+        return []
+
+    result = []
+    start = month_start(oldest)
+    while start < cutoff:
+        if limit_months is not None and len(result) >= limit_months:
+            break
+        if dry_run:
+            controls = compactable_controls(start, add_months(start, 1))
+            entries = controls.count()
+            summaries = controls.values('material_id', 'operation', 'reason').distinct().count()
+        else:
+            entries, summaries = compact_month(start)
+        if entries:
+            result.append((start.date(), entries, summaries))
+        start = add_months(start, 1)
+    return result
@@ -0,0 +1,159 @@
+"""
+Previsión de consumo y sugerencias de reposición.
+
+El consumo de cada material son sus salidas por venta o uso en reportes
+(MaterialControl REMOVE con motivo VENTA o USO). Se cargan agrupadas por día
+en una matriz NumPy materiales × días y la previsión se calcula para todos
+los materiales a la vez:
+
+- demanda diaria: media móvil de los últimos `window` días ('sma') o
+  suavizado exponencial simple con factor `alpha` ('ses');
+- stock de seguridad: `safety_factor` × desviación típica diaria × √plazo;
+- punto de pedido (mínimo sugerido): demanda × plazo + stock de seguridad;
+- cantidad a pedir: lo que falta para cubrir el punto de pedido más
+  `review_days` días de demanda, si el stock total está en el punto de
+  pedido o por debajo.
+
+Los meses ya compactados (MaterialControlSummary) se reparten a partes
+iguales entre los días del mes. Los materiales se procesan por bloques de
+CHUNK_SIZE filas para acotar la memoria de la matriz.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Material, MaterialControl, MaterialControlSummary
+
+
+CONSUMPTION_REASONS = ('VENTA', 'USO')
+METHODS = ('sma', 'ses')
+CHUNK_SIZE = 5000
+
+
+def _daily_matrix(material_ids, start, days):
+    """Matriz float32 (materiales × días) con el consumo diario desde `start`."""
+    matrix = np.zeros(len(material_ids) * days, dtype=np.float32)
+    index = {material_id: row for row, material_id in enumerate(material_ids)}
+
+    rows = (
+        MaterialControl.objects
+        .filter(material_id__in=material_ids, operation='REMOVE', reason__in=CONSUMPTION_REASONS,
+                date__gte=timezone.make_aware(datetime.combine(start, time.min)))
+        .annotate(day=TruncDate('date'))
+        .values_list('material_id', 'day')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    data = np.array(
+        [(index[material_id], (day - start).days, total) for material_id, day, total in rows.iterator()],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    if len(data):
+        valid = (data[:, 1] >= 0) & (data[:, 1] < days)
+        data = data[valid]
+        matrix += np.bincount(data[:, 0] * days + data[:, 1], weights=data[:, 2],
+                              minlength=matrix.size).astype(np.float32)
+
+    # Meses compactados: el total del mes repartido entre sus días
+    summaries = (
+        MaterialControlSummary.objects
+        .filter(material_id__in=material_ids, operation='REMOVE', reason__in=CONSUMPTION_REASONS,
+                month__gte=start.replace(day=1))
+        .values_list('material_id', 'month')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    for material_id, month, total in summaries:
+        next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        first, last = (month - start).days, (next_month - start).days
+        offset = index[material_id] * days
+        span = slice(offset + max(first, 0), offset + min(last, days))
+        if span.stop > span.start:
+            matrix[span] += total / (last - first)
+
+    return matrix.reshape(len(material_ids), days)
+
+
+def _smoothed(demand, alpha):
+    """Suavizado exponencial simple de cada fila, como producto matriz × vector."""
+    days = demand.shape[1]
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    # El nivel inicial es el primer día; su peso es el que queda sin repartir
+    return demand @ weights + demand[:, 0] * (1 - alpha) ** days
+
+
+def forecast_demand(material_ids, method='sma', window=90, alpha=0.1, history_days=None, today=None):
+    """
+    Devuelve (demanda diaria, desviación típica diaria) por material, como
+    arrays alineados con `material_ids`.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método de previsión no válido: {method}")
+    history_days = history_days or settings.FORECAST_HISTORY_DAYS
+    today = today or timezone.localdate()
+    window = min(window, history_days)
+    start = today - timedelta(days=history_days)
+
+    demand = np.empty(len(material_ids))
+    deviation = np.empty(len(material_ids))
+    for offset in range(0, len(material_ids), CHUNK_SIZE):
+        chunk = material_ids[offset:offset + CHUNK_SIZE]
+        matrix = _daily_matrix(chunk, start, history_days)
+        recent = matrix[:, -window:]
+        if method == 'sma':
+            demand[offset:offset + len(chunk)] = recent.mean(axis=1)
+        else:
+            demand[offset:offset + len(chunk)] = _smoothed(matrix, alpha)
+        deviation[offset:offset + len(chunk)] = recent.std(axis=1)
+    return demand, deviation
+
+
+def reorder_suggestions(material_ids=None, method='sma', window=90, alpha=0.1,
+                        lead_time_days=None, review_days=None, safety_factor=None):
+    """
+    Mínimo sugerido y cantidad a pedir de cada material. Devuelve una lista
+    de dicts ordenada por cantidad a pedir (de mayor a menor).
+    """
+    lead_time_days = lead_time_days if lead_time_days is not None else settings.FORECAST_LEAD_TIME_DAYS
+    review_days = review_days if review_days is not None else settings.FORECAST_REVIEW_DAYS
+    safety_factor = safety_factor if safety_factor is not None else settings.FORECAST_SAFETY_FACTOR
+
+    materials = Material.objects.all()
+    if material_ids is not None:
+        materials = materials.filter(id__in=material_ids)
+    materials = materials.annotate(current_minimum=Sum('locations__minimum_quantity')).order_by('id')
+    rows = list(materials.values_list('id', 'name', 'quantity', 'current_minimum'))
+    if not rows:
+        return []
+
+    ids = [row[0] for row in rows]
+    stock = np.array([row[2] for row in rows], dtype=np.float64)
+    demand, deviation = forecast_demand(ids, method=method, window=window, alpha=alpha)
+
+    safety_stock = safety_factor * deviation * math.sqrt(lead_time_days)
+    reorder_point = np.ceil(demand * lead_time_days + safety_stock)
+    target = reorder_point + np.ceil(demand * review_days)
+    order_quantity = np.where(stock <= reorder_point, np.maximum(target - stock, 0), 0)
+    coverage = np.divide(stock, demand, out=np.full_like(stock, np.inf), where=demand > 0)
+
+    suggestions = [
+        {
+            'material_id': material_id,
+            'name': name,
+            'quantity': quantity,
+            'current_minimum': current_minimum or 0,
+            'daily_demand': round(float(demand[row]), 3),
+            'safety_stock': int(math.ceil(safety_stock[row])),
+            'suggested_minimum': int(reorder_point[row]),
+            'order_quantity': int(order_quantity[row]),
+            'days_of_stock': None if math.isinf(coverage[row]) else round(float(coverage[row]), 1),
+        }
+        for row, (material_id, name, quantity, current_minimum) in enumerate(rows)
+    ]
+    suggestions.sort(key=lambda item: (-item['order_quantity'], item['material_id']))
+    return suggestions
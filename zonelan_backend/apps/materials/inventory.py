@@ -0,0 +1,190 @@
+"""
+Comprobaciones de consistencia del stock.
+
+El stock de un material aparece en tres sitios que deben cuadrar:
+- Material.quantity: stock total.
+- MaterialControl: histórico de entradas y salidas. Los traslados entre
+  ubicaciones (motivo TRASLADO) no cambian el total aunque registren ADD o
+  REMOVE, así que no cuentan en el saldo.
+- MaterialLocation: stock ubicado en baldas; puede ser menor que el total
+  (stock sin ubicar) pero nunca mayor.
+"""
+import csv
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .models import Material, MaterialControl, MaterialControlSummary
+from .rollups import schedule_refresh
+
+
+# Motivo de los movimientos entre ubicaciones (apps.storage.services)
+LOCATION_ONLY_REASON = 'TRASLADO'
+
+
+def ledger_balances(material_ids=None):
+    """
+    Saldo del histórico (entradas - salidas) por material, sumando el detalle
+    de MaterialControl y los resúmenes mensuales de los meses compactados.
+    Los traslados solo mueven stock entre baldas y se excluyen.
+    """
+    signed = Case(
+        When(operation='ADD', then=F('quantity')),
+        When(operation='REMOVE', then=-F('quantity')),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    balances = {}
+    for model in (MaterialControl, MaterialControlSummary):
+        queryset = model.objects.exclude(reason=LOCATION_ONLY_REASON)
+        if material_ids is not None:
+            queryset = queryset.filter(material_id__in=material_ids)
+        rows = queryset.values('material_id').annotate(balance=Sum(signed)).order_by()
+        for row in rows:
+            balances[row['material_id']] = balances.get(row['material_id'], 0) + (row['balance'] or 0)
+    return balances
+
+
+def located_quantities(material_ids=None):
+    """Stock ubicado (suma de MaterialLocation.quantity) por material."""
+    from apps.storage.models import MaterialLocation
+
+    queryset = MaterialLocation.objects.all()
+    if material_ids is not None:
+        queryset = queryset.filter(material_id__in=material_ids)
+    rows = queryset.values('material_id').annotate(total=Sum('quantity')).order_by()
+    return {row['material_id']: row['total'] or 0 for row in rows}
+
+
+RECONCILIATION_FIELDS = (
+    'material_id', 'name', 'quantity', 'ledger', 'located', 'unallocated',
+    'ledger_difference', 'located_excess', 'problems',
+)
+
+
+def reconcile_inventory(material_ids=None, only_discrepancies=True):
+    """
+    Cuadre de todo el inventario con consultas agrupadas (una para los
+    materiales, dos para el histórico y una para las ubicaciones), sin
+    recorrer las ubicaciones una a una.
+
+    Devuelve una fila por material con el stock total, el saldo del
+    histórico, el stock ubicado, las diferencias y la lista de problemas.
+    Con only_discrepancies solo se devuelven los materiales que no cuadran.
+    """
+    materials = Material.objects.all()
+    if material_ids is not None:
+        materials = materials.filter(id__in=material_ids)
+
+    ledger = ledger_balances(material_ids)
+    located = located_quantities(material_ids)
+
+    rows = []
+    for material_id, name, quantity in materials.values_list('id', 'name', 'quantity').order_by('id'):
+        balance = ledger.get(material_id, 0)
+        in_locations = located.get(material_id, 0)
+        problems = []
+        if quantity < 0:
+            problems.append('stock negativo')
+        if quantity != balance:
+            problems.append(f'stock {quantity} != histórico {balance}')
+        if in_locations > quantity:
+            problems.append(f'ubicado {in_locations} > stock {quantity}')
+        if problems or not only_discrepancies:
+            rows.append({
+                'material_id': material_id,
+                'name': name,
+                'quantity': quantity,
+                'ledger': balance,
+                'located': in_locations,
+                'unallocated': quantity - in_locations,
+                'ledger_difference': quantity - balance,
+                'located_excess': max(in_locations - quantity, 0),
+                'problems': problems,
+            })
+    return rows
+
+
+def write_reconciliation_csv(rows, stream):
+    """Escribe el informe de cuadre en CSV (los problemas separados por ';')."""
+    writer = csv.writer(stream)
+    writer.writerow(RECONCILIATION_FIELDS)
+    for row in rows:
+        writer.writerow([
+            '; '.join(row[field]) if field == 'problems' else row[field]
+            for field in RECONCILIATION_FIELDS
+        ])
+
+
+def reconciliation_target(row):
+    """
+    Stock con el que queda el material tras el cuadre: el total actual salvo
+    que haya más stock ubicado que total (lo ubicado se ha contado en la
+    balda) o que sea negativo.
+    """
+    return max(row['quantity'], row['located'], 0)
+
+
+def apply_reconciliation(user, material_ids=None, notes=''):
+    """
+    Corrige en bloque los materiales que no cuadran: ajusta Material.quantity
+    a reconciliation_target() y crea un MaterialControl con motivo CUADRE por
+    la diferencia entre ese stock y el saldo del histórico, de forma que
+    después stock, histórico y ubicaciones cuadran.
+
+    Los materiales se bloquean y se vuelven a calcular dentro de la
+    transacción; el cuadre sube su versión para que las escrituras con
+    compare-and-swap que los leyeron antes den conflicto. Devuelve la lista de correcciones aplicadas.
+    """
+    candidates = [row['material_id'] for row in reconcile_inventory(material_ids)]
+    if not candidates:
+        return []
+
+    with transaction.atomic():
+        versions = dict(
+            Material.objects.select_for_update().filter(id__in=candidates).order_by('id').values_list('id', 'version')
+        )
+        rows = reconcile_inventory(candidates)
+
+        now = timezone.now()
+        materials, controls, corrections = [], [], []
+        for row in rows:
+            target = reconciliation_target(row)
+            if target != row['quantity']:
+                # bulk_update no aplica auto_now ni sube la versión (ver apps.core.versioning)
+                materials.append(Material(id=row['material_id'], quantity=target, updated_at=now,
+                                          version=versions[row['material_id']] + 1))
+            difference = target - row['ledger']
+            if difference:
+                controls.append(MaterialControl(
+                    user=user,
+                    material_id=row['material_id'],
+                    quantity=abs(difference),
+                    operation='ADD' if difference > 0 else 'REMOVE',
+                    reason='CUADRE',
+                    notes=notes or f"Cuadre de inventario: stock {row['quantity']} -> {target}, histórico {row['ledger']}",
+                ))
+            corrections.append({
+                'material_id': row['material_id'],
+                'name': row['name'],
+                'previous_quantity': row['quantity'],
+                'quantity': target,
+                'ledger_adjustment': difference,
+            })
+
+        if materials:
+            Material.objects.bulk_update(materials, ['quantity', 'updated_at', 'version'], batch_size=1000)
+        if controls:
+            MaterialControl.objects.bulk_create(controls, batch_size=1000)
+            schedule_refresh(controls)
+    return corrections
+
+
+def check_stock_invariants(material_ids=None):
+    """
+    Devuelve una lista con los materiales cuyo stock no cuadra. Cada elemento
+    incluye el stock total, el saldo del histórico, el stock ubicado y la lista
+    de problemas detectados.
+    """
+    return reconcile_inventory(material_ids)
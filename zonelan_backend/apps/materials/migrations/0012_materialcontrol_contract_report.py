@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0003_alter_contractreport_options_and_more'),
+        ('materials', '0011_alter_materialcontrol_options_materialcontrol_notes_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialcontrol',
+            name='contract_report',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='material_controls', to='contracts.contractreport', verbose_name='Reporte de contrato asociado'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0012_materialcontrol_contract_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialControlSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mes')),
+                ('operation', models.CharField(choices=[('ADD', 'Entrada'), ('REMOVE', 'Salida'), ('TRANSFER', 'Traslado')], max_length=10, verbose_name='Operación')),
+                ('reason', models.CharField(choices=[('COMPRA', 'Compra'), ('VENTA', 'Venta'), ('RETIRADA', 'Retirada'), ('USO', 'Uso en reporte'), ('DEVOLUCION', 'Devolución'), ('TRASLADO', 'Traslado'), ('CUADRE', 'Cuadre de inventario')], max_length=20, verbose_name='Motivo')),
+                ('quantity', models.IntegerField(verbose_name='Cantidad total')),
+                ('entries', models.PositiveIntegerField(verbose_name='Movimientos agrupados')),
+                ('first_date', models.DateTimeField(verbose_name='Primer movimiento')),
+                ('last_date', models.DateTimeField(verbose_name='Último movimiento')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='control_summaries', to='materials.material', verbose_name='Material')),
+            ],
+            options={
+                'verbose_name': 'Resumen mensual de control de material',
+                'verbose_name_plural': 'Resúmenes mensuales de control de material',
+                'ordering': ['-month'],
+                'unique_together': {('material', 'month', 'operation', 'reason')},
+            },
+        ),
+    ]
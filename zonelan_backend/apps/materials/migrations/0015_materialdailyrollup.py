@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0014_material_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('operation', models.CharField(choices=[('ADD', 'Entrada'), ('REMOVE', 'Salida'), ('TRANSFER', 'Traslado')], max_length=10, verbose_name='Operación')),
+                ('reason', models.CharField(choices=[('COMPRA', 'Compra'), ('VENTA', 'Venta'), ('RETIRADA', 'Retirada'), ('USO', 'Uso en reporte'), ('DEVOLUCION', 'Devolución'), ('TRASLADO', 'Traslado'), ('CUADRE', 'Cuadre de inventario')], max_length=20, verbose_name='Motivo')),
+                ('quantity', models.BigIntegerField(verbose_name='Cantidad total')),
+                ('entries', models.PositiveIntegerField(verbose_name='Movimientos')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='materials.material', verbose_name='Material')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de control de material',
+                'verbose_name_plural': 'Resúmenes diarios de control de material',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'operation', 'reason'], name='rollup_day_op_reason_idx')],
+                'unique_together': {('material', 'day', 'operation', 'reason')},
+            },
+        ),
+    ]
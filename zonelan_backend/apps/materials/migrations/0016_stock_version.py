@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0015_materialdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versión'),
+        ),
+    ]
@@ -1,12 +1,14 @@
 from django.db import models
+from apps.core.versioning import VersionedModel
 from apps.users.models import User
 # Usar referencia de string para evitar importación circular
 # No importar: from apps.tickets.models import Ticket
 
-class Material(models.Model):
+class Material(VersionedModel):
     name = models.CharField(max_length=255, verbose_name='Nombre')
     quantity = models.IntegerField(verbose_name='Cantidad')
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Precio')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización')
 
     class Meta:
         verbose_name = 'Material'
@@ -15,6 +17,14 @@ class Material(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # El stock se guarda con update_fields=['quantity']; sin updated_at en
+        # la lista auto_now no se escribe y /sync/ no vería el cambio
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
+        super().save(*args, **kwargs)
+
     # Añadir este método al modelo Material
     @property
     def stock_by_location(self):
@@ -173,3 +183,64 @@ class MaterialControl(models.Model):
             return MaterialMovement.objects.get(id=self.movement_id)
         except MaterialMovement.DoesNotExist:
             return None
+
+
+class MaterialControlSummary(models.Model):
+    """
+    Movimientos de MaterialControl de un mes agrupados por material, operación
+    y motivo. Los genera compact_material_controls a partir del detalle antiguo,
+    que después se borra (ver apps.materials.compaction).
+    """
+    material = models.ForeignKey(
+        Material,
+        on_delete=models.CASCADE,
+        related_name='control_summaries',
+        verbose_name='Material'
+    )
+    month = models.DateField(verbose_name='Mes')
+    operation = models.CharField(max_length=10, choices=MaterialControl.OPERATION_CHOICES, verbose_name='Operación')
+    reason = models.CharField(max_length=20, choices=MaterialControl.REASON_CHOICES, verbose_name='Motivo')
+    quantity = models.IntegerField(verbose_name='Cantidad total')
+    entries = models.PositiveIntegerField(verbose_name='Movimientos agrupados')
+    first_date = models.DateTimeField(verbose_name='Primer movimiento')
+    last_date = models.DateTimeField(verbose_name='Último movimiento')
+
+    class Meta:
+        verbose_name = 'Resumen mensual de control de material'
+        verbose_name_plural = 'Resúmenes mensuales de control de material'
+        ordering = ['-month']
+        unique_together = ['material', 'month', 'operation', 'reason']
+
+    def __str__(self):
+        return f"{self.material.name} {self.month:%Y-%m} {self.get_operation_display()}: {self.quantity}"
+
+
+class MaterialDailyRollup(models.Model):
+    """
+    Movimientos de MaterialControl agregados por material, día, operación y
+    motivo. Se mantiene de forma incremental (ver apps.materials.rollups) y
+    es la fuente de las gráficas de consumo, para no recorrer el histórico.
+    """
+    material = models.ForeignKey(
+        Material,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups',
+        verbose_name='Material'
+    )
+    day = models.DateField(verbose_name='Día')
+    operation = models.CharField(max_length=10, choices=MaterialControl.OPERATION_CHOICES, verbose_name='Operación')
+    reason = models.CharField(max_length=20, choices=MaterialControl.REASON_CHOICES, verbose_name='Motivo')
+    quantity = models.BigIntegerField(verbose_name='Cantidad total')
+    entries = models.PositiveIntegerField(verbose_name='Movimientos')
+
+    class Meta:
+        verbose_name = 'Resumen diario de control de material'
+        verbose_name_plural = 'Resúmenes diarios de control de material'
+        ordering = ['-day']
+        unique_together = ['material', 'day', 'operation', 'reason']
+        indexes = [
+            models.Index(fields=['day', 'operation', 'reason'], name='rollup_day_op_reason_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.material.name} {self.day:%Y-%m-%d} {self.get_operation_display()}: {self.quantity}"
@@ -0,0 +1,144 @@
+"""
+Particionado por rangos de fecha de la tabla de MaterialControl en MariaDB.
+
+La tabla se particiona por meses (p202501, p202502...) con RANGE COLUMNS(date)
+más una partición pmax para lo que quede fuera. Los años ya compactados se
+pueden fusionar en una partición anual (p2023). Los límites están en UTC,
+que es como Django guarda las fechas con USE_TZ.
+
+MariaDB exige que la columna de particionado forme parte de la clave
+primaria y no admite claves foráneas en tablas particionadas, así que la
+conversión inicial:
+- cambia la clave primaria a (id, date);
+- elimina las claves foráneas de la tabla y las que apuntan a ella
+  (MaterialMovement.material_control). La integridad la sigue garantizando
+  Django con on_delete.
+
+Estas funciones solo generan SQL; lo ejecuta el comando
+partition_material_control.
+"""
+from datetime import datetime
+
+from django.db import connection
+
+from .models import MaterialControl
+
+
+MAXVALUE = 'MAXVALUE'
+
+
+def _table():
+    return MaterialControl._meta.db_table
+
+
+def _boundary(value):
+    return f"'{value:%Y-%m-%d %H:%M:%S}'"
+
+
+def _next_month(value):
+    return value.replace(year=value.year + value.month // 12, month=value.month % 12 + 1)
+
+
+def month_floor(value):
+    return datetime(value.year, value.month, 1)
+
+
+def existing_partitions():
+    """
+    Lista de (nombre, límite superior) de las particiones de la tabla, en orden.
+    El límite es un datetime en UTC o MAXVALUE. Lista vacía si no está particionada.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [_table()],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, description in rows:
+        if description == MAXVALUE:
+            partitions.append((name, MAXVALUE))
+        else:
+            partitions.append((name, datetime.strptime(description.strip("'"), '%Y-%m-%d %H:%M:%S')))
+    return partitions
+
+
+def _foreign_keys():
+    """Claves foráneas (tabla, nombre) que salen de la tabla o apuntan a ella."""
+    table = _table()
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        found = []
+        for other in tables:
+            constraints = connection.introspection.get_constraints(cursor, other)
+            for name, info in constraints.items():
+                target = info.get('foreign_key')
+                if target and (other == table or target[0] == table):
+                    found.append((other, name))
+    return found
+
+
+def _monthly_partitions(first, until):
+    """Particiones mensuales desde el mes de `first` hasta el de `until`, ambos incluidos."""
+    definitions = []
+    month = month_floor(first)
+    while month <= until:
+        upper = _next_month(month)
+        definitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ({_boundary(upper)})")
+        month = upper
+    return definitions
+
+
+def initial_sql(first_month, last_month):
+    """SQL para convertir la tabla en particionada, con meses de first_month a last_month."""
+    table = _table()
+    statements = [
+        f"ALTER TABLE `{fk_table}` DROP FOREIGN KEY `{name}`"
+        for fk_table, name in _foreign_keys()
+    ]
+    statements.append(f"ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `date`)")
+    partitions = _monthly_partitions(first_month, last_month)
+    partitions.append(f"PARTITION pmax VALUES LESS THAN ({MAXVALUE})")
+    statements.append(
+        f"ALTER TABLE `{table}` PARTITION BY RANGE COLUMNS(`date`) (\n    "
+        + ",\n    ".join(partitions)
+        + "\n)"
+    )
+    return statements
+
+
+def extend_sql(partitions, last_month):
+    """SQL para crear (partiendo pmax) las particiones mensuales que falten hasta last_month."""
+    bounded = [upper for _, upper in partitions if upper != MAXVALUE]
+    if not bounded or max(bounded) > last_month:
+        return []
+    new = _monthly_partitions(max(bounded), last_month)
+    new.append(f"PARTITION pmax VALUES LESS THAN ({MAXVALUE})")
+    return [
+        f"ALTER TABLE `{_table()}` REORGANIZE PARTITION pmax INTO (\n    "
+        + ",\n    ".join(new)
+        + "\n)"
+    ]
+
+
+def merge_years_sql(partitions, before_year):
+    """SQL para fusionar en una partición anual los meses de los años anteriores a before_year."""
+    by_year = {}
+    for name, upper in partitions:
+        if upper == MAXVALUE or len(name) != 7:
+            continue
+        year = int(name[1:5])
+        if year < before_year:
+            by_year.setdefault(year, []).append(name)
+
+    statements = []
+    for year, names in sorted(by_year.items()):
+        upper = datetime(year + 1, 1, 1)
+        statements.append(
+            f"ALTER TABLE `{_table()}` REORGANIZE PARTITION {', '.join(names)} "
+            f"INTO (PARTITION p{year} VALUES LESS THAN ({_boundary(upper)}))"
+        )
+    return statements
@@ -0,0 +1,282 @@
+"""
+Agregado diario de MaterialControl (MaterialDailyRollup).
+
+Cada fila de MaterialDailyRollup es el total de un (material, día, operación,
+motivo), con los días en la zona horaria del proyecto. Las filas no se
+incrementan: se recalculan desde el histórico los (material, día) afectados,
+así que repetir un recálculo nunca duplica cantidades. Se mantiene por dos
+caminos:
+
+- al confirmar la transacción de cada MaterialControl que se guarda (señal
+  post_save) o de los que se crean en bloque (schedule_refresh), si
+  MATERIAL_ROLLUP_ON_COMMIT está activo;
+- con catch_up(), que recalcula los días de los movimientos posteriores a la
+  marca de agua (RollupCheckpoint) menos MATERIAL_ROLLUP_OVERLAP_SECONDS, para
+  recoger lo que no pasó por la señal y las transacciones que tardaron en
+  confirmarse. Se programa cada pocos minutos con refresh_material_rollups.
+
+Hasta que se construye por primera vez (rebuild o el primer catch_up, sin
+marca de agua) las consultas se calculan desde el histórico.
+
+Los meses compactados (MaterialControlSummary) se cuentan en el primer día
+del mes: los totales por mes son exactos y los diarios de esos meses no.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from apps.core.models import RollupCheckpoint
+
+from .models import Material, MaterialControl, MaterialControlSummary, MaterialDailyRollup
+
+
+CHECKPOINT_NAME = 'materials.MaterialDailyRollup'
+BATCH_SIZE = 2000
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _aggregate(controls, summaries):
+    """{(material, día, operación, motivo): [cantidad, movimientos]} de ambos orígenes."""
+    totals = defaultdict(lambda: [0, 0])
+    rows = (
+        controls.annotate(day=TruncDate('date'))
+        .values_list('material_id', 'day', 'operation', 'reason')
+        .annotate(total=Sum('quantity'), entries=Count('id'))
+        .order_by()
+    )
+    for material_id, day, operation, reason, total, entries in rows.iterator():
+        totals[(material_id, day, operation, reason)][0] += total
+        totals[(material_id, day, operation, reason)][1] += entries
+
+    rows = summaries.values_list('material_id', 'month', 'operation', 'reason', 'quantity', 'entries')
+    for material_id, month, operation, reason, total, entries in rows.iterator():
+        totals[(material_id, month, operation, reason)][0] += total
+        totals[(material_id, month, operation, reason)][1] += entries
+    return totals
+
+
+def _save(totals):
+    rollups = [
+        MaterialDailyRollup(material_id=material_id, day=day, operation=operation, reason=reason,
+                            quantity=quantity, entries=entries)
+        for (material_id, day, operation, reason), (quantity, entries) in totals.items()
+    ]
+    # MySQL/MariaDB no admite indicar la restricción del ON DUPLICATE KEY
+    unique_fields = (
+        ['material', 'day', 'operation', 'reason']
+        if connection.features.supports_update_conflicts_with_target else None
+    )
+    MaterialDailyRollup.objects.bulk_create(
+        rollups, batch_size=BATCH_SIZE, update_conflicts=True,
+        unique_fields=unique_fields, update_fields=['quantity', 'entries'],
+    )
+
+
+def refresh_days(keys):
+    """Recalcula los agregados de los (material_id, día) de `keys`. Devuelve cuántos días recalcula."""
+    keys = set(keys)
+    if not keys:
+        return 0
+    days = defaultdict(set)
+    for material_id, day in keys:
+        days[day].add(material_id)
+    material_ids = {material_id for material_id, _ in keys}
+    first, last = min(days), max(days)
+
+    controls = MaterialControl.objects.filter(
+        material_id__in=material_ids,
+        date__gte=_day_start(first), date__lt=_day_start(last + timedelta(days=1)),
+    )
+    # Los resúmenes mensuales solo se suman al reconstruir: un día reciente no está compactado
+    totals = {
+        key: value for key, value in _aggregate(controls, MaterialControlSummary.objects.none()).items()
+        if (key[0], key[1]) in keys
+    }
+
+    with transaction.atomic():
+        _save(totals)
+        # Los grupos que ya no tienen movimientos (por ejemplo tras un borrado)
+        for day, day_materials in days.items():
+            current = {(operation, reason, material_id) for material_id, d, operation, reason in totals if d == day}
+            stale = [
+                rollup_id for rollup_id, operation, reason, material_id in
+                MaterialDailyRollup.objects.filter(day=day, material_id__in=day_materials)
+                .values_list('id', 'operation', 'reason', 'material_id')
+                if (operation, reason, material_id) not in current
+            ]
+            if stale:
+                MaterialDailyRollup.objects.filter(id__in=stale).delete()
+    return len(keys)
+
+
+def _control_key(control):
+    return control.material_id, timezone.localdate(control.date)
+
+
+def schedule_refresh(controls):
+    """Recalcula los días de `controls` cuando se confirme la transacción en curso."""
+    if not settings.MATERIAL_ROLLUP_ON_COMMIT:
+        return
+    keys = {_control_key(control) for control in controls if control.date is not None}
+    if keys:
+        transaction.on_commit(partial(refresh_days, keys))
+
+
+def refresh_on_save(sender, instance, **kwargs):
+    schedule_refresh([instance])
+
+
+def catch_up():
+    """
+    Recalcula los días con movimientos posteriores a la marca de agua y la
+    avanza. Devuelve cuántos (material, día) se han recalculado; sin marca
+    de agua (primera ejecución) reconstruye todo y devuelve las filas guardadas.
+    """
+    checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    if checkpoint.position is None:
+        return rebuild()
+
+    since = checkpoint.position - timedelta(seconds=settings.MATERIAL_ROLLUP_OVERLAP_SECONDS)
+    recent = MaterialControl.objects.filter(date__gt=since)
+    last = recent.aggregate(last=Max('date'))['last']
+    keys = set(
+        recent.annotate(day=TruncDate('date')).values_list('material_id', 'day').distinct().order_by()
+    )
+    refreshed = refresh_days(keys)
+    if last is not None and last > checkpoint.position:
+        RollupCheckpoint.objects.filter(pk=checkpoint.pk).update(position=last, updated_at=timezone.now())
+    return refreshed
+
+
+def rebuild(since=None):
+    """
+    Reconstruye el agregado entero, o desde el día `since`, a partir del
+    histórico y de los resúmenes mensuales. Devuelve cuántas filas guarda.
+    """
+    started = timezone.now()
+    controls = MaterialControl.objects.all()
+    summaries = MaterialControlSummary.objects.all()
+    rollups = MaterialDailyRollup.objects.all()
+    if since is not None:
+        controls = controls.filter(date__gte=_day_start(since))
+        summaries = summaries.filter(month__gte=since)
+        rollups = rollups.filter(day__gte=since)
+
+    with transaction.atomic():
+        rollups.delete()
+        totals = _aggregate(controls, summaries)
+        _save(totals)
+        RollupCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={'position': started})
+    return len(totals)
+
+
+def is_built():
+    """Si el agregado se ha construido ya (rebuild o el primer catch_up)."""
+    return RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME, position__isnull=False).exists()
+
+
+INTERVALS = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+# Inicio del periodo de un día, igual que INTERVALS en la base de datos
+PERIOD_STARTS = {
+    'day': lambda day: day,
+    'week': lambda day: day - timedelta(days=day.weekday()),
+    'month': lambda day: day.replace(day=1),
+}
+GROUPS = ('reason', 'operation')
+
+
+def _filter(queryset, material_ids=None, operations=None, reasons=None):
+    if material_ids:
+        queryset = queryset.filter(material_id__in=material_ids)
+    if operations:
+        queryset = queryset.filter(operation__in=operations)
+    if reasons:
+        queryset = queryset.filter(reason__in=reasons)
+    return queryset
+
+
+def _rollups(start, end, **filters):
+    return _filter(MaterialDailyRollup.objects.filter(day__gte=start, day__lte=end), **filters)
+
+
+def _live_totals(start, end, **filters):
+    """
+    Las filas que tendría el agregado entre `start` y `end`, calculadas desde
+    el histórico. Solo se usa mientras el agregado no se ha construido, para
+    que las gráficas no salgan vacías hasta el primer catch_up.
+    """
+    controls = _filter(MaterialControl.objects.filter(
+        date__gte=_day_start(start), date__lt=_day_start(end + timedelta(days=1)),
+    ), **filters)
+    summaries = _filter(MaterialControlSummary.objects.filter(month__gte=start, month__lte=end), **filters)
+    return _aggregate(controls, summaries)
+
+
+def _live_usage_series(start, end, interval, group_by, **filters):
+    grouped = defaultdict(lambda: [0, 0])
+    for (material_id, day, operation, reason), (quantity, entries) in _live_totals(start, end, **filters).items():
+        group = {'reason': reason, 'operation': operation}.get(group_by)
+        key = (PERIOD_STARTS[interval](day),) + ((group,) if group_by else ())
+        grouped[key][0] += quantity
+        grouped[key][1] += entries
+    fields = ['period'] + ([group_by] if group_by else [])
+    return [
+        {**dict(zip(fields, key)), 'quantity': quantity, 'entries': entries}
+        for key, (quantity, entries) in sorted(grouped.items())
+    ]
+
+
+def _live_top_materials(start, end, limit, **filters):
+    by_material = defaultdict(lambda: [0, 0])
+    for (material_id, _, _, _), (quantity, entries) in _live_totals(start, end, **filters).items():
+        by_material[material_id][0] += quantity
+        by_material[material_id][1] += entries
+    top = sorted(by_material.items(), key=lambda item: (-item[1][0], item[0]))[:limit]
+    names = dict(Material.objects.filter(id__in=[material_id for material_id, _ in top]).values_list('id', 'name'))
+    return [
+        {'material_id': material_id, 'name': names.get(material_id), 'quantity': quantity, 'entries': entries}
+        for material_id, (quantity, entries) in top
+    ]
+
+
+def usage_series(start, end, interval='month', group_by='reason', **filters):
+    """Cantidad y movimientos por periodo (día, semana o mes) y, opcionalmente, por motivo u operación."""
+    if not is_built():
+        return _live_usage_series(start, end, interval, group_by, **filters)
+    rollups = _rollups(start, end, **filters)
+    truncate = INTERVALS[interval]
+    if truncate is not None:
+        rollups = rollups.annotate(period=truncate('day'))
+    else:
+        rollups = rollups.annotate(period=F('day'))
+    fields = ['period'] + ([group_by] if group_by else [])
+    rows = rollups.values(*fields).annotate(units=Sum('quantity'), count=Sum('entries')).order_by(*fields)
+    return [
+        {**{field: row[field] for field in fields}, 'quantity': row['units'], 'entries': row['count']}
+        for row in rows
+    ]
+
+
+def top_materials(start, end, limit=10, **filters):
+    """Materiales con más cantidad en el intervalo."""
+    if not is_built():
+        return _live_top_materials(start, end, limit, **filters)
+    rows = (
+        _rollups(start, end, **filters)
+        .values('material_id', name=F('material__name'))
+        .annotate(units=Sum('quantity'), count=Sum('entries'))
+        .order_by('-units', 'material_id')[:limit]
+    )
+    return [
+        {'material_id': row['material_id'], 'name': row['name'], 'quantity': row['units'], 'entries': row['count']}
+        for row in rows
+    ]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Material, MaterialControl
+from .models import Material, MaterialControl, MaterialControlSummary
 
 class MaterialSerializer(serializers.ModelSerializer):
     class Meta:
@@ -62,4 +62,37 @@ class MaterialControlSerializer(serializers.ModelSerializer):
     def get_contract_report_deleted_at(self, obj):
         if obj.contract_report and obj.contract_report.is_deleted and hasattr(obj.contract_report, 'deleted_at'):
             return obj.contract_report.deleted_at
-        return None
\ No newline at end of file
+        return None
+
+
+class MaterialControlSummarySerializer(serializers.ModelSerializer):
+    """
+    Resumen mensual con la misma forma que MaterialControlSerializer, para
+    mezclarlo con el detalle en el histórico. `date` es el último movimiento
+    del mes y `is_summary` distingue las filas agrupadas. El `id` lleva el
+    prefijo "summary-" para no coincidir con el de un movimiento del detalle.
+    """
+    id = serializers.SerializerMethodField()
+    material_name = serializers.ReadOnlyField(source='material.name')
+    operation_display = serializers.ReadOnlyField(source='get_operation_display')
+    reason_display = serializers.ReadOnlyField(source='get_reason_display')
+    date = serializers.DateTimeField(source='last_date', read_only=True)
+    is_summary = serializers.SerializerMethodField()
+    notes = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MaterialControlSummary
+        fields = [
+            'id', 'material', 'material_name', 'quantity', 'operation', 'operation_display',
+            'reason', 'reason_display', 'date', 'month', 'entries', 'first_date',
+            'is_summary', 'notes'
+        ]
+
+    def get_id(self, obj):
+        return f"summary-{obj.pk}"
+
+    def get_is_summary(self, obj):
+        return True
+
+    def get_notes(self, obj):
+        return f"Resumen de {obj.entries} movimientos de {obj.month:%m/%Y}"
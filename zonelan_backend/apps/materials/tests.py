@@ -1,3 +1,177 @@
+from datetime import datetime
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.storage.models import Department, MaterialLocation, Shelf, Tray, Warehouse
+from apps.users.models import User
+
+from . import rollups
+from .compaction import compact_month
+from .inventory import apply_reconciliation, ledger_balances, reconcile_inventory
+from .models import Material, MaterialControl, MaterialControlSummary
+
+
+class InventoryReconciliationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='almacen', email='almacen@example.com', password='secreto',
+            name='Almacén', phone='600000000', type='Admin',
+        )
+        warehouse = Warehouse.objects.create(name='Central')
+        department = Department.objects.create(warehouse=warehouse, name='Planta baja')
+        shelf = Shelf.objects.create(department=department, name='E1')
+        self.tray = Tray.objects.create(shelf=shelf, name='B1')
+        self.material = Material.objects.create(name='Cable', quantity=10, price=1)
+        MaterialControl.objects.create(
+            user=self.user, material=self.material, quantity=10, operation='ADD', reason='COMPRA',
+        )
+        self.location = MaterialLocation.objects.create(material=self.material, tray=self.tray, quantity=10)
+
+    def test_location_movements_do_not_create_discrepancies(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/storage/movements/', {
+            'material': self.material.id, 'operation': 'REMOVE', 'quantity': 4,
+            'source_location': self.location.id, 'user': self.user.id,
+        }, format='json', secure=True, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(MaterialControl.objects.filter(reason='TRASLADO', operation='REMOVE').exists())
+
+        self.assertEqual(ledger_balances(), {self.material.id: 10})
+        self.assertEqual(reconcile_inventory(), [])
+        self.assertEqual(apply_reconciliation(self.user), [])
+        self.assertFalse(MaterialControl.objects.filter(reason='CUADRE').exists())
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.quantity, 10)
+
+
+class ConsumptionRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='almacen', email='almacen@example.com', password='secreto',
+            name='Almacén', phone='600000000', type='Admin',
+        )
+        self.cable = Material.objects.create(name='Cable', quantity=100, price=1)
+        self.switch = Material.objects.create(name='Switch', quantity=100, price=20)
+        for material, quantity, operation, reason in (
+            (self.cable, 5, 'REMOVE', 'VENTA'),
+            (self.cable, 3, 'REMOVE', 'USO'),
+            (self.switch, 9, 'REMOVE', 'VENTA'),
+            (self.switch, 20, 'ADD', 'COMPRA'),
+        ):
+            MaterialControl.objects.create(
+                user=self.user, material=material, quantity=quantity, operation=operation, reason=reason,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, path):
+        response = self.client.get(path, secure=True, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def responses(self):
+        return [
+            self.get(f'/materials/consumption/usage/?interval={interval}&group_by={group_by}')
+            for interval in ('day', 'week', 'month') for group_by in ('reason', 'operation', 'none')
+        ] + [self.get('/materials/consumption/top/')]
+
+    def test_history_is_used_until_the_rollup_is_built(self):
+        self.assertFalse(rollups.is_built())
+        live = self.responses()
+
+        self.assertEqual(
+            [(row['name'], row['quantity']) for row in live[-1]], [('Switch', 9), ('Cable', 8)]
+        )
+        rollups.rebuild()
+        self.assertTrue(rollups.is_built())
+        self.assertEqual(self.responses(), live)
+
+
+class CompactionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='almacen', email='almacen@example.com', password='secreto',
+            name='Almacén', phone='600000000', type='Admin',
+        )
+        self.cable = Material.objects.create(name='Cable', quantity=100, price=1)
+        self.switch = Material.objects.create(name='Switch', quantity=100, price=20)
+        self.month = timezone.make_aware(datetime(2020, 3, 1))
+        for material, day, quantity, operation, reason in (
+            (self.cable, 2, 10, 'ADD', 'COMPRA'),
+            (self.cable, 5, 3, 'REMOVE', 'VENTA'),
+            (self.cable, 20, 2, 'REMOVE', 'VENTA'),
+            (self.cable, 21, 4, 'REMOVE', 'TRASLADO'),
+            (self.switch, 9, 1, 'REMOVE', 'USO'),
+        ):
+            self.create_control(material, (3, day), quantity, operation, reason)
+        self.with_invoice = self.create_control(self.cable, (3, 10), 6, 'ADD', 'COMPRA',
+                                                invoice_image='invoices/albaran.jpg')
+        self.next_month = self.create_control(self.cable, (4, 1), 1, 'REMOVE', 'VENTA')
+
+    def create_control(self, material, month_day, quantity, operation, reason, **extra):
+        control = MaterialControl.objects.create(
+            user=self.user, material=material, quantity=quantity, operation=operation, reason=reason, **extra,
+        )
+        # `date` es auto_now_add
+        control.date = timezone.make_aware(datetime(2020, *month_day, 12))
+        MaterialControl.objects.filter(pk=control.pk).update(date=control.date)
+        return control
+
+    def summaries(self):
+        return {
+            (row.material_id, row.operation, row.reason): (row.quantity, row.entries, row.first_date.day,
+                                                           row.last_date.day)
+            for row in MaterialControlSummary.objects.all()
+        }
+
+    def test_month_is_grouped_and_totals_are_kept(self):
+        balances = ledger_balances()
+
+        self.assertEqual(compact_month(self.month), (5, 4))
+
+        self.assertEqual(self.summaries(), {
+            (self.cable.id, 'ADD', 'COMPRA'): (10, 1, 2, 2),
+            (self.cable.id, 'REMOVE', 'VENTA'): (5, 2, 5, 20),
+            (self.cable.id, 'REMOVE', 'TRASLADO'): (4, 1, 21, 21),
+            (self.switch.id, 'REMOVE', 'USO'): (1, 1, 9, 9),
+        })
+        self.assertEqual(set(MaterialControlSummary.objects.values_list('month', flat=True)), {self.month.date()})
+        # Se conservan el movimiento con albarán y los del mes siguiente
+        self.assertEqual(
+            set(MaterialControl.objects.values_list('id', flat=True)), {self.with_invoice.id, self.next_month.id}
+        )
+        self.assertEqual(ledger_balances(), balances)
+
+    def test_rerun_merges_into_existing_summaries(self):
+        compact_month(self.month)
+        # Movimiento con fecha de marzo registrado después de compactar
+        self.create_control(self.cable, (3, 25), 7, 'REMOVE', 'VENTA')
+        balances = ledger_balances()
+
+        self.assertEqual(compact_month(self.month), (1, 1))
+
+        self.assertEqual(self.summaries()[(self.cable.id, 'REMOVE', 'VENTA')], (12, 3, 5, 25))
+        self.assertEqual(MaterialControlSummary.objects.count(), 4)
+        self.assertEqual(ledger_balances(), balances)
+        self.assertEqual(compact_month(self.month), (0, 0))
+
+    def test_history_ids_do_not_collide(self):
+        compact_month(self.month)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(f'/materials/material-history/{self.cable.id}/', secure=True, SERVER_NAME='localhost')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        ids = [row['id'] for row in response.data]
+        self.assertEqual(len(ids), len(set(ids)))
+        summary_ids = {f'summary-{pk}' for pk in MaterialControlSummary.objects.filter(
+            material=self.cable).values_list('pk', flat=True)}
+        self.assertEqual({row['id'] for row in response.data if row.get('is_summary')}, summary_ids)
+        self.assertEqual(len(ids), 5)
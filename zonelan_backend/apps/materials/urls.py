@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -6,10 +7,21 @@ router = DefaultRouter()
 router.register(r'materials', views.MaterialViewSet)
 router.register(r'control', views.MaterialControlViewSet)
 
+if settings.ASYNC_VIEWS:
+    from .async_views import material_stats
+else:
+    from .views import material_stats
+
 urlpatterns = [
     path('', include(router.urls)),
     path('material-history/<int:material_id>/', views.material_history, name='material-history'),
-    path('stats/', views.material_stats, name='material-stats'),
+    path('stats/', material_stats, name='material-stats'),
+    path('reorder-suggestions/', views.material_reorder_suggestions, name='material-reorder-suggestions'),
+    path('consumption/usage/', views.consumption_usage, name='consumption-usage'),
+    path('consumption/top/', views.consumption_top, name='consumption-top'),
+    path('reconciliation/', views.inventory_reconciliation, name='inventory-reconciliation'),
+    path('reconciliation/apply/', views.apply_inventory_reconciliation, name='inventory-reconciliation-apply'),
+    path('stock-conflicts/', views.stock_conflict_stats, name='stock-conflict-stats'),
 ]
 
 # La acción adjust_stock estará disponible en:
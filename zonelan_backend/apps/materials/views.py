@@ -1,40 +1,29 @@
 import logging
-import traceback
 
 logger = logging.getLogger(__name__)
 
-# Configuración básica de logging si no está configurado
-import logging.config
-logging.config.dictConfig({
-    'version': 1,
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'level': 'DEBUG',
-        },
-    },
-    'loggers': {
-        '': {
-            'handlers': ['console'],
-            'level': 'DEBUG',
-        },
-    },
-})
-
 from django.shortcuts import render
 from rest_framework import viewsets, status
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from django.db import transaction
-from .models import Material, MaterialControl
-from .serializers import MaterialSerializer, MaterialControlSerializer
+from django.http import HttpResponse
+from django.utils.dateparse import parse_date
+from .forecasting import METHODS, reorder_suggestions
+from .rollups import GROUPS, INTERVALS, schedule_refresh, top_materials, usage_series
+from .inventory import apply_reconciliation, reconcile_inventory, write_reconciliation_csv
+from .models import Material, MaterialControl, MaterialControlSummary
+from .serializers import MaterialSerializer, MaterialControlSerializer, MaterialControlSummarySerializer
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework.decorators import api_view, action
+from rest_framework.decorators import api_view, action, permission_classes
 from django.db.models import Count, Sum, F, Q
 from django.utils import timezone  # Añadir esta importación
 from apps.storage.models import MaterialLocation  # Añadir esta importación
+from apps.core.db_router import ReplicaReadMixin, replica_safe
+from apps.core.versioning import VersionConflict, apply_delta, cas_stats, compare_and_swap
 
-class MaterialViewSet(viewsets.ModelViewSet):
+class MaterialViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Material.objects.all().order_by('name')
     serializer_class = MaterialSerializer
     permission_classes = [IsAuthenticated]
@@ -80,7 +69,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
                 # Para operaciones ADD (entrada)
                 if operation == 'ADD':
                     # Aumentar la cantidad del material
-                    instance.quantity += quantity_change
+                    apply_delta(instance, quantity_change)
                     
                     # Crear el registro de control
                     MaterialControl.objects.create(
@@ -99,7 +88,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
                         return Response({"detail": "Stock insuficiente"}, status=400)
                     
                     # Disminuir la cantidad del material
-                    instance.quantity -= quantity_change
+                    apply_delta(instance, -quantity_change, minimum=0)
                     
                     # Crear el registro de control
                     MaterialControl.objects.create(
@@ -118,10 +107,10 @@ class MaterialViewSet(viewsets.ModelViewSet):
             
             return Response(serializer.data)
             
+        except VersionConflict:
+            raise
         except Exception as e:
-            import traceback
-            print(f"Error en update: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error en update: %s", e)
             return Response({"detail": f"Error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     @transaction.atomic
@@ -144,8 +133,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
             for material_used in materials_used:
                 # Devolver el material al inventario
                 material = material_used.material
-                material.quantity += material_used.quantity
-                material.save()
+                apply_delta(material, material_used.quantity)
                 
                 # Registrar en el control como devolución
                 MaterialControl.objects.create(
@@ -214,17 +202,12 @@ class MaterialViewSet(viewsets.ModelViewSet):
                     operation = 'ADD' if difference > 0 else 'REMOVE'
                     quantity = abs(difference)
                     
-                    # Actualizar el stock en la ubicación
-                    location.quantity = target_stock
-                    location.save()
+                    # Actualizar el stock en la ubicación: el objetivo se calculó con la
+                    # cantidad leída, así que si ha cambiado se responde 409
+                    compare_and_swap(location, quantity=target_stock)
                     
                     # Actualizar el stock total del material
-                    if operation == 'ADD':
-                        material.quantity += quantity
-                    else:
-                        material.quantity -= quantity
-                        
-                    material.save()
+                    apply_delta(material, difference)
                     
                     # Registrar el control
                     MaterialControl.objects.create(
@@ -280,12 +263,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
                 operation = 'ADD' if difference > 0 else 'REMOVE'
                 quantity = abs(difference)
                 
-                if operation == 'ADD':
-                    material.quantity += quantity
-                else:
-                    material.quantity -= quantity
-                    
-                material.save()
+                apply_delta(material, difference)
                 
                 # Registrar el control
                 MaterialControl.objects.create(
@@ -308,30 +286,54 @@ class MaterialViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
                 
+        except VersionConflict:
+            raise
         except Exception as e:
-            import traceback
-            print(f"Error en adjust_stock: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error en adjust_stock: %s", e)
             return Response(
                 {"detail": f"Error al ajustar el stock: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class MaterialControlViewSet(viewsets.ModelViewSet):
+class MaterialControlViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = MaterialControl.objects.all().order_by('-date')
     serializer_class = MaterialControlSerializer
     permission_classes = [IsAuthenticated]
 
+    def perform_destroy(self, instance):
+        # El agregado diario solo escucha post_save: el borrado se recalcula aquí
+        instance.delete()
+        schedule_refresh([instance])
+
 @api_view(['GET'])
+@replica_safe
 def material_history(request, material_id):
+    """
+    Histórico de movimientos del material: el detalle reciente más los
+    resúmenes mensuales de los meses ya compactados, ordenados por fecha.
+    """
     try:
-        history = MaterialControl.objects.filter(material_id=material_id).order_by('-date')
-        serializer = MaterialControlSerializer(history, many=True, context={'request': request})
-        return Response(serializer.data)
+        history = list(MaterialControl.objects.filter(material_id=material_id).order_by('-date'))
+        summaries = list(
+            MaterialControlSummary.objects.filter(material_id=material_id).select_related('material')
+        )
+        context = {'request': request}
+        rows = list(zip(
+            [control.date for control in history],
+            MaterialControlSerializer(history, many=True, context=context).data
+        ))
+        if summaries:
+            rows += zip(
+                [summary.last_date for summary in summaries],
+                MaterialControlSummarySerializer(summaries, many=True, context=context).data
+            )
+            rows.sort(key=lambda row: row[0], reverse=True)
+        return Response([data for _, data in rows])
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
+@replica_safe
 def material_stats(request):
     """Endpoint para devolver estadísticas de materiales para el dashboard"""
     try:
@@ -355,7 +357,169 @@ def material_stats(request):
             'recentOperations': recent_operations
         })
     except Exception as e:
-        import traceback
-        print(f"Error en material_stats: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error en material_stats: %s", e)
         return Response({"error": str(e)}, status=500)
+
+
+def _material_ids_param(data):
+    """Lista de ids de ?materials=1,2,3 (None para todo el inventario)."""
+    value = data.get('materials')
+    if not value:
+        return None
+    if isinstance(value, list):
+        return [int(material_id) for material_id in value]
+    return [int(material_id) for material_id in str(value).split(',') if material_id.strip()]
+
+
+@api_view(['GET'])
+@replica_safe
+def inventory_reconciliation(request):
+    """
+    Informe de cuadre de todo el inventario: stock total frente a stock
+    ubicado y saldo del histórico. Por defecto solo los materiales que no
+    cuadran (?all=1 para todos) y en JSON (?export=csv para descargar CSV).
+    """
+    try:
+        material_ids = _material_ids_param(request.query_params)
+    except ValueError:
+        return Response({"detail": "Lista de materiales inválida"}, status=status.HTTP_400_BAD_REQUEST)
+
+    only_discrepancies = request.query_params.get('all', '').lower() not in ('1', 'true', 'yes')
+    rows = reconcile_inventory(material_ids, only_discrepancies=only_discrepancies)
+
+    if request.query_params.get('export') == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="cuadre_inventario_{timezone.localdate():%Y%m%d}.csv"'
+        )
+        write_reconciliation_csv(rows, response)
+        return response
+
+    return Response({
+        'generated_at': timezone.now(),
+        'discrepancies': sum(1 for row in rows if row['problems']),
+        'results': rows,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def apply_inventory_reconciliation(request):
+    """
+    Genera en bloque los movimientos de CUADRE de los materiales que no
+    cuadran (todos o los de "materials") y ajusta su stock total.
+    """
+    try:
+        material_ids = _material_ids_param(request.data)
+    except (TypeError, ValueError):
+        return Response({"detail": "Lista de materiales inválida"}, status=status.HTTP_400_BAD_REQUEST)
+
+    corrections = apply_reconciliation(request.user, material_ids, notes=request.data.get('notes', ''))
+    return Response({'corrected': len(corrections), 'results': corrections})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def stock_conflict_stats(request):
+    """
+    Escrituras de stock con compare-and-swap por día: correctas, intentos
+    fallidos por cambio de versión, 409 devueltos y tasa de conflictos.
+    """
+    try:
+        days = min(max(int(request.query_params.get('days', 7)), 1), 7)
+    except ValueError:
+        return Response({"detail": "days debe ser un número entero"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': cas_stats(days)})
+
+
+@api_view(['GET'])
+@replica_safe
+def material_reorder_suggestions(request):
+    """
+    Mínimos sugeridos y cantidades a pedir a partir del consumo previsto.
+    Parámetros: method (sma|ses), window, alpha, lead_time, review_days,
+    materials=1,2,3 y only_reorder=1 para ver solo lo que hay que pedir.
+    """
+    params = request.query_params
+    method = params.get('method', 'sma')
+    if method not in METHODS:
+        return Response({"detail": f"Método no válido. Opciones: {', '.join(METHODS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        options = {
+            'window': int(params.get('window', 90)),
+            'alpha': float(params.get('alpha', 0.1)),
+            'lead_time_days': int(params['lead_time']) if 'lead_time' in params else None,
+            'review_days': int(params['review_days']) if 'review_days' in params else None,
+        }
+        material_ids = _material_ids_param(params)
+    except ValueError:
+        return Response({"detail": "Parámetros de previsión no válidos"}, status=status.HTTP_400_BAD_REQUEST)
+    if options['window'] < 1 or not 0 < options['alpha'] <= 1:
+        return Response({"detail": "window debe ser positivo y alpha estar entre 0 y 1"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    suggestions = reorder_suggestions(material_ids, method=method, **options)
+    if params.get('only_reorder', '').lower() in ('1', 'true', 'yes'):
+        suggestions = [item for item in suggestions if item['order_quantity'] > 0]
+
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(suggestions, request)
+    return paginator.get_paginated_response(page)
+
+
+def _rollup_filters(params, default_days):
+    """Intervalo de fechas y filtros comunes de las gráficas de consumo."""
+    end = parse_date(params['to']) if params.get('to') else timezone.localdate()
+    start = parse_date(params['from']) if params.get('from') else end - timezone.timedelta(days=default_days)
+    if start is None or end is None:
+        raise ValueError("Fecha no válida (AAAA-MM-DD)")
+    if start > end:
+        raise ValueError("La fecha inicial es posterior a la final")
+
+    def names(name):
+        return [value.strip() for value in params.get(name, '').split(',') if value.strip()]
+
+    return start, end, {
+        'material_ids': _material_ids_param(params),
+        'operations': names('operation'),
+        'reasons': names('reason'),
+    }
+
+
+@api_view(['GET'])
+@replica_safe
+def consumption_usage(request):
+    """
+    Serie para gráficas a partir del agregado diario: ?interval=day|week|month,
+    ?group_by=reason|operation|none, ?from, ?to, ?materials, ?operation, ?reason
+    (operation y reason admiten varios valores separados por comas).
+    """
+    interval = request.query_params.get('interval', 'month')
+    group_by = request.query_params.get('group_by', 'reason')
+    if interval not in INTERVALS or group_by not in GROUPS + ('none',):
+        return Response({"detail": "interval o group_by no válidos"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start, end, filters = _rollup_filters(request.query_params, default_days=365)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = usage_series(start, end, interval=interval,
+                           group_by=None if group_by == 'none' else group_by, **filters)
+    return Response({'from': start, 'to': end, 'interval': interval, 'results': results})
+
+
+@api_view(['GET'])
+@replica_safe
+def consumption_top(request):
+    """Materiales más consumidos (por defecto salidas por venta o uso en los últimos 30 días)."""
+    params = request.query_params.copy()
+    params.setdefault('operation', 'REMOVE')
+    params.setdefault('reason', 'VENTA,USO')
+    try:
+        start, end, filters = _rollup_filters(params, default_days=30)
+        limit = min(int(params.get('limit', 10)), 100)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'from': start, 'to': end, 'results': top_materials(start, end, limit=limit, **filters)})
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import WorkReport, MaterialUsed, ReportImage, TechnicianAssignment
+from apps.core.admin import SoftDeleteAdmin
+from .models import WorkReport, MaterialUsed, ReportImage, TechnicianAssignment, TechnicianWeeklyWorkload
 
 class MaterialUsedInline(admin.TabularInline):
     model = MaterialUsed
@@ -10,7 +11,7 @@ class TechnicianAssignmentInline(admin.TabularInline):
     extra = 1
 
 @admin.register(WorkReport)
-class WorkReportAdmin(admin.ModelAdmin):
+class WorkReportAdmin(SoftDeleteAdmin):
     list_display = ('id', 'incident', 'status', 'date', 'is_deleted')
     list_filter = ('status', 'incident', 'date', 'is_deleted')
     search_fields = ('description', 'incident__title')
@@ -34,3 +35,13 @@ class TechnicianAssignmentAdmin(admin.ModelAdmin):
     list_display = ('technician', 'report')
     list_filter = ('technician', 'report')
     search_fields = ('technician__username', 'report__id')
+
+@admin.register(TechnicianWeeklyWorkload)
+class TechnicianWeeklyWorkloadAdmin(admin.ModelAdmin):
+    list_display = ('technician', 'week', 'source', 'hours', 'reports', 'materials')
+    list_filter = ('source',)
+    search_fields = ('technician__username', 'technician__name')
+    date_hierarchy = 'week'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('technician')
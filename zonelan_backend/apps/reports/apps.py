@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reports'  # Modificar esta línea para incluir el prefijo 'apps.'
+
+    def ready(self):
+        from .workload import connect_signals
+        connect_signals()
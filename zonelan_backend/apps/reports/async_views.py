@@ -0,0 +1,23 @@
+"""
+Versiones asíncronas de las vistas de partes para el modo ASGI (ASYNC_VIEWS).
+"""
+from django.http import JsonResponse
+
+from apps.core.async_support import async_api_view
+from apps.core.db_router import replica_safe
+from .models import WorkReport
+
+
+@async_api_view
+@replica_safe
+async def report_counts(request):
+    """Devuelve estadísticas de reportes para el dashboard"""
+    try:
+        reports = WorkReport.objects.all()
+        return JsonResponse({
+            'total': await reports.acount(),
+            'draft': await reports.filter(status='DRAFT').acount(),
+            'completed': await reports.filter(status='COMPLETED').acount()
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
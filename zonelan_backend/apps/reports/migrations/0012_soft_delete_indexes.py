@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0011_workreport_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workreport',
+            index=models.Index(fields=['is_deleted', 'date'], name='workreport_alive_date_idx'),
+        ),
+    ]
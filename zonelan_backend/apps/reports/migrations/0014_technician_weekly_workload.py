@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0013_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TechnicianWeeklyWorkload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(verbose_name='Semana (lunes)')),
+                ('source', models.CharField(choices=[('WORK', 'Parte de trabajo'), ('CONTRACT', 'Reporte de contrato')], max_length=10, verbose_name='Origen')),
+                ('hours', models.DecimalField(decimal_places=2, max_digits=9, verbose_name='Horas')),
+                ('reports', models.PositiveIntegerField(verbose_name='Partes')),
+                ('materials', models.BigIntegerField(verbose_name='Unidades de material')),
+                ('technician', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_workloads', to=settings.AUTH_USER_MODEL, verbose_name='Técnico')),
+            ],
+            options={
+                'verbose_name': 'Carga semanal de técnico',
+                'verbose_name_plural': 'Cargas semanales de técnicos',
+                'ordering': ['-week'],
+                'indexes': [models.Index(fields=['week', 'source'], name='workload_week_source_idx')],
+                'unique_together': {('technician', 'week', 'source')},
+            },
+        ),
+    ]
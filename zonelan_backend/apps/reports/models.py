@@ -3,9 +3,14 @@ from apps.users.models import User
 from apps.incidents.models import Incident
 from apps.materials.models import Material
 from django.core.exceptions import ValidationError
+from apps.core.soft_delete import SoftDeleteModel
+from apps.core.versioning import apply_delta
+import logging
 import os
 
-class WorkReport(models.Model):
+logger = logging.getLogger(__name__)
+
+class WorkReport(SoftDeleteModel):
     STATUS_CHOICES = [
         ('DRAFT', 'Borrador'),
         ('COMPLETED', 'Completado'),
@@ -36,12 +41,15 @@ class WorkReport(models.Model):
     is_deleted = models.BooleanField(default=False, verbose_name='Eliminado')
     deleted_at = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de eliminación')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Parte de trabajo'
         verbose_name_plural = 'Partes de trabajo'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['is_deleted', 'date'], name='workreport_alive_date_idx'),
+        ]
 
     def __str__(self):
         return f"Parte {self.id} - {self.incident.title} ({self.date})"
@@ -59,10 +67,16 @@ class WorkReport(models.Model):
 
     @property
     def before_images(self):
+        # Con Prefetch(..., to_attr='prefetched_before_images') no hace otra consulta
+        if hasattr(self, 'prefetched_before_images'):
+            return self.prefetched_before_images
         return self.images.filter(image_type='BEFORE')
 
     @property
     def after_images(self):
+        # Con Prefetch(..., to_attr='prefetched_after_images') no hace otra consulta
+        if hasattr(self, 'prefetched_after_images'):
+            return self.prefetched_after_images
         return self.images.filter(image_type='AFTER')
 
 class ReportImage(models.Model):
@@ -111,10 +125,19 @@ class ReportImage(models.Model):
                 if os.path.exists(directory) and not os.listdir(directory):
                     os.rmdir(directory)
             except OSError as e:
-                print(f"Error al eliminar el archivo físico: {e}")
+                logger.warning("Error al eliminar el archivo físico %s: %s", image_path, e)
                 
         return result
 
+
+def image_prefetch(image_type):
+    """Prefetch de las imágenes de un tipo para before_images / after_images."""
+    return models.Prefetch(
+        'images', queryset=ReportImage.objects.filter(image_type=image_type),
+        to_attr=f'prefetched_{image_type.lower()}_images',
+    )
+
+
 class TechnicianAssignment(models.Model):
     report = models.ForeignKey(
         WorkReport,
@@ -169,18 +192,52 @@ class MaterialUsed(models.Model):
         if self.pk:  # Si es una actualización
             old_instance = MaterialUsed.objects.get(pk=self.pk)
             # Devolver la cantidad anterior al stock
-            old_instance.material.quantity += old_instance.quantity
-            old_instance.material.save()
+            apply_delta(old_instance.material, old_instance.quantity)
         
         # Validar y reducir el stock
         self.full_clean()
-        self.material.quantity -= self.quantity
-        self.material.save()
+        apply_delta(self.material, -self.quantity)
         
         super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
         # Devolver la cantidad al stock cuando se elimina
-        self.material.quantity += self.quantity
-        self.material.save()
+        apply_delta(self.material, self.quantity)
         super().delete(*args, **kwargs)
+
+
+class TechnicianWeeklyWorkload(models.Model):
+    """
+    Horas, partes y materiales de cada técnico por semana (de lunes a
+    domingo) y origen: partes de trabajo o reportes de contrato. Se mantiene
+    de forma incremental (ver apps.reports.workload) y es la fuente de las
+    clasificaciones y de la ocupación de los técnicos.
+    """
+    SOURCE_CHOICES = [
+        ('WORK', 'Parte de trabajo'),
+        ('CONTRACT', 'Reporte de contrato'),
+    ]
+
+    technician = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='weekly_workloads',
+        verbose_name='Técnico'
+    )
+    week = models.DateField(verbose_name='Semana (lunes)')
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, verbose_name='Origen')
+    hours = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Horas')
+    reports = models.PositiveIntegerField(verbose_name='Partes')
+    materials = models.BigIntegerField(verbose_name='Unidades de material')
+
+    class Meta:
+        verbose_name = 'Carga semanal de técnico'
+        verbose_name_plural = 'Cargas semanales de técnicos'
+        ordering = ['-week']
+        unique_together = ['technician', 'week', 'source']
+        indexes = [
+            models.Index(fields=['week', 'source'], name='workload_week_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.technician.username} {self.week:%Y-%m-%d} {self.get_source_display()}: {self.hours} h"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import WorkReport, MaterialUsed, TechnicianAssignment, ReportImage
 from apps.materials.models import Material, MaterialControl  # Corregido: importar desde apps.materials.models
+from apps.core.versioning import apply_delta
 from django.db import transaction
 import json
 
@@ -35,6 +36,16 @@ class MaterialUsedSerializer(serializers.ModelSerializer):
                 })
         return data
 
+class WorkReportListSerializer(serializers.ModelSerializer):
+    """Versión ligera para listados (?compact=1): sin descripción, técnicos, materiales ni imágenes."""
+    incident_title = serializers.ReadOnlyField(source='incident.title')
+    customer_name = serializers.ReadOnlyField(source='incident.customer.name')
+
+    class Meta:
+        model = WorkReport
+        fields = ['id', 'date', 'incident', 'incident_title', 'customer_name', 'hours_worked',
+                  'status', 'is_deleted', 'created_at', 'updated_at']
+
 class WorkReportSerializer(serializers.ModelSerializer):
     materials_used = MaterialUsedSerializer(many=True, read_only=True)
     technicians = TechnicianAssignmentSerializer(many=True, read_only=True)
@@ -47,12 +58,6 @@ class WorkReportSerializer(serializers.ModelSerializer):
         model = WorkReport
         fields = '__all__'
 
-    def get_before_images(self, obj):
-        return ReportImageSerializer(obj.before_images, many=True).data
-
-    def get_after_images(self, obj):
-        return ReportImageSerializer(obj.after_images, many=True).data
-
     @transaction.atomic
     def create(self, validated_data):
         report = super().create(validated_data)
@@ -98,17 +103,14 @@ class WorkReportSerializer(serializers.ModelSerializer):
                             raise ValidationError(f"No hay suficiente stock en la ubicación. Disponible: {location.quantity}")
                         
                         # Actualizar stock en ubicación
-                        location.quantity -= int(quantity)
-                        location.save()
+                        apply_delta(location, -int(quantity), minimum=0)
                         
                         # En este caso, ya se descontará del stock total más abajo
                     except MaterialLocation.DoesNotExist:
                         # Si la ubicación no existe, seguir con la lógica normal
                         pass
                 
-                # Actualizar stock total
-                material.quantity -= int(quantity)
-                material.save()
+                # El stock total ya lo descuenta MaterialUsed.save()
                 
                 # Registrar en el control de materiales
                 MaterialControl.objects.create(
@@ -137,6 +139,15 @@ class WorkReportSerializer(serializers.ModelSerializer):
 
         return report
 
+    @staticmethod
+    def _use_stock(material, quantity):
+        """Descuenta `quantity` del stock total, con la misma comprobación que MaterialUsed.clean()."""
+        if material.quantity < quantity:
+            raise serializers.ValidationError({
+                'materials_used': f'No hay suficiente stock de {material.name}. Stock disponible: {material.quantity}'
+            })
+        apply_delta(material, -quantity, minimum=0)
+
     @transaction.atomic
     def update(self, instance, validated_data):
         request = self.context.get('request')
@@ -191,8 +202,7 @@ class WorkReportSerializer(serializers.ModelSerializer):
                             raise ValidationError(f"No hay suficiente stock en la ubicación. Disponible: {location.quantity}")
                         
                         # Actualizar stock en ubicación
-                        location.quantity -= quantity
-                        location.save()
+                        apply_delta(location, -quantity, minimum=0)
                         
                         # El stock total se manejará más adelante, no aquí
                         # ELIMINAR ESTA PARTE:
@@ -211,8 +221,7 @@ class WorkReportSerializer(serializers.ModelSerializer):
                 material = Material.objects.get(id=material_id)
                 
                 # Devolver al inventario
-                material.quantity += old_quantity
-                material.save()
+                apply_delta(material, old_quantity)
                 
                 # Registrar en el control como devolución
                 MaterialControl.objects.create(
@@ -229,8 +238,7 @@ class WorkReportSerializer(serializers.ModelSerializer):
                 difference = old_quantity - new_materials[material_id]
                 
                 # Devolver la diferencia al inventario
-                material.quantity += difference
-                material.save()
+                apply_delta(material, difference)
                 
                 # Registrar en el control como devolución parcial
                 MaterialControl.objects.create(
@@ -245,20 +253,10 @@ class WorkReportSerializer(serializers.ModelSerializer):
         # Identificar materiales que se van a añadir o aumentar (están en new pero no en current o con mayor cantidad)
         for material_id, new_quantity in new_materials.items():
             if material_id not in current_materials:
-                # Material nuevo: registrar como USO, pero solo si no se ha procesado ya a través de location_id
+                # Material nuevo: registrar como USO. El stock total se descuenta
+                # siempre; con location_id también se ha descontado de la ubicación
                 material = Material.objects.get(id=material_id)
-                
-                # Aquí es donde se debe reducir el inventario general si no se ha usado location_id
-                location_id_used = False
-                for m_data in materials_data:
-                    if m_data.get('material') == material_id and m_data.get('location_id'):
-                        location_id_used = True
-                        break
-                
-                if not location_id_used:
-                    # Reducir el inventario solo si no se ha procesado a través de location_id
-                    material.quantity -= new_quantity
-                    material.save()
+                self._use_stock(material, new_quantity)
                 
                 # Registrar en el control como uso
                 MaterialControl.objects.create(
@@ -275,8 +273,7 @@ class WorkReportSerializer(serializers.ModelSerializer):
                 difference = new_quantity - current_materials[material_id]
                 
                 # Reducir la diferencia del inventario
-                material.quantity -= difference
-                material.save()
+                self._use_stock(material, difference)
                 
                 # Registrar en el control como uso adicional
                 MaterialControl.objects.create(
@@ -288,17 +285,15 @@ class WorkReportSerializer(serializers.ModelSerializer):
                     report=instance
                 )
         
-        # Eliminar todos los materiales actuales para recrearlos
+        # Recrear los materiales sin pasar por MaterialUsed.save() ni delete(),
+        # que volverían a mover el stock: las diferencias ya se han aplicado arriba.
+        # El delete() del queryset no llama a MaterialUsed.delete() y bulk_create
+        # no llama a save() (la carga de los técnicos la recalcula el save() del parte)
         MaterialUsed.objects.filter(report=instance).delete()
-        
-        # Crear los nuevos registros de materiales (sin afectar inventario adicional, ya se hizo arriba)
-        for material_data in materials_data:
-            if material_data and 'material' in material_data and 'quantity' in material_data:
-                MaterialUsed.objects.create(
-                    report=instance,
-                    material_id=material_data['material'],
-                    quantity=material_data['quantity']
-                )
+        MaterialUsed.objects.bulk_create([
+            MaterialUsed(report=instance, material_id=material_id, quantity=quantity)
+            for material_id, quantity in new_materials.items()
+        ])
 
         # Procesar imágenes marcadas para eliminación
         images_to_delete_ids = json.loads(request.data.get('images_to_delete', '[]'))
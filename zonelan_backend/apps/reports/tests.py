@@ -1,3 +1,222 @@
+import datetime
+import json
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.versioning import apply_delta
+from apps.customers.models import Customer
+from apps.incidents.models import Incident
+from apps.materials.models import Material
+from apps.users.models import User
+
+from . import workload
+from .models import MaterialUsed, ReportImage, TechnicianAssignment, WorkReport
+
+
+class ReportTestMixin:
+
+    def setUp(self):
+        self.user = self.create_user('tecnico')
+        customer = Customer.objects.create(
+            name='Cliente', address='Calle 1', email='cliente@example.com', phone='600000001',
+        )
+        self.incident = Incident.objects.create(
+            title='Avería', description='No funciona', customer=customer, reported_by=self.user,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_user(self, username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='secreto',
+            name=username.title(), phone='600000000', type='User',
+        )
+
+
+class WorkReportListQueriesTests(ReportTestMixin, TestCase):
+
+    def add_reports(self, count):
+        for _ in range(count):
+            report = WorkReport.objects.create(
+                date=datetime.date(2026, 1, 1), incident=self.incident, description='Trabajo',
+            )
+            for image_type in ('BEFORE', 'AFTER', 'AFTER'):
+                ReportImage.objects.create(report=report, image_type=image_type, image='report_images/foto.jpg')
+
+    def list_reports(self, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/reports/reports/{query}', secure=True, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_images_are_prefetched_by_type(self):
+        self.add_reports(2)
+        _, few = self.list_reports('?omit=materials_used,technicians')
+        self.add_reports(8)
+
+        with self.assertNumQueries(few):
+            response, _ = self.list_reports('?omit=materials_used,technicians')
+
+        report = response.data['results'][0]
+        self.assertEqual([image['image_type'] for image in report['before_images']], ['BEFORE'])
+        self.assertEqual([image['image_type'] for image in report['after_images']], ['AFTER', 'AFTER'])
+        self.assertNotIn('technicians', report)
+
+    def test_sync_prefetches_images(self):
+        def sync_reports():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/sync/?models=reports', secure=True, SERVER_NAME='localhost')
+            self.assertEqual(response.status_code, 200)
+            return response, len(queries)
+
+        self.add_reports(2)
+        _, few = sync_reports()
+        self.add_reports(8)
+
+        with self.assertNumQueries(few):
+            response, _ = sync_reports()
+        report = response.data['changes']['reports'][0]
+        self.assertEqual([image['image_type'] for image in report['after_images']], ['AFTER', 'AFTER'])
+
+    def test_omitted_fields_skip_their_prefetches(self):
+        self.add_reports(3)
+        _, full = self.list_reports()
+        _, without_images = self.list_reports('?omit=before_images,after_images')
+        _, without_relations = self.list_reports('?omit=before_images,after_images,materials_used,technicians')
+
+        self.assertEqual(without_images, full - 2)
+        self.assertEqual(without_relations, full - 4)
+
+
+class WorkloadTests(ReportTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = self.create_user('ayudante')
+        material = Material.objects.create(name='Cable', quantity=100, price=1)
+        monday = workload.week_of(timezone.localdate())
+        for days_ago, hours, technicians, units in (
+            (0, '3.00', [self.user], 4),
+            (1, '2.50', [self.user, self.other], 0),
+            (7, '8.00', [self.other], 10),
+        ):
+            report = WorkReport.objects.create(
+                date=monday - datetime.timedelta(days=days_ago), incident=self.incident,
+                description='Trabajo', hours_worked=Decimal(hours), status='COMPLETED',
+            )
+            for technician in technicians:
+                TechnicianAssignment.objects.create(report=report, technician=technician)
+            if units:
+                MaterialUsed.objects.create(report=report, material=material, quantity=units)
+
+    def get(self, path):
+        response = self.client.get(path, secure=True, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def responses(self):
+        return [
+            self.get(f'/reports/workload/leaderboard/?metric={metric}{query}')
+            for metric in workload.METRICS for query in ('', '&source=WORK', f'&technicians={self.other.id}')
+        ] + [
+            self.get(f'/reports/workload/utilization/{query}')
+            for query in ('', f'?technicians={self.user.id}')
+        ]
+
+    def test_reports_are_used_until_the_workload_is_built(self):
+        self.assertFalse(workload.is_built())
+        live = self.responses()
+
+        self.assertEqual(
+            [(row['username'], row['hours'], row['materials']) for row in live[0]['results']],
+            [('ayudante', Decimal('10.50'), 10), ('tecnico', Decimal('5.50'), 4)],
+        )
+        workload.rebuild()
+        self.assertTrue(workload.is_built())
+        self.assertEqual(self.responses(), live)
+
+
+class WorkReportMaterialsStockTests(ReportTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cable = Material.objects.create(name='Cable', quantity=100, price=1)
+        self.switch = Material.objects.create(name='Switch', quantity=20, price=30)
+
+    def send(self, method, path, materials):
+        response = getattr(self.client, method)(path, {
+            'incident': self.incident.id, 'date': '2026-01-01', 'description': 'Trabajo',
+            'technicians': '[]', 'materials_used': json.dumps(materials),
+        }, format='multipart', secure=True, SERVER_NAME='localhost')
+        return response
+
+    def stock(self):
+        return [material.quantity for material in Material.objects.order_by('id')]
+
+    def used(self, report_id):
+        return dict(MaterialUsed.objects.filter(report_id=report_id).values_list('material_id', 'quantity'))
+
+    def test_update_applies_each_difference_once(self):
+        response = self.send('post', '/reports/reports/', [{'material': self.cable.id, 'quantity': 10}])
+        self.assertEqual(response.status_code, 201)
+        path = f"/reports/reports/{response.data['id']}/"
+        self.assertEqual(self.stock(), [90, 20])
+
+        for materials, stock in (
+            ([{'material': self.cable.id, 'quantity': 15}], [85, 20]),
+            ([{'material': self.cable.id, 'quantity': 5}, {'material': self.switch.id, 'quantity': 2}], [95, 18]),
+            ([{'material': self.switch.id, 'quantity': 2}], [100, 18]),
+            ([], [100, 20]),
+        ):
+            self.assertEqual(self.send('put', path, materials).status_code, 200)
+            self.assertEqual(self.stock(), stock)
+            self.assertEqual(self.used(response.data['id']),
+                             {material['material']: material['quantity'] for material in materials})
+
+    def test_update_rejects_missing_stock_without_changes(self):
+        report_id = self.send('post', '/reports/reports/', [{'material': self.switch.id, 'quantity': 5}]).data['id']
+
+        response = self.send('put', f'/reports/reports/{report_id}/', [{'material': self.switch.id, 'quantity': 30}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(), [100, 15])
+        self.assertEqual(self.used(report_id), {self.switch.id: 5})
+
+
+class WorkReportConditionalGetTests(ReportTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.material = Material.objects.create(name='Cable', quantity=100, price=1)
+        self.report = WorkReport.objects.create(
+            date=datetime.date(2026, 1, 1), incident=self.incident, description='Trabajo',
+        )
+        self.image = ReportImage.objects.create(
+            report=self.report, image_type='BEFORE', image='report_images/foto.jpg',
+        )
+        MaterialUsed.objects.create(report=self.report, material=self.material, quantity=5)
+
+    def retrieve(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(f'/reports/reports/{self.report.id}/', secure=True, SERVER_NAME='localhost',
+                               **headers)
+
+    def assertChangesEtag(self, change):
+        etag = self.retrieve()['ETag']
+        self.assertEqual(self.retrieve(etag).status_code, 304)
+        change()
+        response = self.retrieve(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
 
-# Create your tests here.
+    def test_nested_changes_invalidate_the_etag(self):
+        self.assertChangesEtag(self.image.delete)
+        self.assertChangesEtag(lambda: TechnicianAssignment.objects.create(report=self.report, technician=self.user))
+        self.assertChangesEtag(lambda: apply_delta(Material.objects.get(pk=self.material.pk), -1))
+        # El reporte no ha cambiado en ningún momento
+        self.assertEqual(WorkReport.objects.get(pk=self.report.pk).updated_at, self.report.updated_at)
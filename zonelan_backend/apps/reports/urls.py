@@ -1,14 +1,23 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WorkReportViewSet, MaterialUsedViewSet, upload_images, delete_image, report_counts
+from .views import (
+    WorkReportViewSet, MaterialUsedViewSet, upload_images, delete_image, report_counts,
+    workload_leaderboard, workload_utilization,
+)
 
 router = DefaultRouter()
 router.register(r'reports', WorkReportViewSet)
 router.register(r'materials-used', MaterialUsedViewSet)
 
+if settings.ASYNC_VIEWS:
+    from .async_views import report_counts
+
 urlpatterns = [
     path('', include(router.urls)),
     path('upload-images/', upload_images, name='upload-images'),
     path('delete-image/<int:image_id>/', delete_image, name='delete-image'),
     path('counts/', report_counts, name='report-counts'),
+    path('workload/leaderboard/', workload_leaderboard, name='workload-leaderboard'),
+    path('workload/utilization/', workload_utilization, name='workload-utilization'),
 ]
\ No newline at end of file
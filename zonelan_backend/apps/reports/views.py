@@ -1,3 +1,5 @@
+import logging
+
 from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
@@ -5,17 +7,42 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, parser_classes, action
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.db import transaction
-from .models import WorkReport, MaterialUsed, ReportImage
-from .serializers import WorkReportSerializer, MaterialUsedSerializer
+from .models import WorkReport, MaterialUsed, ReportImage, image_prefetch
+from .serializers import WorkReportSerializer, WorkReportListSerializer, MaterialUsedSerializer
+from .workload import METRICS, SOURCES, leaderboard, utilization
 from apps.materials.models import Material, MaterialControl
 from django.db.models import Count
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.db_router import ReplicaReadMixin, replica_safe
+from apps.core.idempotency import IdempotencyMixin
+from apps.core.sparse import SparseFieldsMixin
+from apps.core.versioning import VersionConflict, apply_delta
+
+logger = logging.getLogger(__name__)
 
-class WorkReportViewSet(viewsets.ModelViewSet):
+class WorkReportViewSet(IdempotencyMixin, SparseFieldsMixin, ConditionalGetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     # Asegurarse de que queryset incluya todos los reportes para poder accederlos después
     queryset = WorkReport.objects.all()
     serializer_class = WorkReportSerializer
+    compact_serializer_class = WorkReportListSerializer
+    sparse_select_related = {
+        'incident_title': ('incident',),
+        'customer_name': ('incident__customer',),
+    }
+    sparse_prefetch_related = {
+        'technicians': ('technicians__technician',),
+        'materials_used': ('materials_used__material',),
+        'before_images': (image_prefetch('BEFORE'),),
+        'after_images': (image_prefetch('AFTER'),),
+    }
+    # El detalle anida imágenes, técnicos y materiales (con su stock), que no
+    # cambian el updated_at del reporte
+    conditional_object_fields = (
+        'images__id', 'materials_used__id', 'technicians__id', 'materials_used__material__updated_at',
+    )
     permission_classes = [IsAuthenticated]
     
     def perform_create(self, serializer):
@@ -53,10 +80,10 @@ class WorkReportViewSet(viewsets.ModelViewSet):
             
             if show_deleted and (self.request.user.is_superuser or getattr(self.request.user, 'type', None) in ['SuperAdmin', 'Admin']):
                 # Si es admin/superadmin y solicita ver eliminados, mostrar todos
-                queryset = WorkReport.objects.all()
+                queryset = WorkReport.objects.with_deleted()
             else:
-                # Por defecto, filtrar los eliminados
-                queryset = WorkReport.objects.filter(is_deleted=False)
+                # Por defecto el manager excluye los eliminados
+                queryset = WorkReport.objects.all()
             
             # Mantener los filtros existentes
             incident = self.request.query_params.get('incident', None)
@@ -69,9 +96,7 @@ class WorkReportViewSet(viewsets.ModelViewSet):
                 
             return queryset.order_by('-date')
         except Exception as e:
-            import traceback
-            print(f"Error en get_queryset: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error en get_queryset: %s", e)
             # Devolver un queryset vacío en caso de error
             return WorkReport.objects.none()
     
@@ -85,16 +110,16 @@ class WorkReportViewSet(viewsets.ModelViewSet):
             
             # Si el usuario solicita ver reportes eliminados y tiene permisos, modificar el queryset
             if include_deleted and (self.request.user.is_superuser or self.request.user.type in ['SuperAdmin', 'Admin']):
-                queryset = WorkReport.objects.all()  # Incluye eliminados
+                queryset = WorkReport.objects.with_deleted()
             else:
-                queryset = WorkReport.objects.filter(is_deleted=False)  # Solo no eliminados
+                queryset = WorkReport.objects.all()
             
             # Continuar con la lógica estándar para obtener el objeto
             lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
             filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
             
             # Log adicional para depuración
-            print(f"Buscando reporte con {filter_kwargs}, include_deleted={include_deleted}")
+            logger.debug("Buscando reporte con %s, include_deleted=%s", filter_kwargs, include_deleted)
             
             obj = get_object_or_404(queryset, **filter_kwargs)
             
@@ -103,9 +128,8 @@ class WorkReportViewSet(viewsets.ModelViewSet):
             
             return obj
         except Exception as e:
-            import traceback
-            print(f"Error en get_object: {str(e)}")
-            print(traceback.format_exc())
+            # Normalmente un 404, que DRF convierte en respuesta
+            logger.debug("Error en get_object: %s", e, exc_info=True)
             raise  # Volver a lanzar la excepción para que Django maneje la respuesta 404
         
     # Añadir acción para listar reportes eliminados específicamente
@@ -123,7 +147,7 @@ class WorkReportViewSet(viewsets.ModelViewSet):
                 )
             
             # Obtener reportes eliminados
-            queryset = WorkReport.objects.filter(is_deleted=True).order_by('-date')
+            queryset = WorkReport.objects.only_deleted().order_by('-date')
             
             # Aplicar paginación
             page = self.paginate_queryset(queryset)
@@ -134,9 +158,7 @@ class WorkReportViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
         except Exception as e:
-            import traceback
-            print(f"Error en list_deleted: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error en list_deleted: %s", e)
             return Response(
                 {"error": f"Error interno del servidor: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -151,12 +173,9 @@ class WorkReportViewSet(viewsets.ModelViewSet):
             return_materials = request.query_params.get('return_materials', 'false').lower() == 'true'
             
             # Marcar como eliminado y registrar la fecha de eliminación
-            instance.is_deleted = True
-            instance.status = 'DELETED'
-            instance.deleted_at = timezone.now()
-            instance.save()
+            instance.soft_delete(status='DELETED')
             
-            print(f"Reporte {instance.id} marcado como eliminado con éxito")
+            logger.info("Reporte %s marcado como eliminado", instance.id)
             
             # Si se solicita devolver los materiales
             if return_materials:
@@ -166,8 +185,7 @@ class WorkReportViewSet(viewsets.ModelViewSet):
                 for material_used in materials_used:
                     # Devolver el material al inventario
                     material = material_used.material
-                    material.quantity += material_used.quantity
-                    material.save()
+                    apply_delta(material, material_used.quantity)
                     
                     # Registrar en el control como devolución
                     MaterialControl.objects.create(
@@ -180,10 +198,10 @@ class WorkReportViewSet(viewsets.ModelViewSet):
                     )
             
             return Response({"detail": "Reporte marcado como eliminado."}, status=status.HTTP_200_OK)
+        except VersionConflict:
+            raise
         except Exception as e:
-            import traceback
-            print(f"Error al eliminar reporte: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error al eliminar reporte: %s", e)
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class MaterialUsedViewSet(viewsets.ModelViewSet):
@@ -253,12 +271,13 @@ def delete_image(request, image_id):
         return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@replica_safe
 def report_counts(request):
     """Devuelve estadísticas de reportes para el dashboard"""
     try:
-        total = WorkReport.objects.filter(is_deleted=False).count()
-        draft = WorkReport.objects.filter(status='DRAFT', is_deleted=False).count()
-        completed = WorkReport.objects.filter(status='COMPLETED', is_deleted=False).count()
+        total = WorkReport.objects.count()
+        draft = WorkReport.objects.filter(status='DRAFT').count()
+        completed = WorkReport.objects.filter(status='COMPLETED').count()
         
         return Response({
             'total': total,
@@ -266,7 +285,64 @@ def report_counts(request):
             'completed': completed
         })
     except Exception as e:
-        import traceback
-        print(f"Error en report_counts: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error en report_counts: %s", e)
         return Response({"error": str(e)}, status=500)
+
+
+def _workload_filters(params, max_years):
+    """Intervalo (por defecto las últimas doce semanas) y filtros de la carga de técnicos."""
+    try:
+        end = parse_date(params['to']) if params.get('to') else timezone.localdate()
+        start = parse_date(params['from']) if params.get('from') else (end - timezone.timedelta(weeks=12) if end else None)
+    except ValueError:
+        start = end = None
+    if start is None or end is None or start > end:
+        raise ValueError("Intervalo de fechas no válido (AAAA-MM-DD)")
+    if (end - start).days > 366 * max_years:
+        raise ValueError(f"El intervalo máximo es de {max_years} años")
+    source = params.get('source') or None
+    if source is not None and source not in SOURCES:
+        raise ValueError(f"source no válido. Opciones: {', '.join(SOURCES)}")
+    try:
+        technician_ids = [int(value) for value in params.get('technicians', '').split(',') if value.strip()]
+    except ValueError:
+        raise ValueError("technicians debe ser una lista de ids separados por comas")
+    return start, end, {'source': source, 'technician_ids': technician_ids}
+
+
+@api_view(['GET'])
+@replica_safe
+def workload_leaderboard(request):
+    """
+    Clasificación de técnicos por ?metric=hours|reports|materials a partir de
+    la carga semanal: ?from, ?to, ?source=WORK|CONTRACT, ?technicians, ?limit.
+    """
+    metric = request.query_params.get('metric', 'hours')
+    if metric not in METRICS:
+        return Response({"detail": f"metric no válido. Opciones: {', '.join(METRICS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start, end, filters = _workload_filters(request.query_params, max_years=10)
+        limit = min(int(request.query_params.get('limit', 10)), 100)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = leaderboard(start, end, metric=metric, limit=limit, **filters)
+    return Response({'from': start, 'to': end, 'metric': metric, 'results': results})
+
+
+@api_view(['GET'])
+@replica_safe
+def workload_utilization(request):
+    """
+    Ocupación semanal de cada técnico (horas frente a TECHNICIAN_WEEKLY_HOURS):
+    ?from, ?to, ?source=WORK|CONTRACT, ?technicians. Cuenta las semanas enteras
+    que tocan el intervalo.
+    """
+    try:
+        # La serie tiene una entrada por técnico y semana
+        start, end, filters = _workload_filters(request.query_params, max_years=2)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'from': start, 'to': end, **utilization(start, end, **filters)})
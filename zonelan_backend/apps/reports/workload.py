@@ -0,0 +1,382 @@
+"""
+Carga semanal de los técnicos (TechnicianWeeklyWorkload).
+
+Cada fila es el total de un (técnico, semana, origen): horas, partes y
+unidades de material de los partes de trabajo (WORK) o de los reportes de
+contrato (CONTRACT) no eliminados. Las horas de un parte se cuentan enteras
+a cada técnico asignado; en los reportes de contrato cuentan los técnicos
+asignados y quien lo realizó (performed_by), sin repetirlo. Las semanas van
+de lunes a domingo y se identifican por su lunes.
+
+Las filas no se incrementan: se recalculan las semanas afectadas desde los
+partes, así que repetir un recálculo nunca duplica horas. Se mantiene por
+dos caminos:
+
+- al confirmar la transacción en la que se guarda o borra un parte, una
+  asignación de técnico o un material usado (señales conectadas en
+  ReportsConfig.ready), si TECHNICIAN_WORKLOAD_ON_COMMIT está activo. Las
+  semanas pendientes se acumulan por hilo, de modo que un parte creado con
+  sus técnicos y materiales recalcula su semana una sola vez;
+- con catch_up(), que recalcula las semanas de los partes modificados
+  después de la marca de agua (RollupCheckpoint) menos
+  TECHNICIAN_WORKLOAD_OVERLAP_SECONDS. Se programa con refresh_technician_workload.
+
+Los cambios hechos con update() sobre querysets no pasan por ninguno de los
+dos caminos; para ellos está rebuild().
+
+Hasta que se construye por primera vez (sin marca de agua en algún origen)
+la clasificación y la ocupación se calculan desde los partes.
+"""
+import threading
+from collections import defaultdict, namedtuple
+from datetime import date as Date, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+from apps.contracts.models import ContractReport, ContractReportMaterial, ContractReportTechnician
+from apps.core.models import RollupCheckpoint
+from apps.users.models import User
+
+from .models import MaterialUsed, TechnicianAssignment, TechnicianWeeklyWorkload, WorkReport
+
+
+Source = namedtuple('Source', 'reports technicians materials report_field owner_field')
+
+SOURCES = {
+    'WORK': Source(WorkReport, TechnicianAssignment, MaterialUsed, 'report', None),
+    'CONTRACT': Source(ContractReport, ContractReportTechnician, ContractReportMaterial,
+                       'contract_report', 'performed_by_id'),
+}
+METRICS = ('hours', 'reports', 'materials')
+CHECKPOINT_NAME = 'reports.TechnicianWeeklyWorkload.{}'
+BATCH_SIZE = 2000
+
+_pending = threading.local()
+
+
+def week_of(day):
+    """Lunes de la semana de `day`."""
+    return day - timedelta(days=day.weekday())
+
+
+def _alive(source):
+    return SOURCES[source].reports.objects.exclude(status='DELETED')
+
+
+def _aggregate(source, reports):
+    """{(técnico, semana): [horas, partes, materiales]} de los partes de `reports`."""
+    spec = SOURCES[source]
+    fields = ['id', 'date', 'hours_worked'] + ([spec.owner_field] if spec.owner_field else [])
+    info = {}
+    technicians = defaultdict(set)
+    for row in reports.values_list(*fields).order_by().iterator():
+        info[row[0]] = (week_of(row[1]), row[2] or Decimal('0'))
+        if spec.owner_field and row[3]:
+            technicians[row[0]].add(row[3])
+    if not info:
+        return {}
+
+    link = f'{spec.report_field}_id'
+    in_reports = {f'{spec.report_field}__in': reports.values('id')}
+    assignments = spec.technicians.objects.filter(**in_reports).values_list(link, 'technician_id')
+    for report_id, technician_id in assignments.iterator():
+        technicians[report_id].add(technician_id)
+    materials = dict(
+        spec.materials.objects.filter(**in_reports)
+        .values_list(link).annotate(units=Sum('quantity')).order_by()
+    )
+
+    totals = defaultdict(lambda: [Decimal('0'), 0, 0])
+    for report_id, technician_ids in technicians.items():
+        if report_id not in info:
+            continue
+        week, hours = info[report_id]
+        for technician_id in technician_ids:
+            total = totals[(technician_id, week)]
+            total[0] += hours
+            total[1] += 1
+            total[2] += materials.get(report_id, 0)
+    return totals
+
+
+def _save(source, totals):
+    TechnicianWeeklyWorkload.objects.bulk_create([
+        TechnicianWeeklyWorkload(technician_id=technician_id, week=week, source=source,
+                                 hours=hours, reports=reports, materials=materials)
+        for (technician_id, week), (hours, reports, materials) in totals.items()
+    ], batch_size=BATCH_SIZE)
+
+
+def refresh_weeks(source, days):
+    """Recalcula las semanas de los días `days` para el origen `source`. Devuelve cuántas semanas recalcula."""
+    weeks = {week_of(day) for day in days}
+    if not weeks:
+        return 0
+    reports = _alive(source).filter(reduce(or_, (
+        Q(date__gte=week, date__lt=week + timedelta(days=7)) for week in weeks
+    )))
+    with transaction.atomic():
+        TechnicianWeeklyWorkload.objects.filter(source=source, week__in=weeks).delete()
+        _save(source, _aggregate(source, reports))
+    return len(weeks)
+
+
+def schedule_refresh(source, days=(), report_ids=()):
+    """
+    Recalcula las semanas de `days` y de los partes `report_ids` cuando se
+    confirme la transacción en curso.
+    """
+    if not settings.TECHNICIAN_WORKLOAD_ON_COMMIT:
+        return
+    pending = getattr(_pending, 'sources', None)
+    if pending is None:
+        pending = _pending.sources = {}
+    weeks, reports = pending.setdefault(source, (set(), set()))
+    weeks.update(week_of(day) for day in days if isinstance(day, Date))
+    reports.update(report_id for report_id in report_ids if report_id is not None)
+    # Todas las llamadas registran el vaciado: la primera que se ejecute recalcula lo
+    # pendiente y las demás no encuentran nada. Lo de una transacción revertida se
+    # recalcula con la siguiente, lo que no cambia el resultado.
+    transaction.on_commit(flush_pending)
+
+
+def flush_pending():
+    pending = getattr(_pending, 'sources', None)
+    _pending.sources = {}
+    for source, (weeks, report_ids) in (pending or {}).items():
+        if report_ids:
+            # Con el manager base para incluir los partes recién eliminados
+            weeks |= set(SOURCES[source].reports._base_manager.filter(id__in=report_ids)
+                         .values_list('date', flat=True).order_by())
+        refresh_weeks(source, weeks)
+
+
+def _report_source(model):
+    return next(name for name, spec in SOURCES.items() if model in (spec.reports, spec.technicians, spec.materials))
+
+
+def remember_date(sender, instance, **kwargs):
+    # Sin leer el campo si es diferido: post_init se envía con cada instancia cargada
+    instance._workload_date = instance.__dict__.get('date')
+
+
+def refresh_on_report_change(sender, instance, **kwargs):
+    # También la semana anterior si ha cambiado la fecha del parte
+    schedule_refresh(_report_source(sender), days={instance.date, getattr(instance, '_workload_date', None)})
+    instance._workload_date = instance.date
+
+
+def refresh_on_detail_change(sender, instance, **kwargs):
+    source = _report_source(sender)
+    schedule_refresh(source, report_ids=[getattr(instance, f'{SOURCES[source].report_field}_id')])
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_init, post_save
+
+    for name, spec in SOURCES.items():
+        post_init.connect(remember_date, sender=spec.reports, dispatch_uid=f'workload_init_{name}')
+        post_save.connect(refresh_on_report_change, sender=spec.reports, dispatch_uid=f'workload_save_{name}')
+        post_delete.connect(refresh_on_report_change, sender=spec.reports, dispatch_uid=f'workload_delete_{name}')
+        for model in (spec.technicians, spec.materials):
+            label = model._meta.label_lower
+            post_save.connect(refresh_on_detail_change, sender=model, dispatch_uid=f'workload_save_{label}')
+            post_delete.connect(refresh_on_detail_change, sender=model, dispatch_uid=f'workload_delete_{label}')
+
+
+def catch_up():
+    """
+    Recalcula las semanas de los partes modificados después de la marca de
+    agua de cada origen y la avanza. Devuelve cuántas semanas se han
+    recalculado; sin marca de agua (primera ejecución) reconstruye todo y
+    devuelve las filas guardadas.
+    """
+    checkpoints = {
+        source: RollupCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME.format(source))[0]
+        for source in SOURCES
+    }
+    if any(checkpoint.position is None for checkpoint in checkpoints.values()):
+        return rebuild()
+
+    refreshed = 0
+    overlap = timedelta(seconds=settings.TECHNICIAN_WORKLOAD_OVERLAP_SECONDS)
+    for source, checkpoint in checkpoints.items():
+        # Incluye los partes eliminados, que también cambian la carga
+        recent = SOURCES[source].reports._base_manager.filter(updated_at__gt=checkpoint.position - overlap)
+        last = recent.aggregate(last=Max('updated_at'))['last']
+        refreshed += refresh_weeks(source, set(recent.values_list('date', flat=True).distinct().order_by()))
+        if last is not None and last > checkpoint.position:
+            RollupCheckpoint.objects.filter(pk=checkpoint.pk).update(position=last, updated_at=timezone.now())
+    return refreshed
+
+
+def rebuild(since=None):
+    """
+    Reconstruye la carga entera, o desde la semana del día `since`, a partir
+    de los partes. Devuelve cuántas filas guarda.
+    """
+    started = timezone.now()
+    rows = 0
+    with transaction.atomic():
+        for source in SOURCES:
+            workloads = TechnicianWeeklyWorkload.objects.filter(source=source)
+            reports = _alive(source)
+            if since is not None:
+                workloads = workloads.filter(week__gte=week_of(since))
+                reports = reports.filter(date__gte=week_of(since))
+            workloads.delete()
+            totals = _aggregate(source, reports)
+            _save(source, totals)
+            rows += len(totals)
+            RollupCheckpoint.objects.update_or_create(
+                name=CHECKPOINT_NAME.format(source), defaults={'position': started},
+            )
+    return rows
+
+
+def is_built():
+    """Si la carga se ha construido ya para todos los orígenes (rebuild o el primer catch_up)."""
+    return RollupCheckpoint.objects.filter(
+        name__in=[CHECKPOINT_NAME.format(source) for source in SOURCES], position__isnull=False,
+    ).count() == len(SOURCES)
+
+
+def _live_workloads(start, end, source=None, technician_ids=None):
+    """
+    {(técnico, semana): [horas, partes, materiales]} de las semanas que tocan
+    [start, end], calculado desde los partes. Solo se usa mientras la carga
+    no se ha construido, para no devolver clasificaciones vacías.
+    """
+    totals = defaultdict(lambda: [Decimal('0'), 0, 0])
+    for name in ([source] if source else SOURCES):
+        reports = _alive(name).filter(date__gte=week_of(start), date__lt=week_of(end) + timedelta(days=7))
+        for (technician_id, week), values in _aggregate(name, reports).items():
+            if technician_ids and technician_id not in technician_ids:
+                continue
+            for index, value in enumerate(values):
+                totals[(technician_id, week)][index] += value
+    return totals
+
+
+def _technician_names(technician_ids):
+    return {
+        technician_id: (username, name) for technician_id, username, name in
+        User.objects.filter(id__in=technician_ids).values_list('id', 'username', 'name')
+    }
+
+
+def _live_leaderboard(start, end, metric, limit, **filters):
+    by_technician = defaultdict(lambda: [Decimal('0'), 0, 0])
+    for (technician_id, _), values in _live_workloads(start, end, **filters).items():
+        for index, value in enumerate(values):
+            by_technician[technician_id][index] += value
+    position = METRICS.index(metric)
+    top = sorted(by_technician.items(), key=lambda item: (-item[1][position], item[0]))[:limit]
+    names = _technician_names([technician_id for technician_id, _ in top])
+    return [
+        {
+            'technician_id': technician_id, 'username': names[technician_id][0], 'name': names[technician_id][1],
+            'hours': hours, 'reports': reports, 'materials': materials,
+        }
+        for technician_id, (hours, reports, materials) in top
+    ]
+
+
+def _live_hours_by_week(start, end, **filters):
+    """Las filas de horas por técnico y semana de utilization(), calculadas desde los partes."""
+    totals = _live_workloads(start, end, **filters)
+    names = _technician_names({technician_id for technician_id, _ in totals})
+    return [
+        {'technician_id': technician_id, 'week': week, 'username': names[technician_id][0],
+         'full_name': names[technician_id][1], 'total_hours': hours}
+        for (technician_id, week), (hours, _, _) in sorted(totals.items())
+    ]
+
+
+def _workloads(start, end, source=None, technician_ids=None):
+    """Filas de las semanas que tocan el intervalo [start, end]."""
+    workloads = TechnicianWeeklyWorkload.objects.filter(week__gte=week_of(start), week__lte=end)
+    if source:
+        workloads = workloads.filter(source=source)
+    if technician_ids:
+        workloads = workloads.filter(technician_id__in=technician_ids)
+    return workloads
+
+
+def leaderboard(start, end, metric='hours', limit=10, **filters):
+    """Técnicos con más horas, partes o materiales en el intervalo."""
+    if metric not in METRICS:
+        raise ValueError(f"Métrica no válida: {metric}")
+    if not is_built():
+        return _live_leaderboard(start, end, metric, limit, **filters)
+    rows = (
+        _workloads(start, end, **filters)
+        .values('technician_id', username=F('technician__username'), full_name=F('technician__name'))
+        # Los alias no pueden llamarse como los campos que suman
+        .annotate(total_hours=Sum('hours'), total_reports=Sum('reports'), total_materials=Sum('materials'))
+        .order_by(f'-total_{metric}', 'technician_id')[:limit]
+    )
+    return [
+        {
+            'technician_id': row['technician_id'], 'username': row['username'], 'name': row['full_name'],
+            'hours': row['total_hours'], 'reports': row['total_reports'], 'materials': row['total_materials'],
+        }
+        for row in rows
+    ]
+
+
+def utilization(start, end, **filters):
+    """
+    Horas de cada técnico por semana frente a TECHNICIAN_WEEKLY_HOURS, con
+    las semanas sin partes a cero. La ocupación se da en porcentaje, por
+    semana y media del intervalo; los técnicos van de más a menos ocupados.
+    """
+    capacity = Decimal(str(settings.TECHNICIAN_WEEKLY_HOURS))
+    weeks = []
+    week = week_of(start)
+    while week <= end:
+        weeks.append(week)
+        week += timedelta(days=7)
+
+    if is_built():
+        rows = (
+            _workloads(start, end, **filters)
+            .values('technician_id', 'week', username=F('technician__username'), full_name=F('technician__name'))
+            .annotate(total_hours=Sum('hours'))
+            .order_by('technician_id', 'week')
+        )
+    else:
+        rows = _live_hours_by_week(start, end, **filters)
+    technicians = {}
+    for row in rows:
+        technician = technicians.setdefault(row['technician_id'], {
+            'technician_id': row['technician_id'], 'username': row['username'], 'name': row['full_name'],
+            'hours_by_week': {},
+        })
+        technician['hours_by_week'][row['week']] = row['total_hours']
+
+    def percent(hours, weeks_count=1):
+        return round(float(hours / (capacity * weeks_count)) * 100, 1) if capacity else None
+
+    results = []
+    for technician in technicians.values():
+        by_week = technician.pop('hours_by_week')
+        total = sum(by_week.values(), Decimal('0'))
+        technician.update({
+            'hours': total,
+            'utilization': percent(total, len(weeks)),
+            'weeks': [
+                {'week': week, 'hours': by_week.get(week, Decimal('0')),
+                 'utilization': percent(by_week.get(week, Decimal('0')))}
+                for week in weeks
+            ],
+        })
+        results.append(technician)
+    results.sort(key=lambda item: (-item['hours'], item['technician_id']))
+    return {'capacity': capacity, 'weeks': len(weeks), 'results': results}
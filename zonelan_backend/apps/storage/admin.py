@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Warehouse, Department, Shelf, Tray,
-    MaterialLocation, MaterialMovement
+    MaterialLocation, MaterialMovement, StockValuationSnapshot
 )
 
 
@@ -46,3 +46,10 @@ class MaterialMovementAdmin(admin.ModelAdmin):
     list_filter = ('operation', 'user', 'timestamp')
     search_fields = ('material__name', 'notes')
     date_hierarchy = 'timestamp'
+
+
+@admin.register(StockValuationSnapshot)
+class StockValuationSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'warehouse_name', 'department_name', 'shelf_name', 'unallocated', 'quantity', 'value')
+    list_filter = ('date', 'unallocated', 'warehouse')
+    date_hierarchy = 'date'
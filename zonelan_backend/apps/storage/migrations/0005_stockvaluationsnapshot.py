@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0004_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockValuationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('unallocated', models.BooleanField(default=False, verbose_name='Stock sin ubicar')),
+                ('warehouse_name', models.CharField(blank=True, max_length=100, verbose_name='Nombre del almacén')),
+                ('department_name', models.CharField(blank=True, max_length=100, verbose_name='Nombre de la dependencia')),
+                ('shelf_name', models.CharField(blank=True, max_length=100, verbose_name='Nombre de la estantería')),
+                ('quantity', models.BigIntegerField(verbose_name='Unidades')),
+                ('value', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Valor')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='valuation_snapshots', to='storage.department', verbose_name='Dependencia')),
+                ('shelf', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='valuation_snapshots', to='storage.shelf', verbose_name='Estantería')),
+                ('warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='valuation_snapshots', to='storage.warehouse', verbose_name='Almacén')),
+            ],
+            options={
+                'verbose_name': 'Valoración de stock',
+                'verbose_name_plural': 'Valoraciones de stock',
+                'ordering': ['-date', 'warehouse_name', 'department_name', 'shelf_name'],
+                'indexes': [models.Index(fields=['date', 'warehouse'], name='valuation_date_wh_idx')],
+            },
+        ),
+    ]
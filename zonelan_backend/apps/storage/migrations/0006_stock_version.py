@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0005_stockvaluationsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materiallocation',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versión'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from apps.materials.models import Material
+from apps.core.versioning import VersionedModel
 from django.db.models import Max
 
 
@@ -14,7 +15,7 @@ class Warehouse(models.Model):
     description = models.TextField(verbose_name='Descripción', blank=True, null=True)
     is_active = models.BooleanField(default=True, verbose_name='Activo')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
-    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización')
 
     class Meta:
         verbose_name = 'Almacén'
@@ -56,7 +57,7 @@ class Department(models.Model):
     description = models.TextField(verbose_name='Descripción', blank=True, null=True)
     is_active = models.BooleanField(default=True, verbose_name='Activo')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
-    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización')
 
     class Meta:
         verbose_name = 'Dependencia'
@@ -104,7 +105,7 @@ class Shelf(models.Model):
     description = models.TextField(verbose_name='Descripción', blank=True, null=True)
     is_active = models.BooleanField(default=True, verbose_name='Activo')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
-    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización')
 
     class Meta:
         verbose_name = 'Estantería'
@@ -152,7 +153,7 @@ class Tray(models.Model):
     description = models.TextField(verbose_name='Descripción', blank=True, null=True)
     is_active = models.BooleanField(default=True, verbose_name='Activo')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
-    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización')
 
     class Meta:
         verbose_name = 'Balda'
@@ -197,14 +198,14 @@ class Tray(models.Model):
         super().save(*args, **kwargs)
 
 
-class MaterialLocation(models.Model):
+class MaterialLocation(VersionedModel):
     material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name='locations')
     tray = models.ForeignKey(Tray, on_delete=models.CASCADE, related_name='material_locations')
     quantity = models.PositiveIntegerField(default=0)
     minimum_quantity = models.PositiveIntegerField(default=0)
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Ubicación de Material'
@@ -288,3 +289,41 @@ class MaterialMovement(models.Model):
             return f"{operation_text} de {self.material.name}: {self.quantity} unidades en {self.target_location}"
         else:  # REMOVE
             return f"{operation_text} de {self.material.name}: {self.quantity} unidades desde {self.source_location}"
+
+
+class StockValuationSnapshot(models.Model):
+    """
+    Valoración diaria del stock (cantidad × precio) por estantería. Los
+    totales por dependencia y almacén se obtienen sumando estas filas. El
+    stock sin ubicar (Material.quantity menos lo ubicado) se guarda en una
+    fila propia con `unallocated` activado y sin ubicación.
+
+    Se guardan también los nombres para que el histórico siga siendo legible
+    aunque se renombre o se borre la ubicación.
+    """
+    date = models.DateField(verbose_name='Fecha')
+    unallocated = models.BooleanField(default=False, verbose_name='Stock sin ubicar')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='valuation_snapshots', verbose_name='Almacén')
+    department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='valuation_snapshots', verbose_name='Dependencia')
+    shelf = models.ForeignKey(Shelf, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='valuation_snapshots', verbose_name='Estantería')
+    warehouse_name = models.CharField(max_length=100, blank=True, verbose_name='Nombre del almacén')
+    department_name = models.CharField(max_length=100, blank=True, verbose_name='Nombre de la dependencia')
+    shelf_name = models.CharField(max_length=100, blank=True, verbose_name='Nombre de la estantería')
+    quantity = models.BigIntegerField(verbose_name='Unidades')
+    value = models.DecimalField(max_digits=16, decimal_places=2, verbose_name='Valor')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+
+    class Meta:
+        verbose_name = 'Valoración de stock'
+        verbose_name_plural = 'Valoraciones de stock'
+        ordering = ['-date', 'warehouse_name', 'department_name', 'shelf_name']
+        indexes = [
+            models.Index(fields=['date', 'warehouse'], name='valuation_date_wh_idx'),
+        ]
+
+    def __str__(self):
+        place = 'Sin ubicar' if self.unallocated else f"{self.warehouse_name} > {self.department_name} > {self.shelf_name}"
+        return f"{self.date:%d/%m/%Y} {place}: {self.value}"
@@ -1,4 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
+from apps.materials.models import Material
 from .models import (
     Warehouse, Department, Shelf, Tray, 
     MaterialLocation, MaterialMovement
@@ -94,6 +96,18 @@ class MaterialLocationSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class MaterialLocationListSerializer(serializers.ModelSerializer):
+    """Versión ligera para listados (?compact=1): sin notas ni nombres intermedios."""
+    material_name = serializers.ReadOnlyField(source='material.name')
+    warehouse_name = serializers.ReadOnlyField(source='tray.shelf.department.warehouse.name')
+    tray_full_code = serializers.ReadOnlyField(source='tray.get_full_code')
+
+    class Meta:
+        model = MaterialLocation
+        fields = ['id', 'material', 'material_name', 'tray', 'tray_full_code', 'warehouse_name',
+                  'quantity', 'minimum_quantity', 'updated_at']
+
+
 class MaterialMovementSerializer(serializers.ModelSerializer):
     material_name = serializers.ReadOnlyField(source='material.name')
     operation_display = serializers.SerializerMethodField()
@@ -181,6 +195,87 @@ class MaterialMovementSerializer(serializers.ModelSerializer):
             return "Ubicación no disponible"
 
 
+class MaterialMovementListSerializer(MaterialMovementSerializer):
+    """Versión ligera para listados (?compact=1): sin notas ni enlace al control de material."""
+    class Meta:
+        model = MaterialMovement
+        fields = ['id', 'material', 'material_name', 'source_location', 'source_location_display',
+                  'source_location_warehouse', 'target_location', 'target_location_display',
+                  'target_location_warehouse', 'quantity', 'operation', 'operation_display',
+                  'timestamp', 'user', 'user_name', 'username']
+
+
+class MovementLineSerializer(serializers.Serializer):
+    """Línea de un lote de movimientos. Los ids se resuelven en MovementBatchSerializer."""
+    material = serializers.IntegerField()
+    operation = serializers.ChoiceField(choices=MaterialMovement.OPERATION_CHOICES)
+    quantity = serializers.IntegerField(min_value=1)
+    source_location = serializers.IntegerField(required=False, allow_null=True)
+    target_location = serializers.IntegerField(required=False, allow_null=True)
+    # Destino por balda: se usa (o se crea) la ubicación del material en esa balda
+    target_tray = serializers.IntegerField(required=False, allow_null=True)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True, default='')
+
+
+class MovementBatchSerializer(serializers.Serializer):
+    lines = MovementLineSerializer(many=True, allow_empty=False,
+                                   max_length=settings.STOCK_MOVEMENT_BATCH_MAX_LINES)
+
+    def validate_lines(self, lines):
+        """Comprueba todas las líneas con tres consultas y sustituye los ids por objetos."""
+        materials = Material.objects.in_bulk({line['material'] for line in lines})
+        locations = MaterialLocation.objects.in_bulk({
+            line[key] for line in lines for key in ('source_location', 'target_location') if line.get(key)
+        })
+        trays = Tray.objects.in_bulk({line['target_tray'] for line in lines if line.get('target_tray')})
+
+        errors = {}
+        for index, line in enumerate(lines):
+            problems = []
+            operation = line['operation']
+            material = materials.get(line['material'])
+            if material is None:
+                problems.append(f"El material {line['material']} no existe")
+
+            source = target = tray = None
+            if line.get('source_location'):
+                source = locations.get(line['source_location'])
+                if source is None:
+                    problems.append(f"La ubicación {line['source_location']} no existe")
+            if line.get('target_location'):
+                target = locations.get(line['target_location'])
+                if target is None:
+                    problems.append(f"La ubicación {line['target_location']} no existe")
+            if line.get('target_tray'):
+                tray = trays.get(line['target_tray'])
+                if tray is None:
+                    problems.append(f"La balda {line['target_tray']} no existe")
+
+            if operation in ('REMOVE', 'TRANSFER') and not line.get('source_location'):
+                problems.append("Se requiere una ubicación de origen para esta operación")
+            if operation in ('ADD', 'TRANSFER') and not (line.get('target_location') or line.get('target_tray')):
+                problems.append("Se requiere una ubicación de destino para esta operación")
+            if line.get('target_location') and line.get('target_tray'):
+                problems.append("Indica la ubicación de destino o la balda, no ambas")
+            if material is not None:
+                for location in (source, target):
+                    if location is not None and location.material_id != material.id:
+                        problems.append(f"La ubicación {location.id} no contiene el material {material.id}")
+            if operation == 'TRANSFER' and source is not None and (
+                source == target or (tray is not None and source.tray_id == tray.id)
+            ):
+                problems.append("El origen y el destino del traslado son la misma ubicación")
+
+            if problems:
+                errors[index] = problems
+                continue
+            line.update(material=material, source_location=source, target_location=target, target_tray=tray)
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return lines
+
+
 class NestedDepartmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Department
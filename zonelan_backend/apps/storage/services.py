@@ -0,0 +1,202 @@
+"""
+Movimientos de stock entre ubicaciones en lote.
+
+apply_movements() aplica una lista de líneas ADD / REMOVE / TRANSFER en una
+sola transacción:
+1. lee las MaterialLocation afectadas con su versión, sin bloquearlas;
+2. comprueba el stock de todas las líneas con esas cantidades y, si alguna
+   falla, no aplica ninguna;
+3. crea las ubicaciones nuevas (destino por balda), escribe las cantidades
+   con un único UPDATE condicionado a las versiones leídas (swap_many, ver
+   apps.core.versioning) y crea movimientos y controles con bulk_create.
+
+Si otra escritura ha cambiado alguna ubicación entre 1 y 3, se deshace el
+intento y se repite con las ubicaciones bloqueadas (SELECT ... FOR UPDATE en
+orden de id, para que dos lotes concurrentes no se bloqueen mutuamente),
+hasta STOCK_CAS_MAX_RETRIES veces; después se responde 409.
+
+Cada línea genera un MaterialMovement y su MaterialControl (motivo TRASLADO)
+igual que el alta individual de movimientos.
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from apps.core.versioning import VersionConflict, swap_many
+from apps.materials.models import MaterialControl
+from apps.materials.rollups import schedule_refresh
+
+from .models import MaterialLocation, MaterialMovement
+
+
+MISSING_LOCATION_MESSAGES = (
+    ('source_location', "La ubicación de origen ya no existe."),
+    ('target_location', "La ubicación de destino ya no existe."),
+)
+
+
+class MovementError(Exception):
+    """Errores de validación por línea: {índice de línea: [mensajes]}."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(errors)
+
+
+class _StaleLocations(Exception):
+    """Alguna ubicación ha cambiado de versión desde que se leyó."""
+
+    def __init__(self, location):
+        self.location = location
+        super().__init__(location)
+
+
+def _bulk_create(model, objects):
+    # MariaDB >= 10.5 y SQLite devuelven los ids en el INSERT múltiple
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objects)
+    for obj in objects:
+        obj.save(force_insert=True)
+    return objects
+
+
+def _load_locations(lines, lock):
+    """Lee (y con `lock` bloquea) las ubicaciones de origen, destino y (material, balda) de destino, en orden de id."""
+    location_ids = set()
+    tray_targets = set()
+    for line in lines:
+        for key in ('source_location', 'target_location'):
+            if line.get(key):
+                location_ids.add(line[key].id)
+        if line.get('target_tray'):
+            tray_targets.add((line['material'].id, line['target_tray'].id))
+
+    locations = MaterialLocation.objects.none()
+    if location_ids:
+        locations = MaterialLocation.objects.filter(id__in=location_ids)
+    if tray_targets:
+        by_tray = MaterialLocation.objects.filter(
+            material_id__in={material for material, _ in tray_targets},
+            tray_id__in={tray for _, tray in tray_targets},
+        )
+        locations = locations | by_tray
+    if lock:
+        locations = locations.select_for_update()
+    locked = OrderedDict((location.id, location) for location in locations.order_by('id'))
+    by_material_tray = {(location.material_id, location.tray_id): location for location in locked.values()}
+    return locked, by_material_tray
+
+
+def apply_movements(lines, user):
+    """
+    Aplica las líneas (dicts validados con material, operation, quantity,
+    source_location, target_location, target_tray y notes). Devuelve
+    (movimientos creados, ubicaciones modificadas). Lanza MovementError sin
+    aplicar nada si alguna línea no tiene stock suficiente o su ubicación ya
+    no existe, y VersionConflict si se agotan los reintentos.
+    """
+    for attempt in range(settings.STOCK_CAS_MAX_RETRIES + 1):
+        try:
+            return _apply_movements(lines, user, lock=attempt > 0)
+        except _StaleLocations as e:
+            stale = e.location
+    raise VersionConflict(stale)
+
+
+def _apply_movements(lines, user, lock):
+    with transaction.atomic():
+        locked, by_material_tray = _load_locations(lines, lock)
+        balances = {location_id: location.quantity for location_id, location in locked.items()}
+        new_locations = OrderedDict()
+        targets = []
+        errors = {}
+
+        for index, line in enumerate(lines):
+            operation = line['operation']
+            quantity = line['quantity']
+            # Borradas entre la validación de la línea y la lectura
+            missing = [
+                message for key, message in MISSING_LOCATION_MESSAGES
+                if line.get(key) and line[key].id not in locked
+            ]
+            if missing:
+                errors.setdefault(index, []).extend(missing)
+                targets.append((None, None))
+                continue
+            source = locked.get(line['source_location'].id) if line.get('source_location') else None
+            if operation in ('REMOVE', 'TRANSFER'):
+                if balances[source.id] < quantity:
+                    errors.setdefault(index, []).append(
+                        f"Stock insuficiente en la ubicación de origen. Disponible: {balances[source.id]}"
+                    )
+                balances[source.id] -= quantity
+
+            target = None
+            if operation in ('ADD', 'TRANSFER'):
+                if line.get('target_location'):
+                    target = locked[line['target_location'].id]
+                else:
+                    key = (line['material'].id, line['target_tray'].id)
+                    target = by_material_tray.get(key)
+                    if target is None:
+                        # Material nuevo en esa balda: se crea la ubicación
+                        target = new_locations.setdefault(key, MaterialLocation(
+                            material=line['material'], tray=line['target_tray'],
+                            quantity=0, minimum_quantity=0,
+                        ))
+                if target.id is not None:
+                    balances[target.id] += quantity
+                else:
+                    target.quantity += quantity
+            targets.append((source, target))
+
+        if errors:
+            raise MovementError(errors)
+
+        created_locations = _bulk_create(MaterialLocation, list(new_locations.values()))
+
+        changed = []
+        for location_id, location in locked.items():
+            if balances[location_id] != location.quantity:
+                location.quantity = balances[location_id]
+                changed.append(location)
+        if not swap_many(changed):
+            # Sale del bloque atómico: se deshace también lo ya escrito en este intento
+            raise _StaleLocations(changed[0])
+
+        controls = []
+        for line, (source, target) in zip(lines, targets):
+            reference = source or target
+            controls.append(MaterialControl(
+                user=user,
+                material=line['material'],
+                quantity=line['quantity'],
+                operation=line['operation'],
+                reason='TRASLADO',
+                notes=line.get('notes') or f"Traslado de material: {line['operation']}",
+                location_reference=str(reference.id),
+            ))
+        controls = _bulk_create(MaterialControl, controls)
+
+        movements = _bulk_create(MaterialMovement, [
+            MaterialMovement(
+                material=line['material'],
+                source_location=source,
+                target_location=target,
+                quantity=line['quantity'],
+                operation=line['operation'],
+                user=user,
+                notes=line.get('notes', ''),
+                material_control=control,
+            )
+            for line, (source, target), control in zip(lines, targets, controls)
+        ])
+
+        for control, movement in zip(controls, movements):
+            control.movement_id = movement.id
+        MaterialControl.objects.bulk_update(controls, ['movement_id'])
+        # bulk_create no envía post_save
+        schedule_refresh(controls)
+
+    return movements, changed + created_locations
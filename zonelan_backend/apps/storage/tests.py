@@ -1,3 +1,143 @@
+from unittest import mock
+
+from django.db.models import F
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.core.versioning import VersionConflict
+from apps.materials.models import Material, MaterialControl
+from apps.users.models import User
+
+from . import services
+from .models import Department, MaterialLocation, MaterialMovement, Shelf, Tray, Warehouse
+from .services import MovementError, apply_movements
+
+
+class ApplyMovementsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='almacen', email='almacen@example.com', password='secreto',
+            name='Almacén', phone='600000000', type='Admin',
+        )
+        warehouse = Warehouse.objects.create(name='Central')
+        department = Department.objects.create(warehouse=warehouse, name='Planta baja')
+        shelf = Shelf.objects.create(department=department, name='E1')
+        self.tray_a = Tray.objects.create(shelf=shelf, name='B1')
+        self.tray_b = Tray.objects.create(shelf=shelf, name='B2')
+        self.material = Material.objects.create(name='Cable', quantity=10, price=1)
+        self.source = MaterialLocation.objects.create(material=self.material, tray=self.tray_a, quantity=10)
+        self.target = MaterialLocation.objects.create(material=self.material, tray=self.tray_b, quantity=0)
+
+    def line(self, operation, quantity, **locations):
+        return {'material': self.material, 'operation': operation, 'quantity': quantity, 'notes': '', **locations}
+
+    def quantities(self):
+        return list(MaterialLocation.objects.order_by('id').values_list('quantity', flat=True))
+
+    def test_batch_is_all_or_nothing(self):
+        with self.assertRaises(MovementError) as error:
+            apply_movements([
+                self.line('TRANSFER', 4, source_location=self.source, target_location=self.target),
+                self.line('REMOVE', 7, source_location=self.source),
+            ], self.user)
+
+        self.assertEqual(list(error.exception.errors), [1])
+        self.assertEqual(self.quantities(), [10, 0])
+        self.assertFalse(MaterialMovement.objects.exists())
+        self.assertFalse(MaterialControl.objects.exists())
+
+    def test_batch_rejected_by_api_writes_nothing(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/storage/movements/batch/', {'lines': [
+            {'material': self.material.id, 'operation': 'TRANSFER', 'quantity': 4,
+             'source_location': self.source.id, 'target_location': self.target.id},
+            {'material': self.material.id, 'operation': 'REMOVE', 'quantity': 7,
+             'source_location': self.source.id},
+        ]}, format='json', secure=True, SERVER_NAME='localhost')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('1', {str(index) for index in response.data['lines']})
+        self.assertEqual(self.quantities(), [10, 0])
+
+    def test_stale_version_is_retried_under_lock(self):
+        # Otra escritura ya ha sacado 3 unidades del origen...
+        MaterialLocation.objects.filter(pk=self.source.pk).update(
+            quantity=F('quantity') - 3, version=F('version') + 1,
+        )
+        load_locations = services._load_locations
+        calls = []
+
+        def concurrent_write(lines, lock):
+            calls.append(lock)
+            locked, by_material_tray = load_locations(lines, lock)
+            if len(calls) == 1:
+                # ...pero la primera lectura aún ve la fila anterior
+                locked[self.source.pk].quantity = 10
+                locked[self.source.pk].version = 0
+            return locked, by_material_tray
+
+        with mock.patch.object(services, '_load_locations', side_effect=concurrent_write):
+            movements, _ = apply_movements([
+                self.line('TRANSFER', 5, source_location=self.source, target_location=self.target),
+            ], self.user)
+
+        self.assertEqual(calls, [False, True])
+        self.assertEqual(len(movements), 1)
+        self.assertEqual(self.quantities(), [2, 5])
+        self.assertEqual(MaterialMovement.objects.count(), 1)
+
+    def test_conflict_after_retries(self):
+        load_locations = services._load_locations
+
+        def always_stale(lines, lock):
+            loaded = load_locations(lines, lock)
+            MaterialLocation.objects.filter(pk=self.source.pk).update(version=F('version') + 1)
+            return loaded
+
+        with mock.patch.object(services, '_load_locations', side_effect=always_stale):
+            with self.assertRaises(VersionConflict):
+                apply_movements([self.line('REMOVE', 1, source_location=self.source)], self.user)
+
+        self.assertEqual(self.quantities(), [10, 0])
+        self.assertFalse(MaterialMovement.objects.exists())
+
+    def test_tray_target_reuses_existing_location(self):
+        apply_movements([
+            self.line('TRANSFER', 2, source_location=self.source, target_tray=self.tray_b),
+            self.line('ADD', 3, target_tray=self.tray_b),
+        ], self.user)
+
+        self.assertEqual(MaterialLocation.objects.count(), 2)
+        self.assertEqual(self.quantities(), [8, 5])
+        self.assertEqual(
+            set(MaterialMovement.objects.values_list('target_location', flat=True)), {self.target.id}
+        )
+
+    def test_tray_target_creates_location_once(self):
+        other_tray = Tray.objects.create(shelf=self.tray_a.shelf, name='B3')
+        _, locations = apply_movements([
+            self.line('TRANSFER', 2, source_location=self.source, target_tray=other_tray),
+            self.line('TRANSFER', 1, source_location=self.source, target_tray=other_tray),
+        ], self.user)
+
+        created = MaterialLocation.objects.get(tray=other_tray)
+        self.assertEqual(created.quantity, 3)
+        self.assertIn(created, locations)
+
+    def test_deleted_locations_are_line_errors(self):
+        source, target = self.source, self.target
+        MaterialLocation.objects.filter(pk__in=[source.pk, target.pk]).delete()
+
+        with self.assertRaises(MovementError) as error:
+            apply_movements([
+                self.line('REMOVE', 1, source_location=source),
+                self.line('ADD', 1, target_location=target),
+            ], self.user)
 
-# Create your tests here.
+        self.assertEqual(error.exception.errors, {
+            0: ["La ubicación de origen ya no existe."],
+            1: ["La ubicación de destino ya no existe."],
+        })
+        self.assertFalse(MaterialMovement.objects.exists())
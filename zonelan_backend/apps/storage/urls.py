@@ -8,7 +8,9 @@ from .views import (
     MaterialLocationViewSet, 
     MaterialMovementViewSet,
     material_locations,  # Ya importada
-    material_inventory_check  # Añade esta importación
+    material_inventory_check,  # Añade esta importación
+    stock_valuation,
+    stock_valuation_trend,
 )
 
 router = DefaultRouter()
@@ -23,5 +25,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('materials/<int:material_id>/locations/', material_locations, name='material-locations'),
     path('materials/<int:material_id>/inventory_check/', material_inventory_check, name='material-inventory-check'),
+    path('valuation/', stock_valuation, name='stock-valuation'),
+    path('valuation/trend/', stock_valuation_trend, name='stock-valuation-trend'),
     # Otras rutas existentes...
 ]
\ No newline at end of file
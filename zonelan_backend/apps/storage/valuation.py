@@ -0,0 +1,196 @@
+"""
+Valoración del stock (cantidad × precio) por almacén, dependencia o estantería.
+
+- current_valuation(): valoración actual con una consulta agrupada sobre
+  MaterialLocation (la cadena balda > estantería > dependencia > almacén se
+  resuelve con JOINs) y otra para el stock sin ubicar.
+- take_valuation_snapshot(): guarda la valoración del día por estantería en
+  StockValuationSnapshot (se programa a diario con snapshot_stock_valuation).
+- valuation_at() / valuation_trend(): valoración de una fecha pasada y serie
+  temporal, leídas de las instantáneas.
+
+El stock sin ubicar es Material.quantity menos lo ubicado, solo cuando es
+positivo (los materiales con más stock ubicado que total se ven en el cuadre
+de inventario, apps.materials.inventory).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.materials.models import Material
+
+from .models import MaterialLocation, StockValuationSnapshot
+
+
+LEVELS = ('warehouse', 'department', 'shelf')
+
+VALUE_FIELD = DecimalField(max_digits=16, decimal_places=2)
+
+# Campos de MaterialLocation y de StockValuationSnapshot que identifican cada nivel
+LOCATION_GROUPS = {
+    'warehouse': {
+        'warehouse_id': 'tray__shelf__department__warehouse_id',
+        'warehouse_name': 'tray__shelf__department__warehouse__name',
+    },
+    'department': {
+        'department_id': 'tray__shelf__department_id',
+        'department_name': 'tray__shelf__department__name',
+    },
+    'shelf': {
+        'shelf_id': 'tray__shelf_id',
+        'shelf_name': 'tray__shelf__name',
+    },
+}
+
+
+def _group_fields(level):
+    """Campos de agrupación de `level` y de los niveles superiores."""
+    if level not in LEVELS:
+        raise ValueError(f"Nivel de valoración no válido: {level}")
+    fields = {}
+    for name in LEVELS[:LEVELS.index(level) + 1]:
+        fields.update(LOCATION_GROUPS[name])
+    return fields
+
+
+def _money(value):
+    return (value or Decimal('0')).quantize(Decimal('0.01'))
+
+
+def located_valuation(level='warehouse'):
+    """Unidades y valor del stock ubicado agrupados por `level`, en una consulta."""
+    fields = _group_fields(level)
+    rows = (
+        MaterialLocation.objects
+        .filter(quantity__gt=0)
+        .values(**{alias: F(path) for alias, path in fields.items()})
+        # Los alias no pueden llamarse `quantity`: taparían la columna en el producto
+        .annotate(
+            units=Sum('quantity'),
+            amount=Sum(F('quantity') * F('material__price'), output_field=VALUE_FIELD),
+        )
+        .order_by(*fields)
+    )
+    return [
+        {**{alias: row[alias] for alias in fields}, 'quantity': row['units'], 'value': _money(row['amount'])}
+        for row in rows
+    ]
+
+
+def unallocated_valuation():
+    """Unidades y valor del stock que no está en ninguna balda."""
+    located = (
+        MaterialLocation.objects.filter(material=OuterRef('pk'))
+        .values('material').annotate(total=Sum('quantity')).values('total')
+    )
+    pending = F('quantity') - F('located')
+    totals = (
+        Material.objects
+        .annotate(located=Coalesce(Subquery(located), 0))
+        .filter(quantity__gt=F('located'))
+        .aggregate(
+            units=Sum(pending),
+            amount=Sum(pending * F('price'), output_field=VALUE_FIELD),
+        )
+    )
+    return {'quantity': totals['units'] or 0, 'value': _money(totals['amount'])}
+
+
+def _with_totals(level, date, results, unallocated):
+    return {
+        'level': level,
+        'date': date,
+        'results': results,
+        'unallocated': unallocated,
+        'total': {
+            'quantity': sum(row['quantity'] for row in results) + unallocated['quantity'],
+            'value': sum((row['value'] for row in results), Decimal('0.00')) + unallocated['value'],
+        },
+    }
+
+
+def current_valuation(level='warehouse'):
+    return _with_totals(level, timezone.localdate(), located_valuation(level), unallocated_valuation())
+
+
+def take_valuation_snapshot(date=None):
+    """
+    Guarda la valoración actual por estantería con la fecha `date` (hoy por
+    defecto). Si ya había instantánea de ese día se sustituye. Devuelve el
+    número de filas guardadas.
+    """
+    date = date or timezone.localdate()
+    rows = [
+        StockValuationSnapshot(date=date, **row)
+        for row in located_valuation('shelf')
+    ]
+    unallocated = unallocated_valuation()
+    rows.append(StockValuationSnapshot(date=date, unallocated=True, **unallocated))
+
+    with transaction.atomic():
+        StockValuationSnapshot.objects.filter(date=date).delete()
+        StockValuationSnapshot.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _snapshot_rows(queryset, level, extra=()):
+    fields = list(_group_fields(level))
+    rows = (
+        queryset.values(*extra, 'unallocated', *fields)
+        .annotate(units=Sum('quantity'), amount=Sum('value'))
+        .order_by(*extra, 'unallocated', *fields)
+    )
+    return [
+        {**{name: row[name] for name in (*extra, 'unallocated', *fields)},
+         'quantity': row['units'], 'value': _money(row['amount'])}
+        for row in rows
+    ]
+
+
+def valuation_at(date, level='warehouse'):
+    """
+    Valoración según la última instantánea del día `date` o anterior.
+    Devuelve None si no hay ninguna.
+    """
+    snapshot_date = (
+        StockValuationSnapshot.objects.filter(date__lte=date)
+        .order_by('-date').values_list('date', flat=True).first()
+    )
+    if snapshot_date is None:
+        return None
+
+    results, unallocated = [], {'quantity': 0, 'value': Decimal('0.00')}
+    for row in _snapshot_rows(StockValuationSnapshot.objects.filter(date=snapshot_date), level):
+        if row.pop('unallocated'):
+            unallocated = {'quantity': row['quantity'], 'value': row['value']}
+        else:
+            results.append(row)
+    return _with_totals(level, snapshot_date, results, unallocated)
+
+
+def valuation_trend(start, end, level='warehouse'):
+    """
+    Serie diaria entre `start` y `end` a partir de las instantáneas: una
+    lista de {date, results, unallocated, total} ordenada por fecha.
+    """
+    queryset = StockValuationSnapshot.objects.filter(date__gte=start, date__lte=end)
+    points = {}
+    for row in _snapshot_rows(queryset, level, extra=('date',)):
+        date = row.pop('date')
+        point = points.setdefault(date, {
+            'results': [], 'unallocated': {'quantity': 0, 'value': Decimal('0.00')},
+        })
+        if row.pop('unallocated'):
+            point['unallocated'] = {'quantity': row['quantity'], 'value': row['value']}
+        else:
+            point['results'].append(row)
+
+    trend = []
+    for date, point in sorted(points.items()):
+        valuation = _with_totals(level, date, point['results'], point['unallocated'])
+        del valuation['level']
+        trend.append(valuation)
+    return trend
@@ -1,10 +1,15 @@
+import logging
+
 from django.shortcuts import render
 from rest_framework import viewsets, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from django.db import models, transaction
 from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import (
@@ -14,13 +19,23 @@ from .models import (
 from .serializers import (
     WarehouseSerializer, DepartmentSerializer, ShelfSerializer, TraySerializer,
     MaterialLocationSerializer, MaterialMovementSerializer,
+    MaterialLocationListSerializer, MaterialMovementListSerializer,
     DetailedWarehouseSerializer, DetailedDepartmentSerializer, DetailedShelfSerializer,
-    MaterialLocationWithMovementsSerializer
+    MaterialLocationWithMovementsSerializer, MovementBatchSerializer
 )
+from .services import MovementError, apply_movements
+from .valuation import LEVELS, current_valuation, valuation_at, valuation_trend
 from apps.materials.models import Material, MaterialControl
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.db_router import ReplicaReadMixin, replica_safe
+from apps.core.idempotency import IdempotencyMixin
+from apps.core.sparse import SparseFieldsMixin
+from apps.core.versioning import VersionConflict
+
+logger = logging.getLogger(__name__)
 
 
-class WarehouseViewSet(viewsets.ModelViewSet):
+class WarehouseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Warehouse.objects.all()
     serializer_class = WarehouseSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -35,9 +50,10 @@ class WarehouseViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
+    conditional_list_fields = ('updated_at', 'warehouse__updated_at')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['warehouse', 'is_active']
     search_fields = ['name', 'code', 'description']
@@ -50,9 +66,10 @@ class DepartmentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ShelfViewSet(viewsets.ModelViewSet):
+class ShelfViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Shelf.objects.all()
     serializer_class = ShelfSerializer
+    conditional_list_fields = ('updated_at', 'department__updated_at', 'department__warehouse__updated_at')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['department', 'department__warehouse', 'is_active']
     search_fields = ['name', 'code', 'description']
@@ -65,9 +82,13 @@ class ShelfViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class TrayViewSet(viewsets.ModelViewSet):
+class TrayViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Tray.objects.all()
     serializer_class = TraySerializer
+    conditional_list_fields = (
+        'updated_at', 'shelf__updated_at', 'shelf__department__updated_at',
+        'shelf__department__warehouse__updated_at'
+    )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['shelf', 'shelf__department', 'shelf__department__warehouse', 'is_active']
     search_fields = ['name', 'code', 'description']
@@ -82,13 +103,26 @@ class TrayViewSet(viewsets.ModelViewSet):
     
     # Añade este método para depuración
     def create(self, request, *args, **kwargs):
-        print("TrayViewSet create - Datos recibidos:", request.data)
+        logger.debug("TrayViewSet create - Datos recibidos: %s", request.data)
         return super().create(request, *args, **kwargs)
 
 
-class MaterialLocationViewSet(viewsets.ModelViewSet):
+class MaterialLocationViewSet(SparseFieldsMixin, ConditionalGetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = MaterialLocation.objects.all()
     serializer_class = MaterialLocationSerializer
+    compact_serializer_class = MaterialLocationListSerializer
+    sparse_select_related = {
+        'material_name': ('material',),
+        'tray_name': ('tray',),
+        'shelf_name': ('tray__shelf',),
+        'department_name': ('tray__shelf__department',),
+        'warehouse_name': ('tray__shelf__department__warehouse',),
+        'tray_full_code': ('tray__shelf__department__warehouse',),
+    }
+    conditional_list_fields = (
+        'updated_at', 'tray__updated_at', 'tray__shelf__updated_at',
+        'tray__shelf__department__updated_at', 'tray__shelf__department__warehouse__updated_at'
+    )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = [
         'material', 'tray', 'tray__shelf', 
@@ -118,9 +152,21 @@ class MaterialLocationViewSet(viewsets.ModelViewSet):
             return Response({"error": str(e)}, status=500)
 
 
-class MaterialMovementViewSet(viewsets.ModelViewSet):
+class MaterialMovementViewSet(IdempotencyMixin, SparseFieldsMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = MaterialMovement.objects.all()
+    idempotent_actions = ('create', 'batch')
     serializer_class = MaterialMovementSerializer
+    compact_serializer_class = MaterialMovementListSerializer
+    sparse_select_related = {
+        'material_name': ('material',),
+        'user_name': ('user',),
+        'username': ('user',),
+        'source_location_display': ('source_location__tray__shelf__department__warehouse',),
+        'source_location_warehouse': ('source_location__tray__shelf__department__warehouse',),
+        'target_location_display': ('target_location__tray__shelf__department__warehouse',),
+        'target_location_warehouse': ('target_location__tray__shelf__department__warehouse',),
+    }
+    sparse_field_columns = {'operation_display': ('operation',)}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = [
         'material', 'operation', 'user',
@@ -129,7 +175,6 @@ class MaterialMovementViewSet(viewsets.ModelViewSet):
     search_fields = ['material__name', 'notes']
     ordering_fields = ['timestamp', 'material__name', 'quantity']
     
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
         """
         Crea un nuevo movimiento de material y actualiza las ubicaciones correspondientes
@@ -160,88 +205,59 @@ class MaterialMovementViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
                 
-            # 2. Verificar stock suficiente para REMOVE y TRANSFER
-            if operation in ['REMOVE', 'TRANSFER']:
-                if source_location.quantity < quantity:
-                    return Response(
-                        {"detail": f"Stock insuficiente en la ubicación de origen. Disponible: {source_location.quantity}"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+            # 2. El stock se comprueba en apply_movements, que escribe con compare-and-swap
             
-            # 3. Guardar el movimiento
-            movement = serializer.save(user=request.user)
-            
-            # 4. Registrar en el control de materiales con motivo "TRASLADO" en lugar de "MOVIMIENTO"
-            material_control = MaterialControl.objects.create(
-                user=request.user,
-                material=material,
-                quantity=quantity,
-                operation=operation,
-                reason='TRASLADO',  # Cambiado de 'MOVIMIENTO' a 'TRASLADO'
-                notes=notes or f"Traslado de material: {operation}",  # También actualizado el texto aquí
-                location_reference=source_location.id if source_location else (target_location.id if target_location else None),
-                movement_id=movement.id
-            )
+            # 3. Aplicar el movimiento con el mismo servicio que los lotes
+            movements, _ = apply_movements([{
+                'material': material,
+                'operation': operation,
+                'quantity': quantity,
+                'source_location': source_location,
+                'target_location': target_location,
+                'target_tray': target_tray,
+                'notes': notes,
+            }], request.user)
             
-            # 5. Asociar el control al movimiento
-            movement.material_control = material_control
-            movement.save()
-            
-            # 6. Actualizar las ubicaciones según el tipo de operación
-            if operation == 'ADD':
-                if target_location:
-                    # Si ya existe la ubicación, aumentar su stock
-                    target_location.quantity += quantity
-                    target_location.save()
-                elif target_tray:
-                    # Si es una nueva ubicación, crearla
-                    MaterialLocation.objects.create(
-                        material=material,
-                        tray=target_tray,
-                        quantity=quantity,
-                        minimum_quantity=0  # Valor predeterminado
-                    )
-                
-            elif operation == 'REMOVE':
-                # Restar stock de la ubicación de origen
-                source_location.quantity -= quantity
-                source_location.save()
-                
-            elif operation == 'TRANSFER':
-                # Restar del origen
-                source_location.quantity -= quantity
-                source_location.save()
-                
-                # Añadir al destino
-                if target_location:
-                    # Si ya existe la ubicación, aumentar su stock
-                    target_location.quantity += quantity
-                    target_location.save()
-                elif target_tray:
-                    # Si es una nueva ubicación, crearla
-                    MaterialLocation.objects.create(
-                        material=material,
-                        tray=target_tray,
-                        quantity=quantity,
-                        minimum_quantity=0  # Valor predeterminado
-                    )
+            return Response(self.get_serializer(movements[0]).data, status=status.HTTP_201_CREATED)
             
-            # 7. Actualizar el stock total en el objeto Material si es necesario
-            # Esto depende de cómo estés gestionando el stock general del material
-            # Si el material.quantity refleja el total en todas las ubicaciones, debes actualizarlo
+        except MovementError as e:
+            message = next(iter(e.errors.values()))[0]
+            return Response({"detail": message}, status=status.HTTP_400_BAD_REQUEST)
             
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except VersionConflict:
+            raise
             
         except Exception as e:
-            # Rollback automático gracias al decorador @transaction.atomic
-            import traceback
-            print(f"Error al procesar el movimiento: {str(e)}")
-            print(traceback.format_exc())
+            # apply_movements es atómico: no queda nada a medias
+            logger.exception("Error al procesar el movimiento: %s", e)
             return Response(
                 {"detail": f"Error al procesar el movimiento: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        Aplica varios movimientos a la vez: {"lines": [{material, operation,
+        quantity, source_location, target_location | target_tray, notes}, ...]}.
+        Se validan todas las líneas antes de escribir y se aplican todas o ninguna.
+        """
+        serializer = MovementBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            movements, locations = apply_movements(serializer.validated_data['lines'], request.user)
+        except MovementError as e:
+            return Response({"lines": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            "created": len(movements),
+            "movements": [movement.id for movement in movements],
+            "locations": [
+                {"id": location.id, "quantity": location.quantity}
+                for location in sorted(locations, key=lambda location: location.id)
+            ],
+        }, status=status.HTTP_201_CREATED)
+
     def list(self, request, *args, **kwargs):
         try:
             # Código original para listar los movimientos
@@ -254,11 +270,12 @@ class MaterialMovementViewSet(viewsets.ModelViewSet):
             
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
+        except ValidationError:
+            # Parámetros incorrectos (p. ej. ?fields= con campos que no existen)
+            raise
         except Exception as e:
             # Registrar el error para investigación
-            import traceback
-            print(f"Error en MaterialMovementViewSet.list: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error en MaterialMovementViewSet.list: %s", e)
             
             # Devolver una respuesta vacía en lugar de un error 500
             return Response([], status=200)
@@ -307,7 +324,9 @@ def material_inventory_check(request, material_id):
         material = Material.objects.get(id=material_id)
         
         # Obtener todas las ubicaciones de este material
-        locations = MaterialLocation.objects.filter(material=material)
+        locations = MaterialLocation.objects.filter(material=material).select_related(
+            'tray__shelf__department__warehouse'
+        )
         
         # Calcular el total ubicado
         total_located = sum(location.quantity for location in locations)
@@ -334,7 +353,7 @@ def material_inventory_check(request, material_id):
         # Control de materiales reciente para este material
         recent_controls = MaterialControl.objects.filter(
             material=material
-        ).order_by('-date')[:10]  # Últimos 10 movimientos
+        ).select_related('user').order_by('-date')[:10]  # Últimos 10 movimientos
         
         control_details = []
         for control in recent_controls:
@@ -368,3 +387,54 @@ def material_inventory_check(request, material_id):
         return Response({"detail": "Material no encontrado"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _valuation_level(request):
+    level = request.query_params.get('level', 'warehouse')
+    if level not in LEVELS:
+        raise ValidationError({'level': f"Nivel no válido. Opciones: {', '.join(LEVELS)}"})
+    return level
+
+
+def _query_date(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    date = parse_date(value)
+    if date is None:
+        raise ValidationError({name: "Fecha no válida (AAAA-MM-DD)"})
+    return date
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_safe
+def stock_valuation(request):
+    """
+    Valor del stock por almacén, dependencia o estantería (?level=) más el
+    stock sin ubicar. Con ?date= se devuelve la última instantánea de ese día
+    o anterior.
+    """
+    level = _valuation_level(request)
+    date = _query_date(request, 'date')
+    if date is None or date >= timezone.localdate():
+        return Response(current_valuation(level))
+
+    valuation = valuation_at(date, level)
+    if valuation is None:
+        return Response({"detail": "No hay valoraciones guardadas para esa fecha"},
+                        status=status.HTTP_404_NOT_FOUND)
+    return Response(valuation)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_safe
+def stock_valuation_trend(request):
+    """Evolución diaria del valor del stock (?level=, ?from=, ?to=; por defecto los últimos 90 días)."""
+    level = _valuation_level(request)
+    end = _query_date(request, 'to') or timezone.localdate()
+    start = _query_date(request, 'from') or end - timezone.timedelta(days=90)
+    if start > end:
+        raise ValidationError({'from': "La fecha inicial es posterior a la final"})
+    return Response({'level': level, 'from': start, 'to': end, 'results': valuation_trend(start, end, level)})
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Ticket, TicketItem
+from apps.core.admin import SoftDeleteAdmin
+from .models import Ticket, TicketDailyRollup, TicketItem
 
 class TicketItemInline(admin.TabularInline):
     model = TicketItem
@@ -7,9 +8,9 @@ class TicketItemInline(admin.TabularInline):
     extra = 0
 
 @admin.register(Ticket)
-class TicketAdmin(admin.ModelAdmin):
-    list_display = ('ticket_number', 'customer', 'created_at', 'status', 'payment_method', 'total_amount')
-    list_filter = ('status', 'payment_method', 'created_at')
+class TicketAdmin(SoftDeleteAdmin):
+    list_display = ('ticket_number', 'customer', 'created_at', 'status', 'payment_method', 'total_amount', 'is_deleted')
+    list_filter = ('status', 'payment_method', 'created_at', 'is_deleted')
     search_fields = ('ticket_number', 'customer__name', 'notes')
     date_hierarchy = 'created_at'
     readonly_fields = ('ticket_number', 'created_at', 'paid_at', 'canceled_at', 'total_amount')
@@ -32,3 +33,13 @@ class TicketItemAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('ticket', 'material')
+
+
+@admin.register(TicketDailyRollup)
+class TicketDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'payment_method', 'customer', 'paid_tickets', 'paid_amount', 'canceled_tickets', 'canceled_amount')
+    list_filter = ('payment_method',)
+    date_hierarchy = 'day'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('customer')
@@ -7,4 +7,8 @@ class TicketsConfig(AppConfig):
     
     def ready(self):
         #import apps.tickets.signals  # Para cargar las señales si las tuvieras
-        pass
+        from django.db.models.signals import post_save
+
+        from .models import Ticket
+        from .rollups import refresh_on_save
+        post_save.connect(refresh_on_save, sender=Ticket, dispatch_uid='ticket_daily_rollup')
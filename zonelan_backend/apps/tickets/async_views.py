@@ -0,0 +1,21 @@
+"""
+Versiones asíncronas de las vistas de tickets para el modo ASGI (ASYNC_VIEWS).
+"""
+from django.http import JsonResponse
+
+from apps.core.async_support import async_api_view
+from apps.core.db_router import replica_safe
+from .models import Ticket
+
+
+@async_api_view
+@replica_safe
+async def ticket_counts(request):
+    """Devuelve estadísticas de tickets para el dashboard"""
+    try:
+        return JsonResponse({
+            'total': await Ticket.objects.acount(),
+            'pending': await Ticket.objects.filter(status__in=['PENDING', 'IN_PROGRESS']).acount()
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
@@ -0,0 +1,144 @@
+"""
+Cambios de estado de varios tickets a la vez (cierre de caja).
+
+bulk_transition() hace lo mismo que mark_as_paid, cancel y destroy de
+TicketViewSet, pero para una lista de tickets y con un número fijo de
+consultas, sea cual sea el número de tickets:
+
+1. bloquea los tickets (SELECT ... FOR UPDATE en orden de id) y decide cuáles
+   admiten el cambio con las mismas reglas que las acciones individuales;
+2. cambia el estado de todos con un único UPDATE;
+3. si hay que devolver material, suma a cada material la cantidad de todos
+   sus ítems con un único UPDATE de incrementos F() (add_many, ver
+   apps.core.versioning) y crea los MaterialControl con bulk_create.
+
+update() y bulk_create no envían señales: el resumen diario de ventas, el de
+movimientos de material y la ficha de los clientes se actualizan aquí al
+confirmar la transacción.
+
+Devuelve un resultado por ticket, en el orden pedido; los tickets que no
+admiten el cambio no impiden aplicar el resto.
+"""
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.core.versioning import add_many
+from apps.customers.overview import invalidate_overview
+from apps.materials.models import Material, MaterialControl
+from apps.materials.rollups import schedule_refresh as schedule_material_refresh
+
+from .models import Ticket, TicketItem
+from .rollups import local_day, schedule_refresh_days, ticket_days
+
+
+ACTIONS = ('pay', 'cancel', 'delete')
+# Estado que queda tras la acción (al eliminar se mantiene el que tenía)
+RESULT_STATUS = {'pay': 'PAID', 'cancel': 'CANCELED'}
+
+
+def _rejection(action, ticket):
+    """Motivo por el que `ticket` no admite `action`, o None."""
+    if action == 'pay' and ticket.status == 'CANCELED':
+        return "No se puede marcar como pagado un ticket cancelado"
+    if action == 'cancel' and ticket.status != 'PENDING':
+        return "Solo se pueden cancelar tickets pendientes."
+    return None
+
+
+def _returns_materials(action, ticket, return_materials):
+    # Los cancelados ya devolvieron sus materiales al cancelarse
+    return action == 'cancel' or (action == 'delete' and return_materials and ticket.status != 'CANCELED')
+
+
+def _update_tickets(action, ticket_ids, now, payment_method):
+    tickets = Ticket.objects.filter(pk__in=ticket_ids)
+    if action == 'pay':
+        changes = {'status': 'PAID', 'paid_at': Coalesce('paid_at', Value(now))}
+        if payment_method:
+            changes['payment_method'] = payment_method
+        return tickets.update(**changes)
+    if action == 'cancel':
+        return tickets.update(status='CANCELED', canceled_at=now)
+    return tickets.soft_delete()
+
+
+def _return_materials(action, tickets, user, now):
+    """Devuelve al stock los ítems de `tickets`. Devuelve {material_id: cantidad}."""
+    by_id = {ticket.id: ticket for ticket in tickets}
+    items = (
+        TicketItem.objects.filter(ticket_id__in=by_id)
+        .values_list('ticket_id', 'material_id', 'quantity')
+        .order_by('ticket_id', 'id')
+    )
+    returned = defaultdict(int)
+    controls = []
+    for ticket_id, material_id, quantity in items:
+        returned[material_id] += int(quantity)
+        ticket = by_id[ticket_id]
+        controls.append(MaterialControl(
+            user=user,
+            material_id=material_id,
+            quantity=quantity,
+            operation='ADD',
+            reason='DEVOLUCION',
+            ticket=ticket,
+            date=now,
+            notes=(f"Devolución por eliminación de ticket #{ticket.ticket_number or ticket.id}"
+                   if action == 'delete' else None),
+        ))
+
+    add_many(Material, returned)
+    MaterialControl.objects.bulk_create(controls)
+    schedule_material_refresh(controls)
+    return dict(returned)
+
+
+def bulk_transition(action, ticket_ids, user, payment_method=None, return_materials=False):
+    """
+    Aplica `action` ('pay', 'cancel' o 'delete') a los tickets de
+    `ticket_ids`. Devuelve (resultados por ticket, {material_id: cantidad
+    devuelta}).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tickets = {
+            ticket.id: ticket for ticket in
+            Ticket.objects.filter(pk__in=ticket_ids).select_for_update().order_by('id')
+        }
+
+        results = []
+        accepted = []
+        for ticket_id in ticket_ids:
+            ticket = tickets.get(ticket_id)
+            if ticket is None:
+                results.append({'id': ticket_id, 'ok': False, 'detail': "No existe el ticket."})
+                continue
+            rejection = _rejection(action, ticket)
+            if rejection:
+                results.append({'id': ticket_id, 'ok': False, 'status': ticket.status, 'detail': rejection})
+                continue
+            accepted.append(ticket)
+            results.append({'id': ticket_id, 'ok': True, 'status': RESULT_STATUS.get(action, ticket.status)})
+
+        returned = {}
+        if accepted:
+            _update_tickets(action, [ticket.id for ticket in accepted], now, payment_method)
+            to_return = [ticket for ticket in accepted if _returns_materials(action, ticket, return_materials)]
+            if to_return:
+                returned = _return_materials(action, to_return, user, now)
+
+            # Días que cambian en el resumen de ventas: los anteriores del ticket y el de hoy
+            days = set()
+            for ticket in accepted:
+                days |= ticket_days(ticket)
+            if action in ('pay', 'cancel'):
+                days.add(local_day(now))
+            schedule_refresh_days(days)
+            for customer_id in {ticket.customer_id for ticket in accepted} - {None}:
+                transaction.on_commit(partial(invalidate_overview, customer_id))
+    return results, returned
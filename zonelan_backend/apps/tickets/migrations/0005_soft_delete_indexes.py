@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_alter_ticketitem_location_source'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['is_deleted', 'created_at'], name='ticket_alive_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_business_name_customer_tax_id'),
+        ('tickets', '0005_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('payment_method', models.CharField(choices=[('CASH', 'Efectivo'), ('CARD', 'Tarjeta'), ('TRANSFER', 'Transferencia'), ('OTHER', 'Otro')], max_length=10, verbose_name='Forma de pago')),
+                ('paid_tickets', models.PositiveIntegerField(default=0, verbose_name='Tickets pagados')),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Importe pagado')),
+                ('canceled_tickets', models.PositiveIntegerField(default=0, verbose_name='Tickets cancelados')),
+                ('canceled_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Importe cancelado')),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ticket_rollups', to='customers.customer', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de ventas',
+                'verbose_name_plural': 'Resúmenes diarios de ventas',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'payment_method'], name='ticket_rollup_day_idx'), models.Index(fields=['customer', 'day'], name='ticket_rollup_customer_idx')],
+            },
+        ),
+    ]
@@ -6,8 +6,10 @@ from apps.materials.models import Material
 from apps.materials.models import MaterialControl
 from django.db import models, transaction
 import uuid
+from apps.core.soft_delete import SoftDeleteModel
+from apps.core.versioning import apply_delta
 
-class Ticket(models.Model):
+class Ticket(SoftDeleteModel):
     STATUS_CHOICES = (
         ('PENDING', 'Pendiente'),
         ('PAID', 'Pagado'),
@@ -69,8 +71,8 @@ class Ticket(models.Model):
             today = timezone.now()
             date_part = today.strftime('%Y%m%d')
             
-            # Buscar el último ticket del día
-            last_ticket = Ticket.objects.filter(
+            # Buscar el último ticket del día (también entre los eliminados)
+            last_ticket = Ticket.objects.with_deleted().filter(
                 ticket_number__startswith=f'TK-{date_part}'
             ).order_by('-ticket_number').first()
             
@@ -108,6 +110,11 @@ class Ticket(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Ticket'
         verbose_name_plural = 'Tickets'
+        indexes = [
+            # MariaDB no admite índices parciales: is_deleted va primero para
+            # que los listados (is_deleted=False ordenados por fecha) usen el índice
+            models.Index(fields=['is_deleted', 'created_at'], name='ticket_alive_created_idx'),
+        ]
 
 
 class TicketItem(models.Model):
@@ -169,8 +176,7 @@ class TicketItem(models.Model):
         # Solo devolver el material si el ticket no está cancelado
         if self.ticket and self.ticket.status != 'CANCELED':
             if self.material and self.quantity:
-                self.material.quantity += self.quantity
-                self.material.save(update_fields=['quantity'])
+                apply_delta(self.material, int(self.quantity))
         
         # Eliminar el item
         super().delete(*args, **kwargs)
@@ -185,3 +191,40 @@ class TicketItem(models.Model):
     class Meta:
         verbose_name = 'Item de ticket'
         verbose_name_plural = 'Items de ticket'
+
+
+class TicketDailyRollup(models.Model):
+    """
+    Tickets pagados y cancelados e importes por día, forma de pago y cliente
+    (ver apps.tickets.rollups). Los días son de Europe/Madrid: los pagados
+    cuentan el día de `paid_at` y los cancelados el de `canceled_at`. Los
+    tickets eliminados no cuentan.
+    """
+    day = models.DateField(verbose_name='Día')
+    payment_method = models.CharField(max_length=10, choices=Ticket.PAYMENT_METHOD_CHOICES,
+                                      verbose_name='Forma de pago')
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ticket_rollups',
+        verbose_name='Cliente'
+    )
+    paid_tickets = models.PositiveIntegerField(default=0, verbose_name='Tickets pagados')
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Importe pagado')
+    canceled_tickets = models.PositiveIntegerField(default=0, verbose_name='Tickets cancelados')
+    canceled_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                          verbose_name='Importe cancelado')
+
+    class Meta:
+        verbose_name = 'Resumen diario de ventas'
+        verbose_name_plural = 'Resúmenes diarios de ventas'
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['day', 'payment_method'], name='ticket_rollup_day_idx'),
+            models.Index(fields=['customer', 'day'], name='ticket_rollup_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d} {self.get_payment_method_display()}: {self.paid_amount}"
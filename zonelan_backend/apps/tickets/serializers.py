@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import transaction
 from rest_framework import serializers
 from .models import Ticket, TicketItem
@@ -6,6 +7,7 @@ from apps.materials.serializers import MaterialSerializer
 from apps.customers.models import Customer
 from apps.materials.models import Material
 from apps.materials.models import MaterialControl
+from apps.core.versioning import apply_delta
 from django.utils import timezone
 
 class TicketItemSerializer(serializers.ModelSerializer):
@@ -130,13 +132,10 @@ class TicketItemCreateSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError(f"Stock insuficiente en la ubicación. Disponible: {location.quantity}")
                 
                 # Restar stock de la ubicación
-                location.quantity -= validated_data['quantity']
-                location.save()
+                apply_delta(location, -int(validated_data['quantity']), minimum=0)
                 
                 # IMPORTANTE: También actualizar el stock total del material
-                material = validated_data['material']
-                material.quantity -= validated_data['quantity']
-                material.save()
+                apply_delta(validated_data['material'], -int(validated_data['quantity']))
                 
                 # Registrar la ubicación en el registro de movimiento
                 validated_data['location_source'] = location.get_full_path() if hasattr(location, 'get_full_path') else f"{location.tray.shelf.department.warehouse.name} > {location.tray.shelf.department.name} > {location.tray.shelf.name} > {location.tray.name}"
@@ -163,4 +162,16 @@ class TicketItemCreateSerializer(serializers.ModelSerializer):
             location_reference=validated_data.get('location_source')  # Incluir referencia a la ubicación
         )
         
-        return ticket_item
\ No newline at end of file
+        return ticket_item
+
+
+class TicketBulkActionSerializer(serializers.Serializer):
+    """Datos de las acciones en lote: {"ids": [...], "payment_method", "return_materials"}."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                max_length=settings.TICKET_BULK_MAX_IDS)
+    payment_method = serializers.ChoiceField(choices=Ticket.PAYMENT_METHOD_CHOICES, required=False)
+    return_materials = serializers.BooleanField(default=False)
+
+    def validate_ids(self, ids):
+        # Sin repetidos, conservando el orden para el resultado
+        return list(dict.fromkeys(ids))
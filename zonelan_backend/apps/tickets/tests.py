@@ -1,3 +1,204 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.customers.models import Customer
+from apps.materials.models import Material, MaterialControl
+from apps.users.models import User
+
+from . import rollups
+from .bulk import bulk_transition
+from .models import Ticket, TicketDailyRollup, TicketItem
+
+
+class TicketTestMixin:
+
+    def create_user(self, username='caja', type='Admin', **extra):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='secreto',
+            name=username.title(), phone='600000000', type=type, **extra,
+        )
+
+    def api_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class SalesRollupTests(TicketTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.customer = Customer.objects.create(
+            name='Cliente', address='Calle 1', email='cliente@example.com', phone='600000001',
+        )
+        self.today = timezone.localdate()
+        for days_ago, status, amount, method, customer in (
+            (0, 'PAID', '10.00', 'CASH', self.customer),
+            (0, 'PAID', '5.50', 'CARD', None),
+            (3, 'PAID', '20.00', 'CARD', self.customer),
+            (3, 'CANCELED', '7.00', 'CASH', None),
+            (40, 'PAID', '100.00', 'TRANSFER', None),
+        ):
+            self.create_ticket(days_ago, status, amount, method, customer)
+        self.client = self.api_client(self.user)
+
+    def at_noon(self, days_ago):
+        day = self.today - timedelta(days=days_ago)
+        return datetime.combine(day, datetime.min.time(), tzinfo=rollups.rollup_timezone()) + timedelta(hours=12)
+
+    def create_ticket(self, days_ago, status, amount, method='CASH', customer=None):
+        date_field = 'paid_at' if status == 'PAID' else 'canceled_at'
+        return Ticket.objects.create(
+            created_by=self.user, customer=customer, status=status, payment_method=method,
+            total_amount=Decimal(amount), **{date_field: self.at_noon(days_ago)},
+        )
+
+    def get(self, path):
+        response = self.client.get(path, secure=True, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def responses(self):
+        start = self.today - timedelta(days=60)
+        return [self.get('/tickets/stats/')] + [
+            self.get(f'/tickets/sales/daily/?from={start}{query}')['results']
+            for query in ('', '&group_by=payment_method', '&group_by=customer', '&payment_method=CARD',
+                          f'&customer={self.customer.id}')
+        ]
+
+    def test_tickets_are_used_until_the_rollup_is_built(self):
+        # Base de datos existente: el resumen está vacío y sin construir
+        self.assertFalse(TicketDailyRollup.objects.exists())
+        self.assertFalse(rollups.is_built())
+        live = self.responses()
+
+        self.assertEqual(live[0]['monthly_sales'], 3)
+        self.assertEqual(live[0]['total_sales_amount'], Decimal('135.50'))
+        rollups.rebuild()
+        self.assertTrue(rollups.is_built())
+        self.assertEqual(self.responses(), live)
+
+    def test_partial_rebuild_does_not_mark_the_rollup_as_built(self):
+        rollups.rebuild(since=self.today)
+        self.assertFalse(rollups.is_built())
+        self.assertEqual(self.get('/tickets/stats/')['total_sales_amount'], Decimal('135.50'))
+
+    def test_refresh_days_only_touches_the_given_days(self):
+        rollups.rebuild()
+        stale = self.create_ticket(1, 'PAID', '1.00')
+        fresh = [self.create_ticket(days_ago, 'PAID', '2.00') for days_ago in (0, 40)]
+
+        # Filas de (día, forma de pago, cliente): tres de hoy y dos de hace 40 días
+        self.assertEqual(rollups.refresh_days({rollups.local_day(ticket.paid_at) for ticket in fresh}), 5)
+
+        by_day = {
+            row['day']: row['paid_tickets'] for row in
+            rollups.daily_sales(self.today - timedelta(days=40), self.today)
+        }
+        self.assertEqual(by_day[self.today], 3)
+        self.assertEqual(by_day[self.today - timedelta(days=40)], 2)
+        # Un día intermedio no pedido no se recalcula
+        self.assertEqual(by_day[rollups.local_day(stale.paid_at)], 0)
+
+
+class BulkTransitionTests(TicketTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.customer = Customer.objects.create(
+            name='Cliente', address='Calle 1', email='cliente@example.com', phone='600000001',
+        )
+        # El stock ya tiene descontados los ítems de los tickets
+        self.cable = Material.objects.create(name='Cable', quantity=95, price=1)
+        self.switch = Material.objects.create(name='Switch', quantity=10, price=30)
+        self.client = self.api_client(self.user)
+
+    def create_ticket(self, status='PENDING', items=((None, 0),)):
+        ticket = Ticket.objects.create(created_by=self.user, customer=self.customer, status=status)
+        for material, quantity in items:
+            if material is not None:
+                TicketItem.objects.create(ticket=ticket, material=material, quantity=quantity, unit_price=1)
+        return ticket
+
+    def post(self, action, ids, client=None, **data):
+        return (client or self.client).post(f'/tickets/tickets/bulk-{action}/', {'ids': ids, **data},
+                                            format='json', secure=True, SERVER_NAME='localhost')
+
+    def stock(self):
+        return [material.quantity for material in Material.objects.order_by('id')]
+
+    def statuses(self, tickets):
+        by_id = dict(Ticket.objects.with_deleted().values_list('id', 'status'))
+        return [by_id[ticket.id] for ticket in tickets]
+
+    def test_cancel_returns_stock_and_reports_rejections(self):
+        first = self.create_ticket(items=((self.cable, 3), (self.switch, 1)))
+        second = self.create_ticket(items=((self.cable, 2),))
+        paid = self.create_ticket('PAID', items=((self.switch, 4),))
+
+        response = self.post('cancel', [first.id, paid.id, second.id, 999999])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['failed']), (2, 2))
+        self.assertEqual([result['ok'] for result in response.data['results']], [True, False, True, False])
+        self.assertEqual(self.statuses([first, second, paid]), ['CANCELED', 'CANCELED', 'PAID'])
+        self.assertEqual(self.stock(), [100, 11])
+        self.assertEqual(MaterialControl.objects.filter(reason='DEVOLUCION', operation='ADD').count(), 3)
+
+    def test_delete_returns_stock_only_for_tickets_not_canceled(self):
+        pending = self.create_ticket(items=((self.cable, 5),))
+        canceled = self.create_ticket('CANCELED', items=((self.switch, 2),))
+        admin = self.api_client(self.create_user('admin', is_superuser=True))
+
+        self.assertEqual(self.post('delete', [pending.id], return_materials=True).status_code, 403)
+        response = self.post('delete', [pending.id, canceled.id], client=admin, return_materials=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['returned_materials'], [{'material': self.cable.id, 'quantity': 5}])
+        self.assertEqual(self.stock(), [100, 10])
+        self.assertFalse(Ticket.objects.filter(id__in=[pending.id, canceled.id]).exists())
+
+    def test_failure_rolls_back_the_whole_batch(self):
+        tickets = [self.create_ticket(items=((self.cable, 3),)) for _ in range(3)]
+
+        with mock.patch('apps.tickets.bulk.schedule_material_refresh', side_effect=RuntimeError('fallo')):
+            with self.assertRaises(RuntimeError):
+                bulk_transition('cancel', [ticket.id for ticket in tickets], self.user)
+
+        self.assertEqual(self.statuses(tickets), ['PENDING'] * 3)
+        self.assertEqual(self.stock(), [95, 10])
+        self.assertFalse(MaterialControl.objects.exists())
+
+    def test_ids_limit(self):
+        limit = settings.TICKET_BULK_MAX_IDS
+        response = self.post('pay', list(range(1, limit + 2)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ids', response.data)
+
+        response = self.post('pay', list(range(1, limit + 1)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['failed'], limit)
+
+    def test_rollups_and_overview_are_refreshed_on_commit(self):
+        tickets = [self.create_ticket() for _ in range(2)]
+
+        with mock.patch('apps.tickets.bulk.invalidate_overview') as invalidate:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.post('pay', [ticket.id for ticket in tickets], payment_method='CARD')
+            self.assertEqual(response.status_code, 200)
+            invalidate.assert_not_called()
+            self.assertFalse(TicketDailyRollup.objects.exists())
+
+            for callback in callbacks:
+                callback()
 
-# Create your tests here.
+        invalidate.assert_called_once_with(self.customer.id)
+        rollup = TicketDailyRollup.objects.get()
+        self.assertEqual((rollup.day, rollup.payment_method, rollup.paid_tickets),
+                         (timezone.localdate(), 'CARD', 2))
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
@@ -11,8 +12,15 @@ router.register(r'tickets', TicketViewSet, basename='tickets')
 tickets_router = routers.NestedSimpleRouter(router, r'tickets', lookup='ticket')
 tickets_router.register(r'items', TicketItemViewSet, basename='ticket-items')
 
+if settings.ASYNC_VIEWS:
+    from .async_views import ticket_counts
+else:
+    from .views import ticket_counts
+
 urlpatterns = [
     path('', include(router.urls)),
     path('', include(tickets_router.urls)),
-    path('counts/', views.ticket_counts, name='ticket-counts'),
+    path('counts/', ticket_counts, name='ticket-counts'),
+    path('stats/', views.ticket_stats, name='ticket-stats'),
+    path('sales/daily/', views.daily_sales_report, name='ticket-daily-sales'),
 ]
\ No newline at end of file
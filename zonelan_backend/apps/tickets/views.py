@@ -10,15 +10,19 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.db import transaction
 from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
+from django.utils.dateparse import parse_date
+from .bulk import bulk_transition
 from .models import Ticket, TicketItem
+from .rollups import SERIES_GROUPS, daily_sales, sales_totals
 from .serializers import (
     TicketSerializer, TicketItemSerializer, 
-    TicketCreateSerializer, TicketItemCreateSerializer
+    TicketCreateSerializer, TicketItemCreateSerializer, TicketBulkActionSerializer
 )
 from apps.materials.models import Material, MaterialControl
+from apps.core.db_router import ReplicaReadMixin, replica_safe
+from apps.core.idempotency import IdempotencyMixin
+from apps.core.versioning import VersionConflict, apply_delta
 import logging
-import traceback
-import sys
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +43,9 @@ class IsSuperUserOrReadOnly(permissions.BasePermission):
         # Para otros métodos como POST, PUT, etc.
         return request.user and request.user.is_authenticated
 
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(IdempotencyMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """API para gestionar tickets de venta"""
+    idempotent_actions = ('create', 'create_item', 'bulk_pay', 'bulk_cancel', 'bulk_delete')
     queryset = Ticket.objects.all().order_by('-created_at')
     serializer_class = TicketSerializer
     permission_classes = [IsAuthenticated, IsSuperUserOrReadOnly]
@@ -52,10 +57,9 @@ class TicketViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """
-        Filtrar los tickets según los permisos del usuario y excluir los eliminados.
+        Filtrar los tickets según los permisos del usuario. El manager ya excluye los eliminados.
         """
-        # Filtrar por eliminados
-        queryset = Ticket.objects.filter(is_deleted=False).order_by('-created_at')
+        queryset = Ticket.objects.order_by('-created_at')
         
         # Aplicar filtros adicionales si es necesario
         return queryset
@@ -102,8 +106,7 @@ class TicketViewSet(viewsets.ModelViewSet):
                         }, status=status.HTTP_400_BAD_REQUEST)
                     
                     # Actualizar el stock
-                    material.quantity -= quantity
-                    material.save()
+                    apply_delta(material, -quantity, minimum=0)
                     
                     # Registrar en el control de materiales
                     MaterialControl.objects.create(
@@ -148,6 +151,47 @@ class TicketViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(ticket)
         return Response(serializer.data)
     
+    def _bulk_transition(self, request, action):
+        serializer = TicketBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        results, returned = bulk_transition(
+            action, data['ids'], request.user,
+            payment_method=data.get('payment_method'),
+            return_materials=data['return_materials'],
+        )
+        updated = sum(1 for result in results if result['ok'])
+        return Response({
+            "action": action,
+            "updated": updated,
+            "failed": len(results) - updated,
+            "results": results,
+            "returned_materials": [
+                {"material": material_id, "quantity": quantity}
+                for material_id, quantity in sorted(returned.items())
+            ],
+        })
+    
+    @action(detail=False, methods=['post'], url_path='bulk-pay')
+    def bulk_pay(self, request):
+        """Marca como pagados varios tickets: {"ids": [...], "payment_method": opcional}"""
+        return self._bulk_transition(request, 'pay')
+    
+    @action(detail=False, methods=['post'], url_path='bulk-cancel')
+    def bulk_cancel(self, request):
+        """Cancela varios tickets pendientes y devuelve sus materiales: {"ids": [...]}"""
+        return self._bulk_transition(request, 'cancel')
+    
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Elimina varios tickets (solo superusuarios): {"ids": [...], "return_materials": opcional}"""
+        if not request.user.is_superuser:
+            return Response(
+                {"detail": "Solo los superusuarios pueden eliminar tickets."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return self._bulk_transition(request, 'delete')
+    
     @action(detail=True, methods=['post'])
     @transaction.atomic
     def cancel(self, request, pk=None):
@@ -175,8 +219,7 @@ class TicketViewSet(viewsets.ModelViewSet):
             )
             
             # Devolver el material al inventario
-            item.material.quantity += item.quantity
-            item.material.save(update_fields=['quantity'])
+            apply_delta(item.material, int(item.quantity))
         
         # Actualizar el ticket
         ticket.status = 'CANCELED'
@@ -253,21 +296,16 @@ class TicketViewSet(viewsets.ModelViewSet):
                         )
                         
                         # Devolver el material al inventario
-                        item.material.quantity += item.quantity
-                        item.material.save(update_fields=['quantity'])
+                        apply_delta(item.material, int(item.quantity))
             
             # Marcar como eliminado en lugar de eliminar físicamente
-            ticket.is_deleted = True
-            ticket.deleted_at = timezone.now()
-            ticket.save(update_fields=['is_deleted', 'deleted_at'])
+            ticket.soft_delete()
             
             return Response(status=status.HTTP_204_NO_CONTENT)
+        except VersionConflict:
+            raise
         except Exception as e:
-            # Capturar y registrar detalles del error
-            exc_info = sys.exc_info()
-            error_details = traceback.format_exc()
-            logger.error(f"Error al eliminar ticket {ticket.id}: {str(e)}")
-            logger.error(error_details)
+            logger.exception("Error al eliminar ticket %s: %s", ticket.id, e)
             
             return Response(
                 {"detail": f"Error al eliminar el ticket: {str(e)}"},
@@ -322,8 +360,10 @@ class TicketViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                     
+            except VersionConflict:
+                raise
             except Exception as e:
-                logger.error(f"Error al crear ticket item: {str(e)}")
+                logger.exception("Error al crear ticket item: %s", e)
                 return Response(
                     {"detail": f"Error al crear el item: {str(e)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -344,7 +384,7 @@ class TicketViewSet(viewsets.ModelViewSet):
             )
         
         # Obtener tickets eliminados
-        queryset = Ticket.objects.filter(is_deleted=True).order_by('-deleted_at')
+        queryset = Ticket.objects.only_deleted().order_by('-deleted_at')
         
         # Aplicar paginación
         page = self.paginate_queryset(queryset)
@@ -362,9 +402,9 @@ class TicketViewSet(viewsets.ModelViewSet):
         include_deleted = self.request.query_params.get('include_deleted', 'false').lower() == 'true'
         
         if include_deleted and self.request.user.is_superuser:
-            queryset = Ticket.objects.all()  # Incluir eliminados
+            queryset = Ticket.objects.with_deleted()
         else:
-            queryset = Ticket.objects.filter(is_deleted=False)
+            queryset = Ticket.objects.all()
         
         # Continuar con el comportamiento estándar
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
@@ -455,27 +495,21 @@ class TicketItemViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-@action(detail=False, methods=['get'])
+@api_view(['GET'])
+@replica_safe
 def ticket_stats(request):
-    """Estadísticas de tickets"""
+    """Estadísticas de tickets. Los importes y las ventas del mes salen del resumen diario."""
     total_tickets = Ticket.objects.count()
     pending_tickets = Ticket.objects.filter(status='PENDING').count()
     paid_tickets = Ticket.objects.filter(status='PAID').count()
     canceled_tickets = Ticket.objects.filter(status='CANCELED').count()
     
     # Ventas de los últimos 30 días
-    thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    monthly_sales = Ticket.objects.filter(
-        status='PAID', 
-        paid_at__gte=thirty_days_ago
-    ).count()
+    thirty_days_ago = timezone.localdate() - timezone.timedelta(days=30)
+    monthly_sales, _ = sales_totals(thirty_days_ago)
     
     # Importe total de ventas
-    total_sales_amount = Ticket.objects.filter(
-        status='PAID'
-    ).aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
+    _, total_sales_amount = sales_totals()
     
     return Response({
         'total_tickets': total_tickets,
@@ -488,6 +522,35 @@ def ticket_stats(request):
 
 
 @api_view(['GET'])
+@replica_safe
+def daily_sales_report(request):
+    """
+    Ventas por día desde el resumen diario (por defecto el último año):
+    ?from, ?to, ?group_by=payment_method|customer, ?payment_method, ?customer.
+    """
+    params = request.query_params
+    end = parse_date(params['to']) if params.get('to') else timezone.localdate()
+    start = parse_date(params['from']) if params.get('from') else (end - timezone.timedelta(days=365) if end else None)
+    if start is None or end is None or start > end:
+        return Response({"detail": "Intervalo de fechas no válido (AAAA-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+    if (end - start).days > 3660:
+        return Response({"detail": "El intervalo máximo es de diez años"}, status=status.HTTP_400_BAD_REQUEST)
+
+    group_by = params.get('group_by') or None
+    if group_by is not None and group_by not in SERIES_GROUPS:
+        return Response({"detail": f"group_by no válido. Opciones: {', '.join(SERIES_GROUPS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    customer = params.get('customer')
+    if customer and not customer.isdigit():
+        return Response({"detail": "Cliente no válido"}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = daily_sales(start, end, group_by=group_by,
+                          payment_method=params.get('payment_method'), customer_id=customer)
+    return Response({'from': start, 'to': end, 'results': results})
+
+
+@api_view(['GET'])
+@replica_safe
 def ticket_counts(request):
     """Devuelve estadísticas de tickets para el dashboard"""
     try:
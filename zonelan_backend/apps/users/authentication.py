@@ -0,0 +1,92 @@
+"""
+Autenticación JWT con caché de usuarios.
+
+JWTAuthentication carga el usuario de la base de datos en cada petición.
+CachedJWTAuthentication lo guarda en la caché (settings.AUTH_USER_CACHE_TIMEOUT
+segundos, por id) y lo invalida al guardar o borrar el usuario, lo que incluye
+los cambios de contraseña (ver apps.users.signals).
+
+La caché solo se usa si es compartida entre procesos (REDIS_URL). Con
+LocMemCache cada worker de gunicorn tendría su copia y la invalidación solo
+llegaría al que guarda el usuario: un usuario desactivado o sin permisos
+seguiría entrando en los demás durante el TTL. Sin caché compartida se lee
+el usuario de la base de datos en cada petición, como JWTAuthentication.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+# Backends cuyo contenido es de cada proceso
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache():
+    """Indica si la caché por defecto la comparten todos los procesos."""
+    backend = type(caches['default'])
+    return f'{backend.__module__}.{backend.__name__}' not in PROCESS_LOCAL_CACHES
+
+
+def user_cache_timeout():
+    return settings.AUTH_USER_CACHE_TIMEOUT if shared_cache() else 0
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que lee el usuario de la caché antes que de la base de datos."""
+
+    def get_user(self, validated_token):
+        timeout = user_cache_timeout()
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if not timeout or user_id is None:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # Las comprobaciones de usuario activo y token revocado las hace simplejwt
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed'
+                )
+
+        return user
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Añade `type` e `is_superuser` a los tokens si JWT_ROLE_CLAIMS está activo,
+    para que el cliente conozca el rol sin pedir el usuario. Son informativos:
+    los permisos se siguen comprobando con request.user.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        if settings.JWT_ROLE_CLAIMS:
+            token['type'] = user.type
+            token['is_superuser'] = user.is_superuser
+        return token
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .models import User
+
+
+# Invalida el usuario cacheado por CachedJWTAuthentication. Cubre también los
+# cambios de contraseña y de rol, que siempre terminan en User.save()
+@receiver(post_save, sender=User)
+def invalidate_user_on_save(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_on_delete(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import user_cache_key, user_cache_timeout
+from .models import User
+
+
+@override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='tecnico', email='tecnico@example.com', password='secreto',
+            name='Técnico', phone='600000000', type='User',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def get_me(self):
+        return self.client.get(f'/users/{self.user.pk}/', secure=True, SERVER_NAME='localhost')
+
+    def test_local_cache_disables_user_cache(self):
+        # La caché de pruebas es LocMemCache, de cada proceso
+        self.assertEqual(user_cache_timeout(), 0)
+        self.assertEqual(self.get_me().status_code, 200)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_deactivation_is_immediate_without_shared_cache(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # Sin pasar por save(): ni siquiera hace falta la señal
+        self.assertEqual(self.get_me().status_code, 401)
+
+    @mock.patch('apps.users.authentication.shared_cache', return_value=True)
+    def test_deactivation_invalidates_cached_user(self, shared_cache):
+        self.assertEqual(self.get_me().status_code, 200)
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.get_me().status_code, 401)
@@ -1,6 +1,8 @@
 import os
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zonelan_backend.config.settings')
+# Configurar el módulo de configuración
+# En producción se debe usar config.production
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Opciones de conexión a MariaDB comunes a settings.py y production.py.
+
+- DB_CONN_MAX_AGE: segundos que se reutiliza una conexión (0 = una por petición).
+  Por defecto 60 en WSGI y 0 en modo ASGI, donde Django recomienda no usar
+  conexiones persistentes.
+- DB_POOL_SIZE: activa el pool de conexiones de django-db-connection-pool
+  (pensado para el modo ASGI). DB_POOL_MAX_OVERFLOW y DB_POOL_RECYCLE lo ajustan.
+- DB_REPLICA_HOST: añade un alias de réplica de solo lectura (ver apps.core.db_router).
+"""
+import os
+
+
+def connection_options(async_mode=False):
+    """Claves a añadir a DATABASES['default'] según las variables de entorno."""
+    pool_size = os.getenv('DB_POOL_SIZE')
+    if pool_size:
+        return {
+            'ENGINE': 'dj_db_conn_pool.backends.mysql',
+            # El pool gestiona la vida de las conexiones
+            'CONN_MAX_AGE': 0,
+            'POOL_OPTIONS': {
+                'POOL_SIZE': int(pool_size),
+                'MAX_OVERFLOW': int(os.getenv('DB_POOL_MAX_OVERFLOW', '5')),
+                'RECYCLE': int(os.getenv('DB_POOL_RECYCLE', '3600')),
+                'PRE_PING': True,
+            },
+        }
+
+    default_max_age = '0' if async_mode else '60'
+    return {
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default_max_age)),
+        # Comprueba la conexión reutilizada antes de la primera consulta de cada petición
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
+    }
+
+
+def replica_database(default):
+    """
+    Configuración de la réplica a partir de la del primario, o None si no se
+    ha definido DB_REPLICA_HOST. Usuario, contraseña y puerto pueden cambiarse
+    con DB_REPLICA_USER, DB_REPLICA_PASSWORD y DB_REPLICA_PORT.
+    """
+    host = os.getenv('DB_REPLICA_HOST')
+    if not host:
+        return None
+    return {
+        **default,
+        'HOST': host,
+        'PORT': os.getenv('DB_REPLICA_PORT', default.get('PORT', '3306')),
+        'USER': os.getenv('DB_REPLICA_USER', default.get('USER')),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', default.get('PASSWORD')),
+        # En los tests la réplica es un espejo del primario
+        'TEST': {'MIRROR': 'default'},
+    }
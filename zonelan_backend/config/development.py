@@ -2,6 +2,7 @@
 Configuración para desarrollo local
 """
 from .settings import *
+import os
 
 # Configuración de desarrollo
 DEBUG = True
@@ -17,6 +18,15 @@ DATABASES = {
     }
 }
 
+# Réplica local para probar el enrutado de lecturas: otro fichero SQLite
+# (por ejemplo una copia de db.sqlite3 que hace de réplica con retraso)
+if os.getenv('DB_REPLICA_NAME'):
+    DATABASES[DB_REPLICA_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
 # En desarrollo, permitir todos los orígenes CORS
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -2,11 +2,8 @@
 Configuración específica para el entorno de producción
 """
 from .settings import *
+from .database import connection_options, replica_database
 import os
-from dotenv import load_dotenv
-
-# Cargar variables de entorno
-load_dotenv()
 
 # Configuración de seguridad para producción
 DEBUG = False
@@ -31,6 +28,9 @@ DATABASES = {
         },
     }
 }
+DATABASES['default'].update(connection_options(ASYNC_VIEWS))
+if replica_database(DATABASES['default']):
+    DATABASES[DB_REPLICA_ALIAS] = replica_database(DATABASES['default'])
 
 # Configuraciones de seguridad
 SECURE_SSL_REDIRECT = True
@@ -55,41 +55,51 @@ CSRF_TRUSTED_ORIGINS = [
     "https://gestor.zonelan.cloud",
 ]
 
-# Logging
+# Logging: JSON asíncrono con identificador de petición (ver apps/core/log.py)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'apps.core.log.RequestIDFilter',
+        },
+    },
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
+        'json': {
+            '()': 'apps.core.log.JSONFormatter',
         },
     },
     'handlers': {
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
         'file': {
             'level': 'WARNING',
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'django.log'),
-            'formatter': 'verbose',
+            'formatter': 'json',
         },
-        'console': {
-            'level': 'INFO',
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+        # Debe llamarse después (alfabéticamente) que sus destinos
+        'queue': {
+            '()': 'apps.core.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['request_id'],
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['queue'],
         'level': 'INFO',
     },
     'loggers': {
         'django': {
-            'handlers': ['file'],
+            'handlers': ['queue'],
             'level': 'WARNING',
             'propagate': False,
         },
         'django.security': {
-            'handlers': ['file'],
+            'handlers': ['queue'],
             'level': 'WARNING',
             'propagate': False,
         },
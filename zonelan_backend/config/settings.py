@@ -1,10 +1,20 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+from dotenv import load_dotenv
+
+from .database import connection_options, replica_database
+
 # Ruta base del proyecto
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Variables de entorno del .env: deben cargarse antes de cualquier os.getenv
+# (los servicios de systemd no definen EnvironmentFile)
+load_dotenv(BASE_DIR / '.env')
+
 # Configuración de seguridad
 # IMPORTANTE: Cambia esta clave secreta en producción por una generada aleatoriamente
 # Puedes generar una nueva con: python -c 'from django.core.management.utils import get_random_secret_key; print(get_random_secret_key())'
@@ -30,17 +40,20 @@ INSTALLED_APPS = [
     'apps.tickets.apps.TicketsConfig',
     'apps.storage.apps.StorageConfig',
     'apps.contracts.apps.ContractsConfig',
+    'apps.core.apps.CoreConfig',
     'django_filters',
 ]
 
 # Middleware
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'apps.core.middleware.RequestIDMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.middleware.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'apps.contracts.middleware.DocumentFrameMiddleware',
@@ -117,11 +130,21 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles')
 # Configuración de REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON con orjson y MessagePack si está instalado (ver apps/core/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['apps.core.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'apps.core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50
@@ -133,14 +156,86 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.users.authentication.RoleTokenObtainPairSerializer',
 }
 
+# Segundos que CachedJWTAuthentication guarda el usuario en caché (0 = sin caché).
+# Solo se aplica con una caché compartida (REDIS_URL); con la caché local de
+# cada proceso los usuarios no se cachean
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', '60'))
+# Incluye `type` e `is_superuser` en los tokens JWT
+JWT_ROLE_CLAIMS = os.getenv('JWT_ROLE_CLAIMS', 'True').lower() == 'true'
+
+# Días que pasan desde el borrado lógico hasta que archive_deleted mueve el
+# registro a la tabla de archivo (apps.core.archive)
+SOFT_DELETE_ARCHIVE_DAYS = int(os.getenv('SOFT_DELETE_ARCHIVE_DAYS', '365'))
+
+# Años de detalle de MaterialControl; lo anterior se agrupa en resúmenes
+# mensuales con compact_material_controls (apps.materials.compaction)
+MATERIAL_CONTROL_DETAIL_YEARS = int(os.getenv('MATERIAL_CONTROL_DETAIL_YEARS', '2'))
+
+# Previsión de consumo y reposición (apps.materials.forecasting): días de
+# histórico, plazo de entrega del proveedor, días que cubre cada pedido y
+# factor del stock de seguridad (1.65 ≈ 95 % de nivel de servicio)
+FORECAST_HISTORY_DAYS = int(os.getenv('FORECAST_HISTORY_DAYS', '1095'))
+FORECAST_LEAD_TIME_DAYS = int(os.getenv('FORECAST_LEAD_TIME_DAYS', '7'))
+FORECAST_REVIEW_DAYS = int(os.getenv('FORECAST_REVIEW_DAYS', '30'))
+FORECAST_SAFETY_FACTOR = float(os.getenv('FORECAST_SAFETY_FACTOR', '1.65'))
+
+# Agregado diario de MaterialControl (apps.materials.rollups): recálculo al
+# confirmar cada movimiento y margen con el que relee el trabajo de puesta al día
+MATERIAL_ROLLUP_ON_COMMIT = os.getenv('MATERIAL_ROLLUP_ON_COMMIT', 'True').lower() == 'true'
+MATERIAL_ROLLUP_OVERLAP_SECONDS = int(os.getenv('MATERIAL_ROLLUP_OVERLAP_SECONDS', '300'))
+
+# Zona horaria de los días del agregado de ventas (apps.tickets.rollups)
+TICKET_ROLLUP_TIMEZONE = os.getenv('TICKET_ROLLUP_TIMEZONE', 'Europe/Madrid')
+
+# Carga semanal de los técnicos (apps.reports.workload): recálculo al confirmar
+# cada parte, margen del trabajo de puesta al día y horas semanales de referencia
+# para la ocupación
+TECHNICIAN_WORKLOAD_ON_COMMIT = os.getenv('TECHNICIAN_WORKLOAD_ON_COMMIT', 'True').lower() == 'true'
+TECHNICIAN_WORKLOAD_OVERLAP_SECONDS = int(os.getenv('TECHNICIAN_WORKLOAD_OVERLAP_SECONDS', '300'))
+TECHNICIAN_WEEKLY_HOURS = float(os.getenv('TECHNICIAN_WEEKLY_HOURS', '40'))
+
+# Segundos que se guarda en la caché la ficha de cliente (/customers/{id}/overview/);
+# se invalida al cambiar el cliente o sus registros (0 = sin caché)
+CUSTOMER_OVERVIEW_CACHE_SECONDS = int(os.getenv('CUSTOMER_OVERVIEW_CACHE_SECONDS', '300'))
+
+# Reintentos de las escrituras de stock con compare-and-swap (apps.core.versioning)
+# antes de responder 409
+STOCK_CAS_MAX_RETRIES = int(os.getenv('STOCK_CAS_MAX_RETRIES', '3'))
+
+# Segundos máximos que un ETag de ConditionalGetMixin puede seguir siendo válido
+# aunque no cambie el validador (0 = sin límite)
+CONDITIONAL_GET_MAX_STALENESS = int(os.getenv('CONDITIONAL_GET_MAX_STALENESS', '300'))
+
+# Sincronización incremental (/sync/, apps.core.sync): filas por página,
+# solape entre sesiones para transacciones lentas y días que se conservan
+# las marcas de borrado (un cursor más antiguo obliga a resincronizar)
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', '30'))
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', '90'))
+
+# Claves de idempotencia (apps.core.idempotency): segundos que se guarda la
+# respuesta para los reintentos y segundos tras los que una reserva confirmada
+# sin respuesta se da por abandonada
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '120'))
+
+# Máximo de líneas por petición en POST /storage/movements/batch/
+STOCK_MOVEMENT_BATCH_MAX_LINES = int(os.getenv('STOCK_MOVEMENT_BATCH_MAX_LINES', '500'))
+
+# Máximo de tickets por petición en /tickets/tickets/bulk-pay|bulk-cancel|bulk-delete/
+TICKET_BULK_MAX_IDS = int(os.getenv('TICKET_BULK_MAX_IDS', '500'))
+
 # Configuración de CORS para producción
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = [
     "https://gestor.zonelan.cloud",
 ]
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 # Orígenes de confianza para CSRF
 CSRF_TRUSTED_ORIGINS = [
@@ -149,6 +244,60 @@ CSRF_TRUSTED_ORIGINS = [
 
 AUTH_USER_MODEL = 'users.User'
 
+# Modo ASGI: sirve las vistas de E/S (proxy de documentos, estadísticas del
+# dashboard) en versión asíncrona. Requiere desplegar con workers de uvicorn.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+
+# Cliente HTTP compartido de las vistas asíncronas
+HTTP_CLIENT_TIMEOUT = float(os.getenv('HTTP_CLIENT_TIMEOUT', '20'))
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv('HTTP_CLIENT_MAX_CONNECTIONS', '20'))
+
+# Conexiones persistentes o con pool a la base de datos (ver config/database.py)
+DATABASES['default'].update(connection_options(ASYNC_VIEWS))
+
+# Réplica de lectura opcional: estadísticas, histórico, listados y exportaciones
+# (ver apps/core/db_router.py). Sin DB_REPLICA_HOST todo va al primario.
+DB_REPLICA_ALIAS = 'replica'
+DB_REPLICA_READ_YOUR_WRITES_SECONDS = int(os.getenv('DB_REPLICA_READ_YOUR_WRITES_SECONDS', '10'))
+if replica_database(DATABASES['default']):
+    DATABASES[DB_REPLICA_ALIAS] = replica_database(DATABASES['default'])
+DATABASE_ROUTERS = ['apps.core.db_router.ReplicaRouter']
+
+# Caché compartida entre workers (necesaria para la ventana de leer lo escrito
+# con varios procesos). Sin REDIS_URL se usa memoria local por proceso.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Mide el tiempo de conexión a la base de datos de cada petición y lo devuelve
+# en la cabecera Server-Timing (sirve para dimensionar el pool)
+DB_CONNECTION_TIMING = os.getenv('DB_CONNECTION_TIMING', 'False').lower() == 'true'
+DB_CONNECTION_TIMING_LOG_EVERY = int(os.getenv('DB_CONNECTION_TIMING_LOG_EVERY', '500'))
+if DB_CONNECTION_TIMING:
+    MIDDLEWARE.insert(0, 'apps.core.middleware.DBConnectionTimingMiddleware')
+
+# Compresión de las respuestas de la API (brotli si está instalado, si no
+# gzip) a partir de API_COMPRESSION_MIN_SIZE bytes
+API_COMPRESSION = os.getenv('API_COMPRESSION', 'True').lower() == 'true'
+API_COMPRESSION_MIN_SIZE = int(os.getenv('API_COMPRESSION_MIN_SIZE', '1024'))
+API_COMPRESSION_BROTLI_QUALITY = int(os.getenv('API_COMPRESSION_BROTLI_QUALITY', '5'))
+if API_COMPRESSION:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+        'apps.core.middleware.CompressionMiddleware',
+    )
+
 # Configuración para iframes - No permitir frames por seguridad
 X_FRAME_OPTIONS = 'DENY'
 
@@ -167,25 +316,49 @@ if not DEBUG:
     CSRF_COOKIE_SECURE = True
 
 # Configuración de logging
+# Los registros se encolan (apps.core.log.QueueListenerHandler) y un hilo aparte
+# los escribe en JSON, con el identificador de petición de RequestIDMiddleware.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'apps.core.log.RequestIDFilter',
+        },
+    },
+    'formatters': {
+        'json': {
+            '()': 'apps.core.log.JSONFormatter',
+        },
+    },
     'handlers': {
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
         'file': {
             'level': 'ERROR',
             'class': 'logging.FileHandler',
             'filename': '/var/log/gunicorn/django_errors.log',
+            'formatter': 'json',
         },
-        'console': {
-            'level': 'INFO',
-            'class': 'logging.StreamHandler',
+        # Debe llamarse después (alfabéticamente) que sus destinos
+        'queue': {
+            '()': 'apps.core.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['request_id'],
         },
     },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'INFO',
+    },
     'loggers': {
         'django': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'ERROR',
-            'propagate': True,
+            'propagate': False,
         },
     },
 }
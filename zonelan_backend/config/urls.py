@@ -13,6 +13,7 @@ urlpatterns = [
     path('tickets/', include('apps.tickets.urls')),
     path('storage/', include('apps.storage.urls')),
     path('contracts/', include('apps.contracts.urls')),
+    path('sync/', include('apps.core.urls')),
 ]
 
 # Servir archivos multimedia y estáticos